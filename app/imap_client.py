@@ -66,6 +66,7 @@ class ImapClient:
         self.port = port
         self.tls = tls
         self.conn: imaplib.IMAP4 | imaplib.IMAP4_SSL | None = None
+        self.uidvalidity: int | None = None
 
     def __enter__(self):
         self.conn = imaplib.IMAP4_SSL(self.host, self.port) if self.tls else imaplib.IMAP4(self.host, self.port)
@@ -95,18 +96,33 @@ class ImapClient:
             self.conn.select("INBOX")
         except Exception as e:
             raise Exception(f"Failed to select INBOX: {str(e)}")
+        _, data = self.conn.response("UIDVALIDITY")
+        self.uidvalidity = int(data[0]) if data and data[0] else None
 
     def fetch_latest(self, limit: int = 50):
         """
         Returns list of dict:
         {uid:int, subject, from, to, date, list_unsubscribe, snippet}
         """
+        return self._fetch_uids(self._search_uids("ALL"), limit)
+
+    def fetch_since(self, last_uid: int, limit: int = 50):
+        """
+        Like fetch_latest, but only for UIDs above last_uid (UID n+1:*).
+        Takes the oldest `limit` new UIDs so the high-water mark never skips mail.
+        """
+        uids = sorted((u for u in self._search_uids(f"UID {last_uid + 1}:*") if int(u) > last_uid), key=int)
+        return self._fetch_uids(uids[:limit] if limit else uids, 0)
+
+    def _search_uids(self, criteria: str):
         assert self.conn is not None
-        typ, data = self.conn.uid("search", None, "ALL")
-        if typ != "OK":
+        typ, data = self.conn.uid("search", None, criteria)
+        if typ != "OK" or not data or not data[0]:
             return []
+        return data[0].split()
 
-        uids = data[0].split()
+    def _fetch_uids(self, uids, limit: int):
+        assert self.conn is not None
         uids = uids[-limit:] if limit and len(uids) > limit else uids
 
         results = []
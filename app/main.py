@@ -1,12 +1,15 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.responses import RedirectResponse, HTMLResponse
 from pydantic import BaseModel, EmailStr, ConfigDict
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from datetime import datetime
 from dotenv import load_dotenv
 
 from .db import Base, engine, get_db
-from .models import Account, Thread, Message
+from .models import Account, Thread, Message, FolderState
 from .crypto import encrypt, decrypt
 from .imap_client import ImapClient, ImapAuthenticationError
 from .classifier import (
@@ -396,6 +399,97 @@ def create_account(payload: AccountCreate, db: Session = Depends(get_db)):
 def list_accounts(db: Session = Depends(get_db)):
     return db.query(Account).order_by(Account.id.desc()).all()
 
+def _insert_ignore(db: Session, model, rows: list[dict], conflict_columns: list[str]) -> None:
+    # Bulk INSERT that skips rows already stored (ON CONFLICT DO NOTHING on SQLite/Postgres).
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite_insert(model).on_conflict_do_nothing(index_elements=conflict_columns)
+    elif dialect == "postgresql":
+        stmt = postgresql_insert(model).on_conflict_do_nothing(index_elements=conflict_columns)
+    else:
+        stmt = insert(model)
+    db.execute(stmt, rows)
+
+def ingest_batch(db: Session, account_id: int, msgs: list[dict]) -> tuple[int, int]:
+    """Store fetched messages with a handful of set-based statements; returns (new threads, new messages).
+
+    Existing threads and (thread_id, imap_uid) pairs are preloaded with one
+    query per 500 keys, missing rows are bulk inserted, threads are updated
+    in one executemany. The last message of a thread in ``msgs`` sets its
+    classification, as the old per-message loop did.
+    """
+    if not msgs:
+        return 0, 0
+    db.flush()
+    keys = [thread_key(m.get("subject"), m.get("from")) for m in msgs]
+
+    def load_threads(wanted: list[str]) -> dict:
+        found = {}
+        for i in range(0, len(wanted), 500):
+            rows = db.execute(
+                select(Thread.id, Thread.provider_thread_key, Thread.subject, Thread.last_msg_at)
+                .where(Thread.account_id == account_id, Thread.provider_thread_key.in_(wanted[i:i + 500]))
+            )
+            found.update((row.provider_thread_key, row) for row in rows)
+        return found
+
+    unique_keys = list(dict.fromkeys(keys))
+    threads = load_threads(unique_keys)
+    missing = [k for k in unique_keys if k not in threads]
+    first_msg = {}
+    for tkey, m in zip(keys, msgs):
+        first_msg.setdefault(tkey, m)
+    _insert_ignore(
+        db,
+        Thread,
+        [
+            {"account_id": account_id, "provider_thread_key": k, "subject": first_msg[k].get("subject"), "last_msg_at": first_msg[k].get("date")}
+            for k in missing
+        ],
+        ["account_id", "provider_thread_key"],
+    )
+    threads.update(load_threads(missing))
+
+    updates = {}
+    for tkey, m in zip(keys, msgs):
+        th = threads[tkey]
+        row = updates.setdefault(th.id, {"id": th.id, "subject": th.subject, "last_msg_at": th.last_msg_at})
+        newsletter = is_newsletter(m.get("list_unsubscribe"), m.get("snippet"))
+        row["is_newsletter"] = newsletter
+        row["category"] = category_guess(m.get("subject"), m.get("snippet"), newsletter)
+        row["priority_score"] = priority_score(m.get("subject"), m.get("snippet"), newsletter)
+        if m.get("date") and (row["last_msg_at"] is None or m["date"] > row["last_msg_at"]):
+            row["last_msg_at"] = m["date"]
+            row["subject"] = m.get("subject") or row["subject"]
+    db.execute(update(Thread), list(updates.values()))
+
+    thread_ids = [row.id for row in threads.values()]
+    stored = set()
+    for i in range(0, len(thread_ids), 500):
+        stored.update(db.execute(
+            select(Message.thread_id, Message.imap_uid).where(Message.thread_id.in_(thread_ids[i:i + 500]))
+        ).tuples())
+    new_rows = []
+    for tkey, m in zip(keys, msgs):
+        pair = (threads[tkey].id, m["uid"])
+        if pair in stored:
+            continue
+        stored.add(pair)
+        new_rows.append({
+            "thread_id": pair[0],
+            "imap_uid": m["uid"],
+            "date": m.get("date"),
+            "from_addr": m.get("from"),
+            "to_addr": m.get("to"),
+            "subject": m.get("subject"),
+            "list_unsubscribe": m.get("list_unsubscribe"),
+            "snippet": m.get("snippet"),
+        })
+    _insert_ignore(db, Message, new_rows, ["thread_id", "imap_uid"])
+    return len(missing), len(new_rows)
+
 @app.post("/accounts/{account_id}/sync")
 def sync_account(account_id: int, payload: SyncRequest, db: Session = Depends(get_db)):
     acc = db.query(Account).filter(Account.id == account_id).first()
@@ -404,57 +498,43 @@ def sync_account(account_id: int, payload: SyncRequest, db: Session = Depends(ge
 
     password = decrypt(acc.password_enc)
 
+    state = db.query(FolderState).filter(FolderState.account_id == acc.id, FolderState.folder == "INBOX").first()
+    if not state:
+        state = FolderState(account_id=acc.id, folder="INBOX", last_uid=0)
+        db.add(state)
+
     try:
         with ImapClient(acc.imap_host, acc.imap_port, acc.imap_tls) as imap:
             imap.login(acc.email, password)
             imap.select_inbox()
-            msgs = imap.fetch_latest(limit=payload.limit)
+            full_resync = state.uidvalidity is None or state.uidvalidity != imap.uidvalidity
+            if full_resync:
+                msgs = imap.fetch_latest(limit=payload.limit)
+            else:
+                msgs = imap.fetch_since(state.last_uid, limit=payload.limit)
+            uidvalidity = imap.uidvalidity
     except ImapAuthenticationError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sync failed: {str(e)}")
 
-    upserted_msgs = 0
-    upserted_threads = 0
-
-    for m in msgs:
-        tkey = thread_key(m.get("subject"), m.get("from"))
-        th = db.query(Thread).filter(Thread.account_id == acc.id, Thread.provider_thread_key == tkey).first()
-        if not th:
-            th = Thread(
-                account_id=acc.id,
-                provider_thread_key=tkey,
-                subject=m.get("subject"),
-                last_msg_at=m.get("date"),
-            )
-            db.add(th)
-            db.flush()
-            upserted_threads += 1
+    if full_resync and state.uidvalidity is not None:
+        # UIDVALIDITY changed: the stored UIDs no longer identify anything on the server.
+        thread_ids = [t.id for t in db.query(Thread.id).filter(Thread.account_id == acc.id)]
+        db.query(Message).filter(Message.thread_id.in_(thread_ids)).delete(synchronize_session=False)
+        db.query(Thread).filter(Thread.account_id == acc.id).update({Thread.last_msg_at: None}, synchronize_session=False)
+        db.expire_all()
 
-        newsletter = is_newsletter(m.get("list_unsubscribe"), m.get("snippet"))
-        th.is_newsletter = newsletter
-        th.category = category_guess(m.get("subject"), m.get("snippet"), newsletter)
-        th.priority_score = priority_score(m.get("subject"), m.get("snippet"), newsletter)
-
-        if m.get("date") and (th.last_msg_at is None or m["date"] > th.last_msg_at):
-            th.last_msg_at = m["date"]
-            th.subject = m.get("subject") or th.subject
-
-        msg = db.query(Message).filter(Message.thread_id == th.id, Message.imap_uid == m["uid"]).first()
-        if not msg:
-            msg = Message(
-                thread_id=th.id,
-                imap_uid=m["uid"],
-                date=m.get("date"),
-                from_addr=m.get("from"),
-                to_addr=m.get("to"),
-                subject=m.get("subject"),
-                list_unsubscribe=m.get("list_unsubscribe"),
-                snippet=m.get("snippet"),
-            )
-            db.add(msg)
-            upserted_msgs += 1
+    upserted_threads, upserted_msgs = ingest_batch(db, acc.id, msgs)
+
+    if full_resync:
+        # Threads whose messages were all dropped above and not re-fetched.
+        db.flush()
+        for th in db.query(Thread).filter(Thread.account_id == acc.id, ~Thread.messages.any()):
+            db.delete(th)
 
+    state.uidvalidity = uidvalidity
+    state.last_uid = max([state.last_uid or 0] + [m["uid"] for m in msgs])
     db.commit()
     return {"threads_new": upserted_threads, "messages_new": upserted_msgs, "fetched": len(msgs)}
 
@@ -63,3 +63,16 @@ class Message(Base):
     snippet: Mapped[str] = mapped_column(Text, nullable=True)
 
     thread: Mapped["Thread"] = relationship(back_populates="messages")
+
+
+class FolderState(Base):
+    __tablename__ = "folder_states"
+    __table_args__ = (UniqueConstraint("account_id", "folder", name="uq_folder_state"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    account_id: Mapped[int] = mapped_column(ForeignKey("accounts.id"), nullable=False)
+    folder: Mapped[str] = mapped_column(String(255), nullable=False)
+
+    # UIDVALIDITY + highest seen UID: a sync only fetches UID last_uid+1:*.
+    uidvalidity: Mapped[int] = mapped_column(Integer, nullable=True)
+    last_uid: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -19,11 +19,17 @@ def get_url() -> str:
     return os.getenv("MAILPILOT_DB_URL", config.get_main_option("sqlalchemy.url"))
 
 
+def include_name(name, type_, parent_names) -> bool:
+    # The full-text index and its FTS5 shadow tables are not mapped, see models.MESSAGE_SEARCH_DDL.
+    return not (type_ == "table" and name.startswith("message_search"))
+
+
 def run_migrations_offline() -> None:
     url = get_url()
     context.configure(
         url=url,
         target_metadata=Base.metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -44,7 +50,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=Base.metadata)
+        context.configure(connection=connection, target_metadata=Base.metadata, include_name=include_name)
 
         with context.begin_transaction():
             context.run_migrations()
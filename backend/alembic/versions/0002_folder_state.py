@@ -0,0 +1,31 @@
+"""folder sync state
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-01-15
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "folder_states",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.Column("folder", sa.String(length=255), nullable=False),
+        sa.Column("uidvalidity", sa.BigInteger()),
+        sa.Column("last_uid", sa.BigInteger(), nullable=False),
+        sa.Column("synced_at", sa.DateTime()),
+        sa.ForeignKeyConstraint(["account_id"], ["accounts.id"]),
+        sa.UniqueConstraint("account_id", "folder", name="uq_folder_state"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("folder_states")
@@ -0,0 +1,27 @@
+"""message flags and folder HIGHESTMODSEQ
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-01-22
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("folder_states", sa.Column("highest_modseq", sa.BigInteger()))
+    op.add_column("messages", sa.Column("flags", sa.String(length=255)))
+    op.add_column("messages", sa.Column("is_seen", sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("messages") as batch_op:
+        batch_op.drop_column("is_seen")
+        batch_op.drop_column("flags")
+    with op.batch_alter_table("folder_states") as batch_op:
+        batch_op.drop_column("highest_modseq")
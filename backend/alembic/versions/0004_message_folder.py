@@ -0,0 +1,27 @@
+"""message folder
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-02-03
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("messages") as batch_op:
+        batch_op.add_column(sa.Column("folder", sa.String(length=255), nullable=False, server_default="INBOX"))
+        batch_op.drop_constraint("uq_imap_uid", type_="unique")
+        batch_op.create_unique_constraint("uq_imap_uid", ["thread_id", "folder", "imap_uid"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("messages") as batch_op:
+        batch_op.drop_constraint("uq_imap_uid", type_="unique")
+        batch_op.create_unique_constraint("uq_imap_uid", ["thread_id", "imap_uid"])
+        batch_op.drop_column("folder")
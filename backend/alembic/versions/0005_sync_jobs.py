@@ -0,0 +1,40 @@
+"""sync jobs
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-02-10
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("limit", sa.Integer(), nullable=False),
+        sa.Column("folders", sa.Text()),
+        sa.Column("fetched", sa.Integer(), nullable=False),
+        sa.Column("stored", sa.Integer(), nullable=False),
+        sa.Column("threads_new", sa.Integer(), nullable=False),
+        sa.Column("chunks", sa.Integer(), nullable=False),
+        sa.Column("cancel_requested", sa.Boolean(), nullable=False),
+        sa.Column("error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime()),
+        sa.Column("finished_at", sa.DateTime()),
+        sa.ForeignKeyConstraint(["account_id"], ["accounts.id"]),
+    )
+    op.create_index("ix_sync_jobs_status", "sync_jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sync_jobs_status", table_name="sync_jobs")
+    op.drop_table("sync_jobs")
@@ -0,0 +1,27 @@
+"""backfill checkpoints and job kinds
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-02-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("folder_states", sa.Column("backfill_before", sa.DateTime()))
+    op.add_column("folder_states", sa.Column("backfill_complete", sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column("sync_jobs", sa.Column("kind", sa.String(length=16), nullable=False, server_default="sync"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("sync_jobs") as batch_op:
+        batch_op.drop_column("kind")
+    with op.batch_alter_table("folder_states") as batch_op:
+        batch_op.drop_column("backfill_complete")
+        batch_op.drop_column("backfill_before")
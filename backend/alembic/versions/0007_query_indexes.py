@@ -0,0 +1,29 @@
+"""indexes for the thread list, thread view and subscriptions
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-02-24
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_threads_account_priority",
+        "threads",
+        ["account_id", "priority_score", "last_message_at"],
+        postgresql_ops={"priority_score": "DESC", "last_message_at": "DESC NULLS LAST"},
+    )
+    op.create_index("ix_messages_thread_date", "messages", ["thread_id", "date"], postgresql_ops={"date": "DESC NULLS LAST"})
+    op.create_index("ix_subscriptions_account_sender", "subscriptions", ["account_id", "sender"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_subscriptions_account_sender", table_name="subscriptions")
+    op.drop_index("ix_messages_thread_date", table_name="messages")
+    op.drop_index("ix_threads_account_priority", table_name="threads")
@@ -0,0 +1,41 @@
+"""id as the last column of the list indexes, for keyset paging
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-03-03
+"""
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_messages_thread_date", table_name="messages")
+    op.drop_index("ix_threads_account_priority", table_name="threads")
+    op.create_index(
+        "ix_threads_account_priority",
+        "threads",
+        ["account_id", "priority_score", "last_message_at", "id"],
+        postgresql_ops={"priority_score": "DESC", "last_message_at": "DESC NULLS LAST", "id": "DESC"},
+    )
+    op.create_index(
+        "ix_messages_thread_date",
+        "messages",
+        ["thread_id", "date", "id"],
+        postgresql_ops={"date": "DESC NULLS LAST", "id": "DESC"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_thread_date", table_name="messages")
+    op.drop_index("ix_threads_account_priority", table_name="threads")
+    op.create_index(
+        "ix_threads_account_priority",
+        "threads",
+        ["account_id", "priority_score", "last_message_at"],
+        postgresql_ops={"priority_score": "DESC", "last_message_at": "DESC NULLS LAST"},
+    )
+    op.create_index("ix_messages_thread_date", "messages", ["thread_id", "date"], postgresql_ops={"date": "DESC NULLS LAST"})
@@ -0,0 +1,46 @@
+"""latest message data and message count on threads
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-03-10
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("threads", sa.Column("last_message_id", sa.Integer()))
+    op.add_column("threads", sa.Column("last_snippet", sa.Text()))
+    op.add_column("threads", sa.Column("last_from", sa.String(length=512)))
+    op.add_column("threads", sa.Column("message_count", sa.Integer(), nullable=False, server_default="0"))
+    op.execute(
+        """
+        UPDATE threads SET
+            message_count = (SELECT count(*) FROM messages WHERE messages.thread_id = threads.id),
+            last_message_id = (
+                SELECT messages.id FROM messages WHERE messages.thread_id = threads.id
+                ORDER BY messages.date IS NULL, messages.date DESC, messages.id DESC LIMIT 1
+            )
+        """
+    )
+    op.execute(
+        """
+        UPDATE threads SET
+            last_snippet = (SELECT snippet FROM messages WHERE messages.id = threads.last_message_id),
+            last_from = (SELECT from_addr FROM messages WHERE messages.id = threads.last_message_id)
+        WHERE last_message_id IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("threads") as batch_op:
+        batch_op.drop_column("message_count")
+        batch_op.drop_column("last_from")
+        batch_op.drop_column("last_snippet")
+        batch_op.drop_column("last_message_id")
@@ -0,0 +1,44 @@
+"""full-text search index of messages
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-03-17
+"""
+from alembic import op
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE message_search USING fts5("
+            "subject, from_addr, to_addr, snippet, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        op.execute(
+            "INSERT INTO message_search (rowid, subject, from_addr, to_addr, snippet, body) "
+            "SELECT id, subject, from_addr, to_addr, snippet, '' FROM messages"
+        )
+    elif op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "CREATE TABLE message_search ("
+            "message_id INTEGER PRIMARY KEY REFERENCES messages (id) ON DELETE CASCADE, document TSVECTOR NOT NULL)"
+        )
+        op.execute(
+            """
+            INSERT INTO message_search (message_id, document)
+            SELECT id,
+                setweight(to_tsvector('simple', coalesce(subject, '')), 'A')
+                || setweight(to_tsvector('simple', coalesce(from_addr, '') || ' ' || coalesce(to_addr, '')), 'B')
+                || setweight(to_tsvector('simple', coalesce(snippet, '')), 'C')
+            FROM messages
+            """
+        )
+        op.execute("CREATE INDEX ix_message_search_document ON message_search USING GIN (document)")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS message_search")
@@ -0,0 +1,40 @@
+"""message-id index for threading
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2025-03-24
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "thread_message_ids",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("accounts.id"), nullable=False),
+        sa.Column("message_id", sa.String(length=512), nullable=False),
+        sa.Column("thread_id", sa.Integer(), sa.ForeignKey("threads.id"), nullable=False),
+        sa.UniqueConstraint("account_id", "message_id", name="uq_thread_message_id"),
+    )
+    op.create_index("ix_thread_message_ids_thread_id", "thread_message_ids", ["thread_id"])
+    # Stored messages' own Message-IDs; the first thread wins if one was split.
+    op.execute(
+        """
+        INSERT INTO thread_message_ids (account_id, message_id, thread_id)
+        SELECT threads.account_id, trim(messages.message_id), min(threads.id)
+        FROM messages JOIN threads ON threads.id = messages.thread_id
+        WHERE length(trim(messages.message_id)) BETWEEN 1 AND 512
+        GROUP BY threads.account_id, trim(messages.message_id)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_thread_message_ids_thread_id", table_name="thread_message_ids")
+    op.drop_table("thread_message_ids")
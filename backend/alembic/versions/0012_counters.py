@@ -0,0 +1,53 @@
+"""unread counts on threads and per-category account counters
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2025-03-31
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+COUNTERS = ("threads", "unread_threads", "messages", "unread_messages", "newsletters")
+
+
+def upgrade() -> None:
+    op.add_column("threads", sa.Column("unread_count", sa.Integer(), nullable=False, server_default="0"))
+    op.create_table(
+        "account_counters",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("accounts.id"), nullable=False),
+        sa.Column("category", sa.String(length=64), nullable=False),
+        *(sa.Column(name, sa.Integer(), nullable=False, server_default="0") for name in COUNTERS),
+        sa.UniqueConstraint("account_id", "category", name="uq_account_counter"),
+    )
+    op.execute(
+        """
+        UPDATE threads SET unread_count = (
+            SELECT count(*) FROM messages
+            WHERE messages.thread_id = threads.id AND messages.is_seen IS NOT true
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO account_counters (account_id, category, threads, unread_threads, messages, unread_messages, newsletters)
+        SELECT account_id, category, count(*),
+               sum(CASE WHEN unread_count > 0 THEN 1 ELSE 0 END),
+               sum(message_count), sum(unread_count),
+               sum(CASE WHEN is_newsletter THEN 1 ELSE 0 END)
+        FROM threads
+        WHERE message_count > 0
+        GROUP BY account_id, category
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("account_counters")
+    with op.batch_alter_table("threads") as batch_op:
+        batch_op.drop_column("unread_count")
@@ -0,0 +1,25 @@
+"""archive segment of message stubs, archive age of jobs
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2025-04-07
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("messages", sa.Column("archive_segment", sa.Integer()))
+    op.add_column("sync_jobs", sa.Column("older_than_days", sa.Integer()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("sync_jobs") as batch_op:
+        batch_op.drop_column("older_than_days")
+    with op.batch_alter_table("messages") as batch_op:
+        batch_op.drop_column("archive_segment")
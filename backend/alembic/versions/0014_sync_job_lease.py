@@ -0,0 +1,24 @@
+"""lease and per-folder progress of sync jobs
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2025-04-14
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("sync_jobs", sa.Column("heartbeat_at", sa.DateTime()))
+    op.add_column("sync_jobs", sa.Column("folder_progress", sa.Text()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("sync_jobs") as batch_op:
+        batch_op.drop_column("folder_progress")
+        batch_op.drop_column("heartbeat_at")
@@ -1,16 +1,111 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from typing import Any, AsyncIterator
+
+from sqlalchemy import create_engine, event, insert, make_url
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
 
 DATABASE_URL = os.getenv("MAILPILOT_DB_URL", "sqlite:///./mailpilot.db")
+# Serve the read-heavy routes from an AsyncSession (needs aiosqlite or asyncpg).
+DB_ASYNC = os.getenv("MAILPILOT_DB_ASYNC", "0") == "1"
+
+DB_BUSY_TIMEOUT = float(os.getenv("MAILPILOT_DB_BUSY_TIMEOUT", "5"))
+DB_POOL_SIZE = int(os.getenv("MAILPILOT_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("MAILPILOT_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("MAILPILOT_DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("MAILPILOT_DB_POOL_RECYCLE", "1800"))
+
+SQLITE_JOURNAL_MODE = os.getenv("MAILPILOT_SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("MAILPILOT_SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_KB = int(os.getenv("MAILPILOT_SQLITE_CACHE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("MAILPILOT_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+def sqlite_pragmas() -> dict[str, Any]:
+    """Pragmas run on every new SQLite connection.
+
+    In WAL mode readers keep reading the last committed state while a sync
+    writes, and ``synchronous=NORMAL`` only syncs at checkpoints, which is
+    safe with WAL. A negative ``cache_size`` is in KiB.
+    """
+    return {
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        "cache_size": -SQLITE_CACHE_KB,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "busy_timeout": int(DB_BUSY_TIMEOUT * 1000),
+    }
+
+
+def _server_pool() -> dict[str, Any]:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _apply_sqlite_pragmas(engine: Engine) -> None:
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL) -> Engine:
+    """Engine for ``url`` with the SQLite pragmas or the server pool settings applied."""
+    if not url.startswith("sqlite"):
+        return create_engine(url, **_server_pool())
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT})
+    _apply_sqlite_pragmas(engine)
+    return engine
+
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """``url`` with the async driver of its database, e.g. ``sqlite+aiosqlite://``."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend}")
+    return parsed.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: str = DATABASE_URL) -> AsyncEngine:
+    """``create_db_engine`` for asyncio, on the same database as ``url``.
+
+    Its connections are separate from the blocking engine's, so reads do not
+    wait for a pool slot held by a sync; with SQLite in WAL mode they do not
+    wait for its write transaction either.
+    """
+    url = async_database_url(url)
+    if not url.startswith("sqlite"):
+        return create_async_engine(url, **_server_pool())
+    engine = create_async_engine(url, connect_args={"timeout": DB_BUSY_TIMEOUT})
+    _apply_sqlite_pragmas(engine.sync_engine)
+    return engine
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_db_engine() if DB_ASYNC else None
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if DB_ASYNC else None
+
 
 class Base(DeclarativeBase):
     pass
@@ -22,3 +117,22 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def insert_ignore(db: Session, model: type, rows: list[dict[str, Any]], conflict_columns: list[str]) -> None:
+    """Bulk insert ``rows``, skipping those that would violate the unique ``conflict_columns``."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite_insert(model).on_conflict_do_nothing(index_elements=conflict_columns)
+    elif dialect == "postgresql":
+        stmt = postgresql_insert(model).on_conflict_do_nothing(index_elements=conflict_columns)
+    else:  # callers hold the account write lock, which keeps out concurrent writers of the same rows
+        stmt = insert(model)
+    db.execute(stmt, rows)
@@ -1,20 +1,48 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import accounts, threads, ai
+from .db import async_engine
+from .routers import accounts, threads, ai, jobs
+from .services.idle import IDLE_ENABLED, manager as idle_manager
+from .services.jobs import runner as job_runner
+from .services.pagination import NEXT_CURSOR_HEADER
+from .services.imap_pool import pool as imap_pool
+from .services.scheduler import SCHEDULER_ENABLED, scheduler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    imap_pool.start_maintenance()
+    job_runner.start()
+    if IDLE_ENABLED:
+        idle_manager.start_all()
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+    yield
+    scheduler.stop()
+    job_runner.stop()
+    idle_manager.stop_all()
+    imap_pool.close_all()
+    if async_engine is not None:
+        await async_engine.dispose()
+
 
-app = FastAPI(title="MailPilot API", version="0.1.0")
+app = FastAPI(title="MailPilot API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.include_router(accounts.router)
 app.include_router(threads.router)
 app.include_router(ai.router)
+app.include_router(jobs.router)
 
 
 @app.get("/health")
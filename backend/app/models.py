@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+from sqlalchemy import DDL, BigInteger, Boolean, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .db import Base
@@ -26,7 +26,20 @@ class Account(Base):
 
 class Thread(Base):
     __tablename__ = "threads"
-    __table_args__ = (UniqueConstraint("account_id", "thread_key", name="uq_thread_key"),)
+    __table_args__ = (
+        UniqueConstraint("account_id", "thread_key", name="uq_thread_key"),
+        # Thread list order (id breaks ties for keyset paging). SQLite scans it
+        # backwards (NULLs sort first there), Postgres needs the direction
+        # spelled out to match NULLS LAST.
+        Index(
+            "ix_threads_account_priority",
+            "account_id",
+            "priority_score",
+            "last_message_at",
+            "id",
+            postgresql_ops={"priority_score": "DESC", "last_message_at": "DESC NULLS LAST", "id": "DESC"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     account_id: Mapped[int] = mapped_column(ForeignKey("accounts.id"), nullable=False)
@@ -37,6 +50,13 @@ class Thread(Base):
     priority_score: Mapped[int] = mapped_column(Integer, default=0)
     priority_reason: Mapped[str] = mapped_column(String(255), default="")
     is_newsletter: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Copied from the thread's latest message (date, then id) and counted by
+    # sync.refresh_thread_summaries.
+    last_message_id: Mapped[int | None] = mapped_column(Integer)
+    last_snippet: Mapped[str | None] = mapped_column(Text)
+    last_from: Mapped[str | None] = mapped_column(String(512))
+    message_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    unread_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     account: Mapped[Account] = relationship(back_populates="threads")
     messages: Mapped[list[Message]] = relationship(back_populates="thread", cascade="all, delete-orphan")
@@ -45,10 +65,14 @@ class Thread(Base):
 
 class Message(Base):
     __tablename__ = "messages"
-    __table_args__ = (UniqueConstraint("thread_id", "imap_uid", name="uq_imap_uid"),)
+    __table_args__ = (
+        UniqueConstraint("thread_id", "folder", "imap_uid", name="uq_imap_uid"),
+        Index("ix_messages_thread_date", "thread_id", "date", "id", postgresql_ops={"date": "DESC NULLS LAST", "id": "DESC"}),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     thread_id: Mapped[int] = mapped_column(ForeignKey("threads.id"), nullable=False)
+    folder: Mapped[str] = mapped_column(String(255), nullable=False, default="INBOX", server_default="INBOX")
     imap_uid: Mapped[int] = mapped_column(Integer, nullable=False)
     message_id: Mapped[str | None] = mapped_column(String(512))
     in_reply_to: Mapped[str | None] = mapped_column(String(512))
@@ -59,10 +83,26 @@ class Message(Base):
     date: Mapped[datetime | None] = mapped_column(DateTime)
     list_unsubscribe: Mapped[str | None] = mapped_column(Text)
     snippet: Mapped[str | None] = mapped_column(Text)
+    flags: Mapped[str | None] = mapped_column(String(255))
+    is_seen: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Set on stubs whose headers and snippet were moved to this segment by services/archive.py.
+    archive_segment: Mapped[int | None] = mapped_column(Integer)
 
     thread: Mapped[Thread] = relationship(back_populates="messages")
 
 
+class ThreadMessageId(Base):
+    """Message-ID (own or referenced) -> thread, the index of services/threader.py."""
+
+    __tablename__ = "thread_message_ids"
+    __table_args__ = (UniqueConstraint("account_id", "message_id", name="uq_thread_message_id"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    account_id: Mapped[int] = mapped_column(ForeignKey("accounts.id"), nullable=False)
+    message_id: Mapped[str] = mapped_column(String(512), nullable=False)
+    thread_id: Mapped[int] = mapped_column(ForeignKey("threads.id"), nullable=False, index=True)
+
+
 class Label(Base):
     __tablename__ = "labels"
 
@@ -84,6 +124,7 @@ class ThreadLabel(Base):
 
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (Index("ix_subscriptions_account_sender", "account_id", "sender"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     account_id: Mapped[int] = mapped_column(ForeignKey("accounts.id"), nullable=False)
@@ -92,6 +133,42 @@ class Subscription(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
 
+class FolderState(Base):
+    __tablename__ = "folder_states"
+    __table_args__ = (UniqueConstraint("account_id", "folder", name="uq_folder_state"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    account_id: Mapped[int] = mapped_column(ForeignKey("accounts.id"), nullable=False)
+    folder: Mapped[str] = mapped_column(String(255), nullable=False)
+    uidvalidity: Mapped[int | None] = mapped_column(BigInteger)
+    last_uid: Mapped[int] = mapped_column(BigInteger, default=0)
+    highest_modseq: Mapped[int | None] = mapped_column(BigInteger)
+    synced_at: Mapped[datetime | None] = mapped_column(DateTime)
+    # Backfill checkpoint: days before this date are still to be imported.
+    backfill_before: Mapped[datetime | None] = mapped_column(DateTime)
+    backfill_complete: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+
+
+class AccountCounter(Base):
+    """Thread and message counts of an account's threads of one category.
+
+    Maintained incrementally by services/counters.py so badges are read from
+    a handful of rows; threads without messages are not counted.
+    """
+
+    __tablename__ = "account_counters"
+    __table_args__ = (UniqueConstraint("account_id", "category", name="uq_account_counter"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    account_id: Mapped[int] = mapped_column(ForeignKey("accounts.id"), nullable=False)
+    category: Mapped[str] = mapped_column(String(64), nullable=False)
+    threads: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    unread_threads: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    messages: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    unread_messages: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    newsletters: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
 class ActionItem(Base):
     __tablename__ = "action_items"
 
@@ -100,3 +177,48 @@ class ActionItem(Base):
     description: Mapped[str] = mapped_column(String(255), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     completed: Mapped[bool] = mapped_column(Boolean, default=False)
+
+
+class SyncJob(Base):
+    __tablename__ = "sync_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    account_id: Mapped[int] = mapped_column(ForeignKey("accounts.id"), nullable=False)
+    # queued, running, completed, failed or cancelled
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued", index=True)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False, default="sync")  # sync, backfill or archive
+    limit: Mapped[int] = mapped_column(Integer, nullable=False, default=50)
+    older_than_days: Mapped[int | None] = mapped_column(Integer)  # archive jobs only
+    folders: Mapped[str | None] = mapped_column(Text)  # JSON list, NULL = all folders
+    fetched: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    stored: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    threads_new: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    chunks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    # Renewed by the process running the job; a stale one lets another process take it over.
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime)
+    folder_progress: Mapped[str | None] = mapped_column(Text)  # JSON {folder: fetched}
+    error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime)
+
+
+# Full-text index of the messages, maintained by services/search.py. Its DDL
+# differs per database, so it is not mapped; migration 0010 creates it too.
+MESSAGE_SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5("
+        "subject, from_addr, to_addr, snippet, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    ],
+    "postgresql": [
+        "CREATE TABLE IF NOT EXISTS message_search ("
+        "message_id INTEGER PRIMARY KEY REFERENCES messages (id) ON DELETE CASCADE, document TSVECTOR NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_message_search_document ON message_search USING GIN (document)",
+    ],
+}
+
+for _dialect, _statements in MESSAGE_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+    event.listen(Base.metadata, "before_drop", DDL("DROP TABLE IF EXISTS message_search").execute_if(dialect=_dialect))
@@ -1,13 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from ..db import get_db
-from ..models import Account, Subscription
-from ..schemas import AccountCreate, AccountOut, SendEmailRequest, SyncRequest, TestConnectionRequest
+from ..models import Account
+from ..schemas import (
+    AccountCreate,
+    AccountOut,
+    ArchiveRequest,
+    BackfillRequest,
+    CountersOut,
+    SearchResultOut,
+    SendEmailRequest,
+    SyncRequest,
+    TestConnectionRequest,
+)
+from ..services.archive import ARCHIVE_AFTER_DAYS, rehydrate_results
+from ..services.counters import account_counters, recount
 from ..services.crypto import encrypt, decrypt
 from ..services.imap_client import ImapClient, ImapAuthenticationError
-from ..services.smtp_client import SmtpClient
-from ..services.classifier import is_newsletter, guess_category, priority, thread_key
+from ..services.idle import IDLE_ENABLED, manager as idle_manager
+from ..services.async_smtp_client import AsyncSmtpClient
+from ..services.imap_compress import traffic
+from ..services.scheduler import scheduler
+from ..services.jobs import create_job, job_progress, runner as job_runner
+from ..services.pagination import NEXT_CURSOR_HEADER, InvalidCursor, decode_cursor, encode_cursor
+from ..services.search import SearchUnavailable, search_messages
+from ..services.sync import account_write_lock
 
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 
@@ -17,6 +37,17 @@ def list_accounts(db: Session = Depends(get_db)):
     return db.query(Account).order_by(Account.id.desc()).all()
 
 
+@router.get("/scheduler")
+def scheduler_status():
+    return scheduler.status()
+
+
+@router.get("/imap-traffic")
+def imap_traffic():
+    """IMAP bytes on the wire vs. before compression, summed over all connections."""
+    return traffic.stats()
+
+
 @router.post("", response_model=AccountOut)
 def create_account(payload: AccountCreate, db: Session = Depends(get_db)):
     existing = db.query(Account).filter(Account.email == payload.email).first()
@@ -35,6 +66,8 @@ def create_account(payload: AccountCreate, db: Session = Depends(get_db)):
     db.add(account)
     db.commit()
     db.refresh(account)
+    if IDLE_ENABLED:
+        idle_manager.watch(account.id)
     return account
 
 
@@ -50,89 +83,98 @@ def test_connection(payload: TestConnectionRequest):
     return {"ok": True}
 
 
-@router.post("/{account_id}/sync")
+@router.post("/{account_id}/sync", status_code=202)
 def sync_account(account_id: int, payload: SyncRequest, db: Session = Depends(get_db)):
+    """Queue a sync job; poll ``GET /jobs/{id}`` for its progress."""
     account = db.query(Account).filter(Account.id == account_id).first()
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
+    job = create_job(db, account.id, payload.limit, payload.folders)
+    job_runner.submit(job.id)
+    return job_progress(job)
 
-    password = decrypt(account.password_enc)
+
+@router.post("/{account_id}/backfill", status_code=202)
+def backfill_account(account_id: int, payload: BackfillRequest, db: Session = Depends(get_db)):
+    """Queue a job importing older mail, newest date window first; see ``GET /jobs/{id}``."""
+    account = db.query(Account).filter(Account.id == account_id).first()
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    job = create_job(db, account.id, 0, payload.folders, kind="backfill")
+    job_runner.submit(job.id)
+    return job_progress(job)
+
+
+@router.post("/{account_id}/archive", status_code=202)
+def archive_account(account_id: int, payload: ArchiveRequest, db: Session = Depends(get_db)):
+    """Queue a job moving old messages to compressed segment files; see ``GET /jobs/{id}``."""
+    account = db.query(Account).filter(Account.id == account_id).first()
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    job = create_job(
+        db, account.id, 0, None, kind="archive", older_than_days=payload.older_than_days or ARCHIVE_AFTER_DAYS
+    )
+    job_runner.submit(job.id)
+    return job_progress(job)
+
+
+@router.get("/{account_id}/search", response_model=list[SearchResultOut])
+def search(
+    account_id: int,
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+):
+    """Full-text search over subject, sender, recipients, snippet and opened bodies.
+
+    Every word matches as a prefix; results are best first, the next page's
+    cursor is sent as ``X-Next-Cursor``.
+    """
     try:
-        with ImapClient(account.imap_host, account.imap_port, account.imap_tls) as imap:
-            imap.login(account.email, password)
-            imap.select_inbox()
-            messages = imap.fetch_latest(limit=payload.limit)
-    except ImapAuthenticationError:
-        raise HTTPException(status_code=401, detail="IMAP authentication failed")
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"Sync failed: {exc}")
-
-    from ..models import Thread, Message
-
-    new_messages = 0
-    new_threads = 0
-
-    for msg in messages:
-        t_key = thread_key(msg.get("message_id"), msg.get("in_reply_to"), msg.get("references"), msg.get("subject"), msg.get("from"))
-        thread = (
-            db.query(Thread)
-            .filter(Thread.account_id == account.id, Thread.thread_key == t_key)
-            .first()
-        )
-        if not thread:
-            thread = Thread(account_id=account.id, thread_key=t_key, subject=msg.get("subject"))
-            db.add(thread)
-            db.flush()
-            new_threads += 1
-        newsletter = is_newsletter(msg.get("list_unsubscribe"), msg.get("snippet"))
-        category = guess_category(msg.get("subject"), msg.get("snippet"), newsletter)
-        score, reason = priority(msg.get("subject"), msg.get("snippet"), newsletter)
-        thread.category = category
-        thread.priority_score = score
-        thread.priority_reason = reason
-        thread.is_newsletter = newsletter
-        if msg.get("date") and (thread.last_message_at is None or msg["date"] > thread.last_message_at):
-            thread.last_message_at = msg["date"]
-            thread.subject = msg.get("subject") or thread.subject
-
-        existing_msg = db.query(Message).filter(Message.thread_id == thread.id, Message.imap_uid == msg["uid"]).first()
-        if existing_msg:
-            continue
-        message = Message(
-            thread_id=thread.id,
-            imap_uid=msg["uid"],
-            message_id=msg.get("message_id"),
-            in_reply_to=msg.get("in_reply_to"),
-            references=msg.get("references"),
-            from_addr=msg.get("from"),
-            to_addr=msg.get("to"),
-            subject=msg.get("subject"),
-            date=msg.get("date"),
-            list_unsubscribe=msg.get("list_unsubscribe"),
-            snippet=msg.get("snippet"),
-        )
-        db.add(message)
-        new_messages += 1
-
-        if newsletter and msg.get("from"):
-            sender = msg.get("from")
-            if not db.query(Subscription).filter(Subscription.account_id == account.id, Subscription.sender == sender).first():
-                db.add(Subscription(account_id=account.id, sender=sender, list_unsubscribe=msg.get("list_unsubscribe")))
+        after = decode_cursor(cursor, float, int) if cursor else None
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        results = search_messages(db, account_id, q, limit + 1, after)
+    except SearchUnavailable as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+    if len(results) > limit:
+        results = results[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(results[-1]["rank"], results[-1]["id"])
+    return rehydrate_results(account_id, results)
+
+
+@router.get("/{account_id}/counters", response_model=CountersOut)
+def counters(account_id: int, db: Session = Depends(get_db)):
+    """Thread, unread and newsletter counts for badges, in total and per category."""
+    if not db.get(Account, account_id):
+        raise HTTPException(status_code=404, detail="Account not found")
+    return account_counters(db, account_id)
 
-    db.commit()
-    return {"threads_new": new_threads, "messages_new": new_messages}
+
+@router.post("/{account_id}/counters/repair", response_model=CountersOut)
+def repair_counters(account_id: int, db: Session = Depends(get_db)):
+    """Recompute the counters from the stored messages, in case they drifted."""
+    if not db.get(Account, account_id):
+        raise HTTPException(status_code=404, detail="Account not found")
+    with account_write_lock(account_id):
+        recount(db, account_id)
+        db.commit()
+    return account_counters(db, account_id)
 
 
 @router.post("/{account_id}/send")
-def send_email(account_id: int, payload: SendEmailRequest, db: Session = Depends(get_db)):
-    account = db.query(Account).filter(Account.id == account_id).first()
+async def send_email(account_id: int, payload: SendEmailRequest, db: Session = Depends(get_db)):
+    account = await asyncio.to_thread(db.get, Account, account_id)
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     password = decrypt(account.password_enc)
     try:
-        with SmtpClient(account.smtp_host, account.smtp_port, account.smtp_tls) as smtp:
-            smtp.login(account.email, password)
-            smtp.send_email(account.email, str(payload.to_addr), payload.subject, payload.body)
+        async with AsyncSmtpClient(account.smtp_host, account.smtp_port, account.smtp_tls) as smtp:
+            await smtp.login(account.email, password)
+            await smtp.send_email(account.email, str(payload.to_addr), payload.subject, payload.body)
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"SMTP failed: {exc}")
     return {"ok": True}
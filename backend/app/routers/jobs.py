@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..models import SyncJob
+from ..services.jobs import FINISHED, job_progress, runner as job_runner
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _get_job(db: Session, job_id: int) -> SyncJob:
+    job = db.query(SyncJob).filter(SyncJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    return job_progress(_get_job(db, job_id))
+
+
+@router.post("/{job_id}/cancel")
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    job = _get_job(db, job_id)
+    if job.status in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    job.cancel_requested = True
+    if job.status == "queued":
+        job.status = "cancelled"
+    db.commit()
+    return job_progress(job)
+
+
+@router.post("/{job_id}/resume", status_code=202)
+def resume_job(job_id: int, db: Session = Depends(get_db)):
+    """Re-run a failed or cancelled job; folders continue from their last committed chunk."""
+    job = _get_job(db, job_id)
+    if job.status not in ("failed", "cancelled"):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    job.status = "queued"
+    job.cancel_requested = False
+    job.error = None
+    job.finished_at = None
+    db.commit()
+    job_runner.submit(job.id)
+    return job_progress(job)
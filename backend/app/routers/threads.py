@@ -1,79 +1,264 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from contextlib import AsyncExitStack
+from datetime import datetime
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..db import get_db
-from ..models import Thread, Message, Subscription
-from ..schemas import ThreadOut, MessageOut, InsightsResponse, UnsubscribeOptions, MessageBodyResponse
-from ..services.imap_client import ImapClient
-from ..services.crypto import decrypt
+from ..db import DB_ASYNC, get_async_db, get_db
+from ..models import Account, FolderState, Thread, Message, Subscription
+from ..schemas import AttachmentOut, ThreadOut, MessageOut, InsightsResponse, UnsubscribeOptions, MessageBodyResponse
+from ..services.archive import rehydrate
+from ..services.async_imap_client import pooled
+from ..services.attachments import RangeNotSatisfiable, parse_range, probe_layout, stream_part
+from ..services.body_cache import CacheKey, body_cache
+from ..services.imap_pool import PoolTimeout
+from ..services.imap_protocol import find_attachments
+from ..services.mime_stream import BodyExtractor
+from ..services.pagination import NEXT_CURSOR_HEADER, InvalidCursor, decode_cursor, keyset_page, keyset_page_async
+from ..services.search import index_body
 from ..services.classifier import guess_category
 from ..services.ai import summarize as ai_summarize, extract_actions as ai_actions, draft_reply as ai_draft
 from ..services.unsubscribe import parse_list_unsubscribe
 
 router = APIRouter(prefix="/threads", tags=["threads"])
 
+MAX_PAGE_SIZE = 500
+
+THREAD_ORDER = [Thread.priority_score, Thread.last_message_at, Thread.id]
+MESSAGE_ORDER = [Message.date, Message.id]
+
+
+def _read_route(path: str, async_handler, **kwargs):
+    """Like ``router.get``, but registers ``async_handler`` instead with ``MAILPILOT_DB_ASYNC=1``.
+
+    Those routes then read through an ``AsyncSession`` on the event loop and
+    do not compete with blocking work (IMAP, syncs) for threadpool workers.
+    """
+    def register(handler):
+        router.get(path, **kwargs)(async_handler if DB_ASYNC else handler)
+        return handler
+    return register
+
+
+async def list_threads_async(
+    account_id: int,
+    response: Response,
+    limit: int = Query(200, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Threads by priority, newest first; the next page's cursor is sent as ``X-Next-Cursor``."""
+    after = _decode(cursor, int, datetime, int)
+    threads, next_cursor = await keyset_page_async(
+        db, select(Thread).where(Thread.account_id == account_id), THREAD_ORDER, after, limit
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return threads
+
+
+@_read_route("/account/{account_id}", list_threads_async, response_model=list[ThreadOut])
+def list_threads(
+    account_id: int,
+    response: Response,
+    limit: int = Query(200, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+):
+    """Threads by priority, newest first; the next page's cursor is sent as ``X-Next-Cursor``."""
+    after = _decode(cursor, int, datetime, int)
+    threads, next_cursor = keyset_page(db.query(Thread).filter(Thread.account_id == account_id), THREAD_ORDER, after, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return threads
 
-@router.get("/account/{account_id}", response_model=list[ThreadOut])
-def list_threads(account_id: int, db: Session = Depends(get_db)):
-    return (
-        db.query(Thread)
-        .filter(Thread.account_id == account_id)
-        .order_by(Thread.priority_score.desc(), Thread.last_message_at.desc().nullslast())
-        .limit(200)
-        .all()
+
+async def thread_messages_async(
+    thread_id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    after = _decode(cursor, datetime, int)
+    thread = await db.get(Thread, thread_id)
+    if not thread:
+        raise HTTPException(status_code=404, detail="Thread not found")
+    messages, next_cursor = await keyset_page_async(
+        db, select(Message).where(Message.thread_id == thread_id), MESSAGE_ORDER, after, limit
     )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return await asyncio.to_thread(rehydrate, thread.account_id, messages)
 
 
-@router.get("/{thread_id}/messages", response_model=list[MessageOut])
-def thread_messages(thread_id: int, db: Session = Depends(get_db)):
+@_read_route("/{thread_id}/messages", thread_messages_async, response_model=list[MessageOut])
+def thread_messages(
+    thread_id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+):
+    after = _decode(cursor, datetime, int)
     thread = db.query(Thread).filter(Thread.id == thread_id).first()
     if not thread:
         raise HTTPException(status_code=404, detail="Thread not found")
-    return (
-        db.query(Message)
-        .filter(Message.thread_id == thread_id)
-        .order_by(Message.date.desc().nullslast())
-        .all()
+    messages, next_cursor = keyset_page(
+        db.query(Message).filter(Message.thread_id == thread_id), MESSAGE_ORDER, after, limit
     )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rehydrate(thread.account_id, messages)
 
 
-@router.get("/messages/{message_id}/body", response_model=MessageBodyResponse)
-def message_body(message_id: int, db: Session = Depends(get_db)):
-    message = db.query(Message).filter(Message.id == message_id).first()
+def _decode(cursor: str | None, *types: type) -> list | None:
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor, *types)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _load_message(db: Session, message_id: int) -> tuple[Message, Account, int | None]:
+    """The message, its account and its folder's known UIDVALIDITY.
+
+    Everything the IMAP routes read from the database, loaded in one go so
+    they can run it in a worker thread instead of on the event loop.
+    """
+    message = db.get(Message, message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     account = message.thread.account
-    password = decrypt(account.password_enc)
+    state = db.query(FolderState).filter(FolderState.account_id == account.id, FolderState.folder == message.folder).first()
+    return message, account, state.uidvalidity if state else None
+
+
+def _index_body(db: Session, message_id: int, body: str) -> None:
+    index_body(db, message_id, body)
+    db.commit()
+
+
+@router.get("/messages/{message_id}/body", response_model=MessageBodyResponse)
+async def message_body(message_id: int, db: Session = Depends(get_db)):
+    message, account, known_uidvalidity = await asyncio.to_thread(_load_message, db, message_id)
+    if known_uidvalidity is not None:
+        cached = await asyncio.to_thread(body_cache.get, CacheKey(account.id, message.folder, known_uidvalidity, message.imap_uid))
+        if cached is not None:
+            return MessageBodyResponse(body=cached)
+    extractor = BodyExtractor()
     try:
-        with ImapClient(account.imap_host, account.imap_port, account.imap_tls) as imap:
-            imap.login(account.email, password)
-            imap.select_inbox()
-            body = imap.fetch_body(message.imap_uid)
+        async with pooled(account, message.folder) as imap:
+            body = await imap.fetch_body(message.imap_uid, extractor)
+            uidvalidity = imap.uidvalidity
+    except PoolTimeout as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Failed to fetch body: {exc}")
+    if uidvalidity is not None:
+        key = CacheKey(account.id, message.folder, uidvalidity, message.imap_uid)
+        await asyncio.to_thread(body_cache.put, key, extractor.digest, body)
+    await asyncio.to_thread(_index_body, db, message.id, body)
     return MessageBodyResponse(body=body)
 
 
+@router.get("/messages/{message_id}/attachments", response_model=list[AttachmentOut])
+async def message_attachments(message_id: int, db: Session = Depends(get_db)):
+    message, account, _ = await asyncio.to_thread(_load_message, db, message_id)
+    try:
+        async with pooled(account, message.folder) as imap:
+            structure = await imap.fetch_structure(message.imap_uid)
+    except PoolTimeout as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch attachments: {exc}")
+    return [
+        AttachmentOut(section=part.section, filename=part.filename, content_type=part.content_type, encoding=part.encoding, size=part.size)
+        for part in find_attachments(structure)
+    ]
+
+
+@router.get("/messages/{message_id}/attachments/{section}")
+async def download_attachment(
+    message_id: int,
+    section: str,
+    range_header: str | None = Header(default=None, alias="Range"),
+    db: Session = Depends(get_db),
+):
+    message, account, _ = await asyncio.to_thread(_load_message, db, message_id)
+    uid = message.imap_uid
+    # The connection stays leased while the response streams and is returned by it.
+    stack = AsyncExitStack()
+    try:
+        imap = await stack.enter_async_context(pooled(account, message.folder))
+        part = next((part for part in find_attachments(await imap.fetch_structure(uid)) if part.section == section), None)
+        if part is None:
+            raise HTTPException(status_code=404, detail="Attachment not found")
+        layout = await probe_layout(imap, uid, part)
+        byte_range = parse_range(range_header, layout.size)
+    except HTTPException:
+        await stack.aclose()
+        raise
+    except RangeNotSatisfiable:
+        await stack.aclose()
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{layout.size}"})
+    except PoolTimeout as exc:
+        await stack.aclose()
+        raise HTTPException(status_code=503, detail=str(exc))
+    except Exception as exc:
+        await stack.aclose()
+        raise HTTPException(status_code=500, detail=f"Failed to fetch attachment: {exc}")
+
+    start, end = byte_range or (0, None)
+
+    async def content():
+        try:
+            async for chunk in stream_part(imap, uid, part, layout, start, end):
+                yield chunk
+        finally:
+            await stack.aclose()
+
+    filename = part.filename or f"part-{section}"
+    headers = {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"}
+    if layout.size is not None:
+        headers["Accept-Ranges"] = "bytes"
+        headers["Content-Length"] = str(layout.size)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{layout.size}"
+        headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(content(), status_code=206 if byte_range else 200, media_type=part.content_type, headers=headers)
+
+
+@router.get("/body-cache")
+def body_cache_stats():
+    return body_cache.stats()
+
+
 @router.get("/{thread_id}/insights", response_model=InsightsResponse)
 def thread_insights(thread_id: int, db: Session = Depends(get_db)):
     thread = db.query(Thread).filter(Thread.id == thread_id).first()
     if not thread:
         raise HTTPException(status_code=404, detail="Thread not found")
-    last_msg = (
-        db.query(Message)
-        .filter(Message.thread_id == thread_id)
-        .order_by(Message.date.desc().nullslast())
-        .first()
-    )
     subject = thread.subject
-    snippet = last_msg.snippet if last_msg else None
+    snippet = thread.last_snippet
     summary = f"Zusammenfassung: {subject or 'Ohne Betreff'}"
     actions = ["Antwort vorbereiten", "Falls nötig archivieren"]
     labels = [guess_category(subject, snippet, thread.is_newsletter)]
     return InsightsResponse(summary=summary, actions=actions, labels=labels)
 
 
-@router.get("/newsletters/{account_id}")
+async def newsletters_async(account_id: int, db: AsyncSession = Depends(get_async_db)):
+    subs = await db.scalars(select(Subscription).where(Subscription.account_id == account_id))
+    return [{"id": sub.id, "sender": sub.sender, "list_unsubscribe": sub.list_unsubscribe} for sub in subs]
+
+
+@_read_route("/newsletters/{account_id}", newsletters_async)
 def newsletters(account_id: int, db: Session = Depends(get_db)):
     subs = db.query(Subscription).filter(Subscription.account_id == account_id).all()
     return [{"id": sub.id, "sender": sub.sender, "list_unsubscribe": sub.list_unsubscribe} for sub in subs]
@@ -93,8 +278,7 @@ def ai_summary(thread_id: int, db: Session = Depends(get_db)):
     thread = db.query(Thread).filter(Thread.id == thread_id).first()
     if not thread:
         raise HTTPException(status_code=404, detail="Thread not found")
-    last_msg = db.query(Message).filter(Message.thread_id == thread_id).order_by(Message.date.desc().nullslast()).first()
-    result = ai_summarize(thread.subject, last_msg.snippet if last_msg else None, None)
+    result = ai_summarize(thread.subject, thread.last_snippet, None)
     return {"result": result}
 
 
@@ -103,8 +287,7 @@ def ai_actions_endpoint(thread_id: int, db: Session = Depends(get_db)):
     thread = db.query(Thread).filter(Thread.id == thread_id).first()
     if not thread:
         raise HTTPException(status_code=404, detail="Thread not found")
-    last_msg = db.query(Message).filter(Message.thread_id == thread_id).order_by(Message.date.desc().nullslast()).first()
-    result = ai_actions(thread.subject, last_msg.snippet if last_msg else None, None)
+    result = ai_actions(thread.subject, thread.last_snippet, None)
     return {"result": result}
 
 
@@ -113,6 +296,5 @@ def ai_draft_endpoint(thread_id: int, payload: dict, db: Session = Depends(get_d
     thread = db.query(Thread).filter(Thread.id == thread_id).first()
     if not thread:
         raise HTTPException(status_code=404, detail="Thread not found")
-    last_msg = db.query(Message).filter(Message.thread_id == thread_id).order_by(Message.date.desc().nullslast()).first()
-    result = ai_draft(thread.subject, last_msg.snippet if last_msg else None, None, payload.get("language"))
+    result = ai_draft(thread.subject, thread.last_snippet, None, payload.get("language"))
     return {"result": result}
@@ -31,6 +31,18 @@ class AccountOut(BaseModel):
 
 class SyncRequest(BaseModel):
     limit: int = 50
+    # None syncs every folder found via LIST (see services.sync.discover_folders).
+    folders: list[str] | None = None
+
+
+class BackfillRequest(BaseModel):
+    # None backfills every folder found via LIST.
+    folders: list[str] | None = None
+
+
+class ArchiveRequest(BaseModel):
+    # None uses MAILPILOT_ARCHIVE_AFTER_DAYS.
+    older_than_days: int | None = Field(None, ge=1)
 
 
 class ThreadOut(BaseModel):
@@ -41,6 +53,10 @@ class ThreadOut(BaseModel):
     priority_score: int
     priority_reason: str
     is_newsletter: bool
+    last_snippet: str | None = None
+    last_from: str | None = None
+    message_count: int = 0
+    unread_count: int = 0
 
     class Config:
         from_attributes = True
@@ -48,6 +64,7 @@ class ThreadOut(BaseModel):
 
 class MessageOut(BaseModel):
     id: int
+    folder: str = "INBOX"
     imap_uid: int
     message_id: str | None
     in_reply_to: str | None
@@ -58,6 +75,7 @@ class MessageOut(BaseModel):
     date: datetime | None
     list_unsubscribe: str | None
     snippet: str | None
+    is_seen: bool = False
 
     class Config:
         from_attributes = True
@@ -92,6 +110,36 @@ class MessageBodyResponse(BaseModel):
     body: str
 
 
+class AttachmentOut(BaseModel):
+    section: str
+    filename: str | None = None
+    content_type: str
+    encoding: str
+    size: int
+
+
+class SearchResultOut(BaseModel):
+    id: int
+    thread_id: int
+    subject: str | None
+    from_addr: str | None
+    date: datetime | None
+    snippet: str | None
+    rank: float
+
+
+class CountsOut(BaseModel):
+    threads: int = 0
+    unread_threads: int = 0
+    messages: int = 0
+    unread_messages: int = 0
+    newsletters: int = 0
+
+
+class CountersOut(CountsOut):
+    categories: dict[str, CountsOut] = {}
+
+
 class AiRequest(BaseModel):
     subject: str | None = None
     snippet: str | None = None
@@ -0,0 +1,185 @@
+import json
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from ..models import Message, Thread
+from .body_cache import _compress, _decompress, zstandard
+
+ARCHIVE_DIR = os.getenv("MAILPILOT_ARCHIVE_DIR", "./archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("MAILPILOT_ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_COMPRESSION = os.getenv("MAILPILOT_ARCHIVE_COMPRESSION", "zstd").lower()
+
+# Moved to the segments; the stub keeps id, thread, folder, UID, date and flags.
+ARCHIVED_COLUMNS = (
+    "message_id",
+    "in_reply_to",
+    "references",
+    "from_addr",
+    "to_addr",
+    "subject",
+    "list_unsubscribe",
+    "snippet",
+)
+
+
+class SegmentStore:
+    """Append-only, compressed segment files of archived message columns, per account.
+
+    Every archival run writes one new segment ``<account>/<n>.seg``: one
+    compressed JSON frame per thread, so opening a thread decompresses only
+    its own messages. The index ``<n>.idx`` maps message ids to the
+    ``[offset, length]`` of their frame. Segments are never rewritten; data
+    of stubs that are deleted later stays in them.
+    """
+
+    def __init__(self, directory: str = ARCHIVE_DIR, compression: str = ARCHIVE_COMPRESSION):
+        self.directory = Path(directory)
+        if compression == "zstd" and zstandard is None:
+            compression = "zlib"
+        self.compression = compression
+
+    def write(self, account_id: int, frames: list[list[dict[str, Any]]]) -> int:
+        """Store ``frames`` (lists of archived rows with their ``id``) as a new segment; its number."""
+        directory = self.directory / str(account_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        number, segment = _create_segment(directory)
+        index: dict[int, list[int]] = {}
+        with segment:
+            offset = 0
+            for rows in frames:
+                data = _compress(json.dumps(rows).encode("utf-8"), self.compression)
+                segment.write(data)
+                for row in rows:
+                    index[row["id"]] = [offset, len(data)]
+                offset += len(data)
+            segment.flush()
+            os.fsync(segment.fileno())
+        # The stubs are committed after this returns, so both files have to be on disk.
+        _write_durable(directory / f"{number:08d}.idx", json.dumps(index).encode())
+        return number
+
+    def read(self, account_id: int, segment: int, message_ids: set[int]) -> dict[int, dict[str, Any]]:
+        """The archived rows of ``message_ids`` stored in ``segment``."""
+        base = self.directory / str(account_id) / f"{segment:08d}"
+        index = _read_index(str(base.with_suffix(".idx")))
+        frames = {tuple(index[message_id]) for message_id in message_ids if message_id in index}
+        rows: dict[int, dict[str, Any]] = {}
+        with open(base.with_suffix(".seg"), "rb") as file:
+            for offset, length in sorted(frames):
+                file.seek(offset)
+                for row in json.loads(_decompress(file.read(length))):
+                    if row["id"] in message_ids:
+                        rows[row["id"]] = row
+        return rows
+
+
+def _create_segment(directory: Path):
+    numbers = [int(path.stem) for path in directory.glob("*.seg") if path.stem.isdigit()]
+    number = max(numbers, default=0) + 1
+    while True:
+        try:
+            return number, open(directory / f"{number:08d}.seg", "xb")
+        except FileExistsError:  # another worker process archived this account meanwhile
+            number += 1
+
+
+def _write_durable(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.tmp")
+    with open(tmp, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+
+@lru_cache(maxsize=256)
+def _read_index(path: str) -> dict[int, list[int]]:
+    # Segments are immutable, so their parsed indexes can be kept.
+    with open(path, "rb") as file:
+        return {int(message_id): location for message_id, location in json.load(file).items()}
+
+
+segments = SegmentStore()
+
+
+def archive_messages(
+    db: Session, account_id: int, before: datetime, limit: int = 1000, store: SegmentStore = segments
+) -> int:
+    """Move up to ``limit`` messages dated before ``before`` into a new segment; the number moved.
+
+    Their archived columns are cleared, leaving stubs; their search index
+    entries stay as they are. A thread's latest message stays hot, as the
+    thread list shows it. Call under the account write lock and commit
+    afterwards.
+    """
+    rows = db.execute(
+        select(Message.id, Message.thread_id, *(getattr(Message, column) for column in ARCHIVED_COLUMNS))
+        .join(Thread, Thread.id == Message.thread_id)
+        .where(
+            Thread.account_id == account_id,
+            Message.date < before,
+            Message.archive_segment.is_(None),
+            Message.id != func.coalesce(Thread.last_message_id, 0),
+        )
+        .order_by(Message.thread_id, Message.id)
+        .limit(limit)
+    ).all()
+    if not rows:
+        return 0
+    frames: dict[int, list[dict[str, Any]]] = {}
+    for row in rows:
+        frames.setdefault(row.thread_id, []).append({"id": row.id, **{column: getattr(row, column) for column in ARCHIVED_COLUMNS}})
+    segment = store.write(account_id, list(frames.values()))
+    ids = [row.id for row in rows]
+    db.execute(
+        update(Message),
+        [{"id": message_id, "archive_segment": segment, **dict.fromkeys(ARCHIVED_COLUMNS)} for message_id in ids],
+    )
+    return len(ids)
+
+
+def archive_cutoff(days: int = ARCHIVE_AFTER_DAYS) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+
+def rehydrate(account_id: int, messages: list[Message], store: SegmentStore = segments) -> list[Any]:
+    """``messages`` for a response, stubs with their archived columns read back from the segments.
+
+    Stubs are returned as dicts and the database is left as it is: an opened
+    thread does not make its old mail hot again.
+    """
+    archived = read_archived(account_id, [(message.id, message.archive_segment) for message in messages], store)
+    if not archived:
+        return messages
+    return [
+        message
+        if message.archive_segment is None
+        else {**{column.key: getattr(message, column.key) for column in Message.__table__.columns}, **archived.get(message.id, {})}
+        for message in messages
+    ]
+
+
+def rehydrate_results(account_id: int, rows: list[dict[str, Any]], store: SegmentStore = segments) -> list[dict[str, Any]]:
+    """``rehydrate`` for result rows (dicts with ``id`` and ``archive_segment``), e.g. search hits."""
+    archived = read_archived(account_id, [(row["id"], row["archive_segment"]) for row in rows], store)
+    return [{**row, **{key: value for key, value in archived.get(row["id"], {}).items() if key in row}} for row in rows]
+
+
+def read_archived(
+    account_id: int, messages: list[tuple[int, int | None]], store: SegmentStore = segments
+) -> dict[int, dict[str, Any]]:
+    """The archived columns of the stubs among ``messages`` (``(id, archive_segment)`` pairs), by id."""
+    by_segment: dict[int, set[int]] = {}
+    for message_id, segment in messages:
+        if segment is not None:
+            by_segment.setdefault(segment, set()).add(message_id)
+    archived: dict[int, dict[str, Any]] = {}
+    for segment, message_ids in by_segment.items():
+        archived.update(store.read(account_id, segment, message_ids))
+    return archived
@@ -0,0 +1,434 @@
+import asyncio
+import imaplib
+import re
+import ssl
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from ..models import Account
+from .crypto import decrypt
+
+from .imap_client import (
+    DEFAULT_FETCH_BATCH_SIZE,
+    ImapClient,
+    DEFAULT_SNIPPET_BYTES,
+    BODY_READ_CHUNK,
+    HEADER_FETCH_ITEMS,
+    FolderChanges,
+    ImapAuthenticationError,
+    _apply_snippets,
+    _changes_fetch_items,
+    _date_window_criteria,
+    _group_by_section,
+    _parse_flags,
+    _parse_header_fetch,
+    _parse_internaldate,
+    _parse_vanished,
+    _partial_fetch_items,
+    _partial_from_fetch,
+    _quote_mailbox,
+    _snippet_fetch_items,
+    _structure_from_fetch,
+)
+from .imap_pool import ImapConnectionPool, pool as imap_pool
+from .imap_protocol import Folder, chunked, compress_uid_set, parse_list_response
+from .imap_compress import IMAP_COMPRESS, AsyncTrafficStream
+from .mime_stream import BodyExtractor
+
+_UNTAGGED_RE = re.compile(rb"(?:(?P<num>\d+) )?(?P<type>[A-Za-z-]+)(?: (?P<data>.*))?$", re.S)
+_RESPONSE_CODE_RE = re.compile(rb"\[(?P<type>[A-Za-z-]+)(?: (?P<data>[^\]]*))?\]")
+_LITERAL_RE = re.compile(rb".*\{(?P<size>\d+)\}$", re.S)
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class AsyncImapConnection:
+    """IMAP4rev1 command/response handling on asyncio streams.
+
+    Results have the same shape as ``imaplib``'s: ``(status, data)`` with
+    untagged data collected per response type (literals become
+    ``(prefix, literal)`` tuples) and response codes such as ``UIDVALIDITY``
+    available through ``response()``. That lets the parsers shared with
+    ``ImapClient`` work unchanged.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader | AsyncTrafficStream, writer: asyncio.StreamWriter | AsyncTrafficStream, timeout: float = 30.0):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.capabilities: tuple[str, ...] = ()
+        self.untagged_responses: dict[str, list[Any]] = {}
+        self._tag = 0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, host: str, port: int, tls: bool, timeout: float = 30.0) -> "AsyncImapConnection":
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl.create_default_context() if tls else None, limit=2 ** 20),
+            timeout,
+        )
+        stream = AsyncTrafficStream(reader, writer)
+        conn = cls(stream, stream, timeout)
+        greeting = await conn._readline()
+        if not greeting.startswith(b"* OK") and not greeting.startswith(b"* PREAUTH"):
+            conn.writer.close()
+            raise imaplib.IMAP4.error(f"Unexpected greeting: {greeting!r}")
+        await conn.capability()
+        return conn
+
+    async def command(self, name: str, *args: str, sink: Callable[[bytes], None] | None = None) -> tuple[str, list[Any]]:
+        """Run a command; returns the tagged status and the tagged response text.
+
+        With ``sink``, literals are passed to it chunk by chunk as they arrive
+        and stored as empty bytes instead of being buffered.
+        """
+        async with self._lock:
+            for typ in ("OK", "NO", "BAD"):
+                self.untagged_responses.pop(typ, None)
+            self._tag += 1
+            tag = f"M{self._tag:04d}".encode()
+            self.writer.write(tag + b" " + " ".join((name, *args)).encode() + b"\r\n")
+            await self.writer.drain()
+            while True:
+                line = await self._readline()
+                if line.startswith(tag + b" "):
+                    status, _, text = line[len(tag) + 1:].partition(b" ")
+                    self._store_response_code(text)
+                    status_text = status.decode("ascii", errors="replace").upper()
+                    if status_text == "BAD":
+                        raise imaplib.IMAP4.error(f"{name} command error: {text.decode(errors='replace')}")
+                    return status_text, [text]
+                if line.startswith(b"* "):
+                    await self._handle_untagged(line[2:], sink)
+                elif line.startswith(b"+"):
+                    raise imaplib.IMAP4.abort(f"Unexpected continuation for {name}")
+
+    async def capability(self) -> tuple[str, list[Any]]:
+        status, data = self._untagged(await self.command("CAPABILITY"), "CAPABILITY")
+        if status == "OK" and data and data[-1]:
+            self.capabilities = tuple(data[-1].decode().upper().split())
+        return status, data
+
+    async def uid(self, command: str, *args: str, sink: Callable[[bytes], None] | None = None) -> tuple[str, list[Any]]:
+        command = command.upper()
+        result = await self.command("UID", command, *(arg for arg in args if arg is not None), sink=sink)
+        return self._untagged(result, command if command in ("SEARCH", "SORT", "THREAD") else "FETCH")
+
+    async def compress(self) -> bool:
+        """Negotiate COMPRESS=DEFLATE (RFC 4978); needs an ``AsyncTrafficStream``."""
+        status, _ = await self.command("COMPRESS", "DEFLATE")
+        if status != "OK":
+            return False
+        self.reader.start_deflate()
+        return True
+
+    def response(self, code: str) -> tuple[str, list[Any]]:
+        return code, self.untagged_responses.pop(code.upper(), [None])
+
+    async def logout(self) -> None:
+        try:
+            await asyncio.wait_for(self.command("LOGOUT"), self.timeout)
+        finally:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+
+    def _untagged(self, result: tuple[str, list[Any]], name: str) -> tuple[str, list[Any]]:
+        status, data = result
+        if status == "NO":
+            return status, data
+        return status, self.untagged_responses.pop(name, [None])
+
+    async def _handle_untagged(self, line: bytes, sink: Callable[[bytes], None] | None = None) -> None:
+        match = _UNTAGGED_RE.match(line)
+        if not match:
+            return
+        typ = match.group("type").decode().upper()
+        data = match.group("data")
+        if match.group("num"):
+            data = match.group("num") + (b" " + data if data else b"")
+        if typ in ("OK", "NO", "BAD", "PREAUTH", "BYE") and data:
+            self._store_response_code(data)
+        # Like imaplib: every literal becomes a (prefix, literal) tuple and the
+        # line continuing the response is appended as the next entry.
+        while data is not None and (literal := _LITERAL_RE.match(data)):
+            size = int(literal.group("size"))
+            if sink is None:
+                payload = await asyncio.wait_for(self.reader.readexactly(size), self.timeout)
+            else:
+                payload = b""
+                while size:
+                    chunk = await asyncio.wait_for(self.reader.readexactly(min(size, BODY_READ_CHUNK)), self.timeout)
+                    size -= len(chunk)
+                    sink(chunk)
+            self.untagged_responses.setdefault(typ, []).append((data, payload))
+            data = await self._readline()
+        self.untagged_responses.setdefault(typ, []).append(data)
+
+    def _store_response_code(self, text: bytes) -> None:
+        match = _RESPONSE_CODE_RE.match(text)
+        if match:
+            self.untagged_responses.setdefault(match.group("type").decode().upper(), []).append(match.group("data"))
+
+    async def _readline(self) -> bytes:
+        line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed by server")
+        return line.rstrip(b"\r\n")
+
+
+class AsyncImapClient:
+    """asyncio counterpart of ``ImapClient`` with the same method surface.
+
+    Connections are not pooled, but each one holds a slot of ``pool``'s
+    per-host cap while open, so blocking and async connections together stay
+    within ``MAILPILOT_IMAP_POOL_MAX_PER_HOST`` whichever thread or event loop
+    opened them (waiting up to ``MAILPILOT_IMAP_POOL_WAIT_TIMEOUT`` before
+    raising ``PoolTimeout``).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 993,
+        tls: bool = True,
+        fetch_batch_size: int = DEFAULT_FETCH_BATCH_SIZE,
+        snippet_bytes: int = DEFAULT_SNIPPET_BYTES,
+        timeout: float = 30.0,
+        compress: bool = IMAP_COMPRESS,
+        pool: ImapConnectionPool = imap_pool,
+    ):
+        self.host = host
+        self.port = port
+        self.tls = tls
+        self.fetch_batch_size = fetch_batch_size
+        self.snippet_bytes = snippet_bytes
+        self.timeout = timeout
+        self.compress = compress
+        self.conn: AsyncImapConnection | None = None
+        self.folder: str | None = None
+        self.uidvalidity: int | None = None
+        self.highest_modseq: int | None = None
+        self.qresync = False
+        self.pool = pool
+        self._slot = False
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def connect(self) -> None:
+        reserving = asyncio.ensure_future(asyncio.to_thread(self.pool.reserve_slot, self.host))
+        try:
+            await asyncio.shield(reserving)
+        except asyncio.CancelledError:
+            # The reservation completes in its thread regardless; give the slot back once it has.
+            reserving.add_done_callback(lambda done: done.exception() or self.pool.release_slot(self.host))
+            raise
+        try:
+            self.conn = await AsyncImapConnection.open(self.host, self.port, self.tls, self.timeout)
+        except BaseException:
+            self.pool.release_slot(self.host)
+            raise
+        self._slot = True
+
+    async def close(self) -> None:
+        if self.conn:
+            try:
+                await self.conn.logout()
+            except Exception:
+                pass
+            self.conn = None
+            self.folder = None
+        if self._slot:
+            self.pool.release_slot(self.host)
+            self._slot = False
+
+    async def login(self, email_addr: str, password: str) -> None:
+        conn = self._connection()
+        status, data = await conn.command("LOGIN", _quote(email_addr), _quote(password))
+        if status != "OK":
+            message = data[-1].decode(errors="replace") if data and data[-1] else "LOGIN failed"
+            if "AUTH" in message.upper():
+                raise ImapAuthenticationError(message)
+            raise imaplib.IMAP4.error(message)
+        await conn.capability()
+        if self.compress and self.supports("COMPRESS=DEFLATE") and isinstance(conn.reader, AsyncTrafficStream):
+            await conn.compress()
+        if self.supports("QRESYNC") and self.supports("ENABLE"):
+            status, _ = await conn.command("ENABLE", "QRESYNC")
+            self.qresync = status == "OK"
+
+    def supports(self, capability: str) -> bool:
+        return bool(self.conn) and capability.upper() in self.conn.capabilities
+
+    async def select_inbox(self) -> None:
+        await self.select_folder("INBOX")
+
+    async def select_folder(self, folder: str) -> None:
+        conn = self._connection()
+        args = [_quote_mailbox(folder)]
+        if self.supports("CONDSTORE") and not self.qresync:
+            args.append("(CONDSTORE)")
+        status, _ = await conn.command("SELECT", *args)
+        if status != "OK":
+            raise RuntimeError(f"Failed to select {folder}")
+        self.folder = folder
+        _, data = conn.response("UIDVALIDITY")
+        self.uidvalidity = int(data[0]) if data and data[0] else None
+        _, data = conn.response("HIGHESTMODSEQ")
+        self.highest_modseq = int(data[0]) if data and data[0] else None
+
+    async def list_folders(self) -> list[Folder]:
+        conn = self._connection()
+        status, _ = await conn.command("LIST", '""', "*")
+        if status != "OK":
+            raise RuntimeError("Failed to list folders")
+        return parse_list_response(conn.untagged_responses.pop("LIST", []))
+
+    async def test_connection(self, email_addr: str, password: str) -> None:
+        await self.login(email_addr, password)
+        await self.select_inbox()
+
+    async def fetch_latest(self, limit: int = 50) -> list[dict[str, Any]]:
+        uids = await self._search_uids("ALL")
+        if limit and len(uids) > limit:
+            uids = uids[-limit:]
+        return await self._fetch_uids(uids)
+
+    async def fetch_since(self, last_uid: int, limit: int = 50) -> list[dict[str, Any]]:
+        """See ``ImapClient.fetch_since``: the oldest ``limit`` UIDs above ``last_uid``."""
+        uids = sorted(int(uid) for uid in await self._search_uids(f"UID {last_uid + 1}:*") if int(uid) > last_uid)
+        return await self._fetch_uids(uids[:limit] if limit else uids)
+
+    async def fetch_uids(self, uids: list[int]) -> list[dict[str, Any]]:
+        return await self._fetch_uids(uids)
+
+    async def search_dates(self, since: date | None, before: date) -> list[int]:
+        return sorted(int(uid) for uid in await self._search_uids(_date_window_criteria(since, before)))
+
+    async def first_message_date(self) -> datetime | None:
+        conn = self._connection()
+        try:
+            status, _ = await conn.command("FETCH", "1", "(UID INTERNALDATE)")
+        except imaplib.IMAP4.abort:
+            raise
+        except imaplib.IMAP4.error:  # some servers answer BAD for an empty folder
+            return None
+        msg_data = conn.untagged_responses.pop("FETCH", [])
+        return _parse_internaldate(msg_data) if status == "OK" else None
+
+    async def fetch_changes(
+        self, last_uid: int, modseq: int | None, known_uids: Callable[[], Awaitable[set[int]]]
+    ) -> FolderChanges:
+        """See ``ImapClient.fetch_changes``; ``known_uids`` is awaited only when needed."""
+        conn = self._connection()
+        if not last_uid:
+            return FolderChanges({}, set())
+        condstore = modseq is not None and self.highest_modseq is not None
+        if condstore and self.highest_modseq == modseq:
+            return FolderChanges({}, set())
+
+        status, msg_data = await conn.uid("fetch", f"1:{last_uid}", _changes_fetch_items(modseq if condstore else None, self.qresync))
+        flags = _parse_flags(msg_data) if status == "OK" else {}
+        if condstore and self.qresync:
+            _, data = conn.response("VANISHED")
+            vanished = _parse_vanished(data, last_uid)
+        else:
+            present = {int(uid) for uid in await self._search_uids(f"UID 1:{last_uid}")}
+            vanished = {uid for uid in await known_uids() if uid <= last_uid and uid not in present}
+        return FolderChanges(flags, vanished)
+
+    async def fetch_structure(self, uid: int) -> Any:
+        status, msg_data = await self._connection().uid("fetch", str(uid), "(UID BODYSTRUCTURE)")
+        if status != "OK":
+            raise RuntimeError("Failed to fetch message structure")
+        return _structure_from_fetch(msg_data, uid)
+
+    async def fetch_partial(self, uid: int, section: str, offset: int, length: int) -> bytes:
+        status, msg_data = await self._connection().uid("fetch", str(uid), _partial_fetch_items(section, offset, length))
+        if status != "OK":
+            raise RuntimeError("Failed to fetch message part")
+        return _partial_from_fetch(msg_data, uid, section)
+
+    async def fetch_body(self, uid: int, extractor: BodyExtractor | None = None) -> str:
+        extractor = extractor or BodyExtractor()
+        status, msg_data = await self._connection().uid("fetch", str(uid), "(RFC822)", sink=extractor.feed)
+        if status != "OK" or not any(isinstance(part, tuple) for part in msg_data or []):
+            raise RuntimeError("Failed to fetch message")
+        return extractor.close()
+
+    async def _search_uids(self, criteria: str) -> list[bytes]:
+        status, data = await self._connection().uid("search", criteria)
+        if status != "OK":
+            return []
+        return data[0].split() if data and data[0] else []
+
+    async def _fetch_uids(self, uids: list[bytes] | list[int]) -> list[dict[str, Any]]:
+        conn = self._connection()
+        results: list[dict[str, Any]] = []
+        for chunk in chunked(sorted((int(uid) for uid in uids), reverse=True), self.fetch_batch_size):
+            status, msg_data = await conn.uid("fetch", compress_uid_set(chunk), HEADER_FETCH_ITEMS)
+            if status != "OK" or not msg_data:
+                continue
+            fetched, text_parts = _parse_header_fetch(msg_data)
+            for section, section_uids in _group_by_section(text_parts).items():
+                status, msg_data = await conn.uid("fetch", compress_uid_set(section_uids), _snippet_fetch_items(section, self.snippet_bytes))
+                if status == "OK" and msg_data:
+                    _apply_snippets(fetched, text_parts, section, msg_data)
+            results.extend(sorted(fetched.values(), key=lambda msg: msg["uid"], reverse=True))
+        return results
+
+    def _connection(self) -> AsyncImapConnection:
+        if not self.conn:
+            raise RuntimeError("IMAP connection not initialized")
+        return self.conn
+
+
+@asynccontextmanager
+async def connect(account: Account, folder: str | None) -> AsyncIterator[AsyncImapClient]:
+    """A logged-in ``AsyncImapClient`` with ``folder`` selected (``None`` selects nothing)."""
+    async with AsyncImapClient(account.imap_host, account.imap_port, account.imap_tls) as imap:
+        await imap.login(account.email, decrypt(account.password_enc))
+        if folder is not None:
+            await imap.select_folder(folder)
+        yield imap
+
+
+class PooledImap:
+    """Awaitable view of a blocking ``ImapClient`` leased from ``ImapConnectionPool``.
+
+    Offers the fetch methods the body and attachment routes need; each
+    command runs in a worker thread.
+    """
+
+    def __init__(self, client: ImapClient):
+        self.client = client
+
+    @property
+    def uidvalidity(self) -> int | None:
+        return self.client.uidvalidity
+
+    async def fetch_structure(self, uid: int) -> Any:
+        return await asyncio.to_thread(self.client.fetch_structure, uid)
+
+    async def fetch_partial(self, uid: int, section: str, offset: int, length: int) -> bytes:
+        return await asyncio.to_thread(self.client.fetch_partial, uid, section, offset, length)
+
+    async def fetch_body(self, uid: int, extractor: BodyExtractor | None = None) -> str:
+        return await asyncio.to_thread(self.client.fetch_body, uid, extractor)
+
+
+@asynccontextmanager
+async def pooled(account: Account, folder: str, pool: ImapConnectionPool = imap_pool) -> AsyncIterator[PooledImap]:
+    """Like ``connect``, but on a pooled connection: no TLS handshake or LOGIN when one is idle."""
+    async with pool.async_connection(account, folder) as client:
+        yield PooledImap(client)
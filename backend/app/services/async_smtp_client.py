@@ -0,0 +1,114 @@
+import asyncio
+import base64
+import smtplib
+import ssl
+from email.message import EmailMessage
+from email.policy import SMTP
+
+
+class AsyncSmtpClient:
+    """asyncio counterpart of ``SmtpClient`` (STARTTLS, AUTH PLAIN/LOGIN, one message per call).
+
+    Errors are raised as the matching ``smtplib`` exceptions.
+    """
+
+    def __init__(self, host: str, port: int = 587, tls: bool = True, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.tls = tls
+        self.timeout = timeout
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        self.features: dict[str, str] = {}
+
+    async def __aenter__(self):
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        try:
+            await self._expect(220)
+            await self._ehlo()
+            if self.tls:
+                await self._command("STARTTLS", 220)
+                await asyncio.wait_for(self.writer.start_tls(ssl.create_default_context()), self.timeout)
+                await self._ehlo()
+        except BaseException:
+            self.writer.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.writer:
+            try:
+                await self._command("QUIT", 221)
+            except Exception:
+                pass
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.reader = self.writer = None
+
+    async def login(self, email_addr: str, password: str) -> None:
+        mechanisms = self.features.get("auth", "").upper().split()
+        try:
+            if "PLAIN" in mechanisms or not mechanisms:
+                token = base64.b64encode(f"\0{email_addr}\0{password}".encode()).decode()
+                await self._command(f"AUTH PLAIN {token}", 235)
+            else:
+                await self._command("AUTH LOGIN", 334)
+                await self._command(base64.b64encode(email_addr.encode()).decode(), 334)
+                await self._command(base64.b64encode(password.encode()).decode(), 235)
+        except smtplib.SMTPResponseException as exc:
+            raise smtplib.SMTPAuthenticationError(exc.smtp_code, exc.smtp_error)
+
+    async def send_email(self, from_addr: str, to_addr: str, subject: str, body: str) -> None:
+        msg = EmailMessage()
+        msg["From"] = from_addr
+        msg["To"] = to_addr
+        msg["Subject"] = subject
+        msg.set_content(body)
+        await self._command(f"MAIL FROM:<{from_addr}>", 250)
+        await self._command(f"RCPT TO:<{to_addr}>", 250, 251)
+        await self._command("DATA", 354)
+        # Dot-stuffing (RFC 5321 4.5.2); the SMTP policy already uses CRLF line endings.
+        data = msg.as_bytes(policy=SMTP).replace(b"\r\n.", b"\r\n..")
+        if data.startswith(b"."):
+            data = b"." + data
+        if not data.endswith(b"\r\n"):
+            data += b"\r\n"
+        self._writer().write(data + b".\r\n")
+        await self._expect(250)
+
+    async def _ehlo(self) -> None:
+        lines = await self._command("EHLO localhost", 250)
+        self.features = {}
+        for line in lines[1:]:
+            keyword, _, params = line.partition(" ")
+            self.features[keyword.lower()] = params
+
+    async def _command(self, line: str, *expected: int) -> list[str]:
+        self._writer().write(line.encode() + b"\r\n")
+        return await self._expect(*expected)
+
+    async def _expect(self, *expected: int) -> list[str]:
+        await self._writer().drain()
+        code, lines = await self._read_reply()
+        if code not in expected:
+            raise smtplib.SMTPResponseException(code, "\n".join(lines).encode())
+        return lines
+
+    async def _read_reply(self) -> tuple[int, list[str]]:
+        lines: list[str] = []
+        while True:
+            raw = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not raw:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            lines.append(line[4:])
+            if len(line) < 4 or line[3] != "-":
+                return int(line[:3]), lines
+
+    def _writer(self) -> asyncio.StreamWriter:
+        if not self.writer:
+            raise RuntimeError("SMTP connection not initialized")
+        return self.writer
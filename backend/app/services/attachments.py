@@ -0,0 +1,192 @@
+import binascii
+import math
+import os
+import quopri
+import re
+from typing import Any, AsyncIterator, NamedTuple
+
+from .imap_protocol import BodyPart
+
+ATTACHMENT_CHUNK_BYTES = int(os.getenv("MAILPILOT_ATTACHMENT_CHUNK_BYTES", str(1024 * 1024)))
+
+IDENTITY_ENCODINGS = ("7bit", "8bit", "binary", "")
+# Enough of a base64 part to see how its lines are wrapped.
+_PROBE_BYTES = 4096
+
+_NON_BASE64_RE = re.compile(rb"[^A-Za-z0-9+/=]")
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+class PartLayout(NamedTuple):
+    """What is known about the decoded form of an encoded body part.
+
+    ``size`` is the decoded size, ``None`` if it cannot be derived without
+    decoding the whole part. A ``seekable`` part can be fetched from any
+    decoded offset: parts without transfer encoding directly, base64 parts
+    wrapped at a fixed width of ``line_chars`` (plus ``line_break``) through
+    their line number. Other parts are decoded from the start.
+    """
+
+    size: int | None
+    seekable: bool = False
+    line_chars: int = 0
+    line_break: int = 0
+
+    def seek(self, offset: int) -> tuple[int, int]:
+        """``(encoded offset to fetch from, decoded bytes to drop)`` for a decoded ``offset``."""
+        if not self.seekable:
+            return 0, offset
+        if not self.line_chars:
+            return offset, 0
+        decoded_per_line = self.line_chars // 4 * 3
+        line = offset // decoded_per_line
+        return line * (self.line_chars + self.line_break), offset - line * decoded_per_line
+
+
+class Base64Decoder:
+    """Decodes base64 fed in arbitrary chunks, e.g. as fetched from the server."""
+
+    def __init__(self):
+        self._rest = b""
+
+    def feed(self, data: bytes) -> bytes:
+        data = self._rest + _NON_BASE64_RE.sub(b"", data)
+        usable = len(data) - len(data) % 4
+        self._rest = data[usable:]
+        try:
+            return binascii.a2b_base64(data[:usable])
+        except binascii.Error:
+            return b""
+
+    def close(self) -> bytes:
+        return b""
+
+
+class QuotedPrintableDecoder:
+    """Decodes quoted-printable line by line; a soft line break may span chunks."""
+
+    def __init__(self):
+        self._rest = b""
+
+    def feed(self, data: bytes) -> bytes:
+        data = self._rest + data
+        end = data.rfind(b"\n") + 1
+        self._rest = data[end:]
+        return quopri.decodestring(data[:end])
+
+    def close(self) -> bytes:
+        data, self._rest = self._rest, b""
+        return quopri.decodestring(data)
+
+
+class IdentityDecoder:
+    def feed(self, data: bytes) -> bytes:
+        return data
+
+    def close(self) -> bytes:
+        return b""
+
+
+def parse_range(header: str | None, size: int | None) -> tuple[int, int] | None:
+    """The inclusive byte range requested by a ``Range`` header, ``None`` to send everything.
+
+    Only single ranges of parts with a known size are honoured; anything
+    else falls back to the full content, as RFC 9110 allows.
+    """
+    if not header or size is None:
+        return None
+    match = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", header)
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        start, end = max(0, size - int(last)), size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def decoder_for(encoding: str) -> Base64Decoder | QuotedPrintableDecoder | IdentityDecoder:
+    if encoding == "base64":
+        return Base64Decoder()
+    if encoding == "quoted-printable":
+        return QuotedPrintableDecoder()
+    return IdentityDecoder()
+
+
+def base64_layout(head: bytes, tail: bytes, size: int) -> PartLayout:
+    """Derive the decoded size and line width of a base64 part from its first and last bytes.
+
+    Encoders wrap base64 at a fixed width (76 characters for MIME), so all
+    complete lines in ``head`` having the same length is taken as the layout
+    of the whole part.
+    """
+    if len(head) >= size:
+        return PartLayout(len(Base64Decoder().feed(head)))
+    lines = head.split(b"\n")[:-1]
+    widths = {len(line.rstrip(b"\r")) for line in lines}
+    if len(widths) != 1:
+        return PartLayout(None)
+    line_chars = widths.pop()
+    line_break = 2 if lines[0].endswith(b"\r") else 1
+    if not line_chars or line_chars % 4:
+        return PartLayout(None)
+    stripped = tail.rstrip()
+    content = size - (len(tail) - len(stripped))
+    line_count = math.ceil((content + line_break) / (line_chars + line_break))
+    chars = content - line_break * (line_count - 1)
+    padding = len(stripped) - len(stripped.rstrip(b"="))
+    return PartLayout(chars // 4 * 3 - padding, True, line_chars, line_break)
+
+
+async def probe_layout(imap: Any, uid: int, part: BodyPart) -> PartLayout:
+    """Work out a part's ``PartLayout`` with at most two small partial fetches."""
+    if part.encoding in IDENTITY_ENCODINGS:
+        return PartLayout(part.size, True)
+    if part.encoding != "base64":
+        return PartLayout(None)
+    head = await imap.fetch_partial(uid, part.section, 0, _PROBE_BYTES)
+    tail = b"" if len(head) >= part.size else await imap.fetch_partial(uid, part.section, max(0, part.size - 8), 8)
+    return base64_layout(head, tail, part.size)
+
+
+async def stream_part(
+    imap: Any,
+    uid: int,
+    part: BodyPart,
+    layout: PartLayout,
+    start: int = 0,
+    end: int | None = None,
+    chunk_size: int = ATTACHMENT_CHUNK_BYTES,
+) -> AsyncIterator[bytes]:
+    """Yield decoded bytes ``start`` to ``end`` (inclusive) of a body part.
+
+    The part is fetched in ``BODY.PEEK[section]<offset.length>`` chunks and
+    decoded as it arrives, so at most one chunk is held in memory.
+    """
+    decoder = decoder_for(part.encoding)
+    offset, skip = layout.seek(start)
+    remaining = None if end is None else end - start + 1
+    while remaining is None or remaining > 0:
+        data = await imap.fetch_partial(uid, part.section, offset, chunk_size)
+        offset += len(data)
+        done = not data or (part.size and offset >= part.size)
+        decoded = decoder.feed(data) + (decoder.close() if done else b"")
+        if skip:
+            dropped = min(skip, len(decoded))
+            decoded = decoded[dropped:]
+            skip -= dropped
+        if remaining is not None:
+            decoded = decoded[:remaining]
+            remaining -= len(decoded)
+        if decoded:
+            yield decoded
+        if done:
+            return
@@ -0,0 +1,87 @@
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from ..models import Account, FolderState
+from .async_imap_client import AsyncImapClient
+from .imap_protocol import chunked
+from .sync import _known_uids, account_write_lock, get_folder_state, ingest_messages
+
+BACKFILL_WINDOW_DAYS = int(os.getenv("MAILPILOT_BACKFILL_WINDOW_DAYS", "30"))
+BACKFILL_PAUSE = float(os.getenv("MAILPILOT_BACKFILL_PAUSE", "1.0"))
+
+
+class FolderNotSynced(RuntimeError):
+    pass
+
+
+async def backfill_window(
+    db: Session,
+    account: Account,
+    imap: AsyncImapClient,
+    window_days: int = BACKFILL_WINDOW_DAYS,
+    pause: float = BACKFILL_PAUSE,
+) -> dict[str, Any] | None:
+    """Import the next older date window of the selected folder; ``None`` once it is complete.
+
+    Windows are walked newest first with ``SEARCH SINCE/BEFORE`` (INTERNALDATE,
+    whole days). The folder's checkpoint (``FolderState.backfill_before``) is
+    moved past a window only after all of it is stored, so an interrupted
+    backfill repeats at most one window; already stored UIDs are skipped.
+    UIDs above the sync high-water mark are left to the incremental sync,
+    which therefore never sees duplicates. ``pause`` seconds are slept after
+    every fetch batch to stay below provider rate limits.
+    """
+    folder = imap.folder or "INBOX"
+    state = await asyncio.to_thread(_load_backfill_state, db, account.id, folder, imap.uidvalidity)
+    if state.backfill_complete:
+        return None
+    before = (state.backfill_before or datetime.utcnow() + timedelta(days=1)).date()
+    since = before - timedelta(days=max(1, window_days))
+
+    known = await asyncio.to_thread(_known_uids, db, account.id, folder)
+    uids = [uid for uid in await imap.search_dates(since, before) if uid <= state.last_uid and uid not in known]
+    result: dict[str, Any] = {"fetched": 0, "messages_new": 0, "threads_new": 0}
+    for batch in chunked(sorted(uids, reverse=True), imap.fetch_batch_size):
+        messages = await imap.fetch_uids(list(batch))
+        stored = await asyncio.to_thread(_store_batch, db, account, folder, imap.uidvalidity, messages)
+        result["fetched"] += len(messages)
+        result["messages_new"] += stored["messages_new"]
+        result["threads_new"] += stored["threads_new"]
+        await asyncio.sleep(pause)
+
+    # Sequence number 1 is normally the oldest message; mail moved in later
+    # can be older, so the remaining history is checked once we pass it.
+    first = await imap.first_message_date()
+    complete = first is None or (since <= first.date() and not await imap.search_dates(None, since))
+    await asyncio.to_thread(_checkpoint, db, account.id, folder, imap.uidvalidity, since, complete)
+    result.update({"since": since.isoformat(), "before": before.isoformat(), "complete": complete})
+    return result
+
+
+def _load_backfill_state(db: Session, account_id: int, folder: str, uidvalidity: int | None) -> FolderState:
+    db.expire_all()
+    state = get_folder_state(db, account_id, folder)
+    if state.uidvalidity is None or state.uidvalidity != uidvalidity:
+        raise FolderNotSynced(f"{folder} has to be synced before it can be backfilled")
+    return state
+
+
+def _store_batch(db: Session, account: Account, folder: str, uidvalidity: int | None, messages: list[dict[str, Any]]) -> dict[str, Any]:
+    with account_write_lock(account.id):
+        # A sync may have seen a new UIDVALIDITY meanwhile; these UIDs would be stale.
+        _load_backfill_state(db, account.id, folder, uidvalidity)
+        result = ingest_messages(db, account, messages, folder)
+        db.commit()
+    return result
+
+
+def _checkpoint(db: Session, account_id: int, folder: str, uidvalidity: int | None, since: date, complete: bool) -> None:
+    with account_write_lock(account_id):
+        state = _load_backfill_state(db, account_id, folder, uidvalidity)
+        state.backfill_before = datetime.combine(since, datetime.min.time())
+        state.backfill_complete = complete
+        db.commit()
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, NamedTuple
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is used instead
+    zstandard = None
+
+BODY_CACHE_DIR = os.getenv("MAILPILOT_BODY_CACHE_DIR", "./body_cache")
+BODY_CACHE_MAX_BYTES = int(os.getenv("MAILPILOT_BODY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+BODY_CACHE_COMPRESSION = os.getenv("MAILPILOT_BODY_CACHE_COMPRESSION", "zstd").lower()
+
+# First byte of every stored object: how the rest is compressed.
+_RAW, _ZLIB, _ZSTD = b"-", b"z", b"Z"
+
+
+class CacheKey(NamedTuple):
+    account_id: int
+    folder: str
+    uidvalidity: int
+    uid: int
+
+    def filename(self) -> str:
+        return hashlib.sha256(f"{self.account_id}\0{self.folder}\0{self.uidvalidity}\0{self.uid}".encode()).hexdigest()
+
+
+class BodyCache:
+    """On-disk cache of parsed message bodies with a size budget.
+
+    Bodies are stored once per SHA-256 of the raw message under ``objects/``;
+    ``keys/`` maps an (account, folder, UIDVALIDITY, UID) key to that digest.
+    When the objects exceed ``max_bytes`` the least recently read ones are
+    evicted (recency survives restarts as the file mtime) together with the
+    keys pointing at them, so neither directory grows past the budget. Keys
+    whose object is gone (e.g. evicted by another worker process) count as
+    misses and are removed when read, or on the next start.
+    """
+
+    def __init__(self, directory: str = BODY_CACHE_DIR, max_bytes: int = BODY_CACHE_MAX_BYTES, compression: str = BODY_CACHE_COMPRESSION):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        if compression == "zstd" and zstandard is None:
+            compression = "zlib"
+        self.compression = compression
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._objects: OrderedDict[str, int] | None = None
+        self._size = 0
+        self._keys: dict[str, set[str]] = {}  # digest -> key file names
+        self._key_digests: dict[str, str] = {}
+
+    def get(self, key: CacheKey) -> str | None:
+        with self._lock:
+            objects = self._load()
+            name = key.filename()
+            key_path = self._key_file(name)
+            try:
+                digest = key_path.read_text().strip()
+                path = self._object_path(digest)
+                text = _decompress(path.read_bytes()).decode("utf-8")
+            except (OSError, ValueError, zlib.error):
+                key_path.unlink(missing_ok=True)
+                self._unlink_key(name)
+                self.misses += 1
+                return None
+            self._link_key(name, digest)
+            if digest in objects:
+                objects.move_to_end(digest)
+            else:  # written by another worker process
+                objects[digest] = path.stat().st_size
+                self._size += objects[digest]
+            os.utime(path)
+            self.hits += 1
+            return text
+
+    def put(self, key: CacheKey, digest: str, text: str) -> None:
+        data = _compress(text.encode("utf-8"), self.compression)
+        with self._lock:
+            objects = self._load()
+            path = self._object_path(digest)
+            if digest in objects and path.exists():
+                objects.move_to_end(digest)
+                os.utime(path)
+            else:
+                self._size -= objects.pop(digest, 0)
+                _write_atomic(path, data)
+                objects[digest] = len(data)
+                self._size += len(data)
+            name = key.filename()
+            _write_atomic(self._key_file(name), digest.encode())
+            self._link_key(name, digest)
+            self._evict()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            objects = self._load()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else None,
+                "evictions": self.evictions,
+                "objects": len(objects),
+                "keys": len(self._key_digests),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "compression": self.compression,
+            }
+
+    def _load(self) -> OrderedDict[str, int]:
+        if self._objects is None:
+            found = []
+            for path in (self.directory / "objects").glob("*/*"):
+                if path.name.endswith(".tmp"):
+                    continue
+                stat = path.stat()
+                found.append((stat.st_mtime, path.name, stat.st_size))
+            found.sort()
+            self._objects = OrderedDict((name, size) for _, name, size in found)
+            self._size = sum(self._objects.values())
+            for path in (self.directory / "keys").glob("*/*"):
+                if path.name.endswith(".tmp"):
+                    continue
+                try:
+                    digest = path.read_text().strip()
+                except OSError:
+                    continue
+                if digest in self._objects:
+                    self._link_key(path.name, digest)
+                else:
+                    path.unlink(missing_ok=True)
+        return self._objects
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and len(self._objects) > 1:
+            digest, size = self._objects.popitem(last=False)
+            self._object_path(digest).unlink(missing_ok=True)
+            for name in self._keys.pop(digest, ()):
+                del self._key_digests[name]
+                self._key_file(name).unlink(missing_ok=True)
+            self._size -= size
+            self.evictions += 1
+
+    def _link_key(self, name: str, digest: str) -> None:
+        self._unlink_key(name)
+        self._key_digests[name] = digest
+        self._keys.setdefault(digest, set()).add(name)
+
+    def _unlink_key(self, name: str) -> None:
+        digest = self._key_digests.pop(name, None)
+        if digest is not None:
+            self._keys[digest].discard(name)
+            if not self._keys[digest]:
+                del self._keys[digest]
+
+    def _object_path(self, digest: str) -> Path:
+        if len(digest) != 64 or not all(char in "0123456789abcdef" for char in digest):
+            raise ValueError(f"Invalid digest: {digest!r}")
+        return self.directory / "objects" / digest[:2] / digest
+
+    def _key_file(self, name: str) -> Path:
+        return self.directory / "keys" / name[:2] / name
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return _ZSTD + zstandard.ZstdCompressor().compress(data)
+    if compression == "zlib":
+        return _ZLIB + zlib.compress(data)
+    return _RAW + data
+
+
+def _decompress(data: bytes) -> bytes:
+    codec, payload = data[:1], data[1:]
+    if codec == _ZSTD:
+        if zstandard is None:
+            raise ValueError("zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec == _ZLIB:
+        return zlib.decompress(payload)
+    return payload
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+body_cache = BodyCache()
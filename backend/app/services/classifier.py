@@ -56,13 +56,8 @@ def priority(subject: str | None, snippet: str | None, newsletter: bool) -> tupl
     return min(score, 100), ", ".join(reasons)
 
 
-def thread_key(message_id: str | None, in_reply_to: str | None, references: str | None, subject: str | None, from_addr: str | None) -> str:
-    if in_reply_to:
-        return in_reply_to.strip()
-    if references:
-        refs = references.strip().split()
-        if refs:
-            return refs[-1]
+def thread_key(subject: str | None, from_addr: str | None) -> str:
+    """Key grouping messages without Message-ID links: normalized subject plus sender domain."""
     base = normalize_subject(subject)
     domain = ""
     if from_addr and "@" in from_addr:
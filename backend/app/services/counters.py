@@ -0,0 +1,135 @@
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from ..db import insert_ignore
+from ..models import AccountCounter, Message, Thread
+from .imap_protocol import chunked
+
+COUNTER_FIELDS = ("threads", "unread_threads", "messages", "unread_messages", "newsletters")
+
+_Bucket = tuple[int, str]  # account_id, category
+
+
+def thread_states(db: Session, thread_ids: Iterable[int]) -> dict[int, Any]:
+    """The counted columns of ``thread_ids``; deleted threads are left out."""
+    db.flush()
+    states = {}
+    for chunk in chunked(list(thread_ids), 500):
+        rows = db.execute(
+            select(Thread.id, Thread.account_id, Thread.category, Thread.is_newsletter, Thread.message_count, Thread.unread_count)
+            .where(Thread.id.in_(chunk))
+        )
+        states.update((row.id, row) for row in rows)
+    return states
+
+
+def _totals(states: dict[int, Any]) -> dict[_Bucket, dict[str, int]]:
+    totals: dict[_Bucket, dict[str, int]] = {}
+    for state in states.values():
+        # Threads without messages (new, or emptied until sync removes them) are not listed as mail.
+        if not state.message_count:
+            continue
+        bucket = totals.setdefault((state.account_id, state.category), dict.fromkeys(COUNTER_FIELDS, 0))
+        bucket["threads"] += 1
+        bucket["unread_threads"] += state.unread_count > 0
+        bucket["messages"] += state.message_count
+        bucket["unread_messages"] += state.unread_count
+        bucket["newsletters"] += bool(state.is_newsletter)
+    return totals
+
+
+def apply_changes(db: Session, before: dict[int, Any], after: dict[int, Any]) -> None:
+    """Add the difference between two ``thread_states`` snapshots to the account counters.
+
+    One UPDATE per changed (account, category), however many threads changed.
+    """
+    old, new = _totals(before), _totals(after)
+    deltas = {}
+    for bucket in old.keys() | new.keys():
+        delta = {
+            field: new.get(bucket, {}).get(field, 0) - old.get(bucket, {}).get(field, 0) for field in COUNTER_FIELDS
+        }
+        if any(delta.values()):
+            deltas[bucket] = delta
+    if not deltas:
+        return
+    insert_ignore(
+        db,
+        AccountCounter,
+        [{"account_id": account_id, "category": category} for account_id, category in deltas],
+        ["account_id", "category"],
+    )
+    for (account_id, category), delta in deltas.items():
+        db.execute(
+            update(AccountCounter)
+            .where(AccountCounter.account_id == account_id, AccountCounter.category == category)
+            .values({field: getattr(AccountCounter, field) + value for field, value in delta.items() if value})
+        )
+
+
+@contextmanager
+def tracked(db: Session, thread_ids: Iterable[int]) -> Iterator[None]:
+    """Keep the account counters in step with what the block does to ``thread_ids``."""
+    ids = set(thread_ids)
+    before = thread_states(db, ids)
+    yield
+    apply_changes(db, before, thread_states(db, ids))
+
+
+def forget(db: Session, thread_ids: Iterable[int]) -> None:
+    """Take threads out of the counters; call before deleting them in bulk."""
+    apply_changes(db, thread_states(db, thread_ids), {})
+
+
+def recount(db: Session, account_id: int) -> None:
+    """Recompute the message counts of all threads and the account counters.
+
+    The repair for counters that drifted (or predate them) and the bookkeeping
+    of a full resync; costs a scan of the account's messages, unlike the
+    incremental updates.
+    """
+    db.flush()
+    messages = select(func.count()).select_from(Message).where(Message.thread_id == Thread.id)
+    unread = messages.where(Message.is_seen.is_not(True))
+    db.execute(
+        update(Thread)
+        .where(Thread.account_id == account_id)
+        .values(message_count=messages.scalar_subquery(), unread_count=unread.scalar_subquery()),
+        execution_options={"synchronize_session": False},
+    )
+    db.query(AccountCounter).filter(AccountCounter.account_id == account_id).delete(synchronize_session=False)
+    rows = db.execute(
+        select(
+            Thread.category,
+            func.count().label("threads"),
+            func.sum(case((Thread.unread_count > 0, 1), else_=0)).label("unread_threads"),
+            func.sum(Thread.message_count).label("messages"),
+            func.sum(Thread.unread_count).label("unread_messages"),
+            func.sum(case((Thread.is_newsletter.is_(True), 1), else_=0)).label("newsletters"),
+        )
+        .where(Thread.account_id == account_id, Thread.message_count > 0)
+        .group_by(Thread.category)
+    )
+    insert_ignore(
+        db,
+        AccountCounter,
+        [{"account_id": account_id, **row._mapping} for row in rows],
+        ["account_id", "category"],
+    )
+
+
+def account_counters(db: Session, account_id: int) -> dict[str, Any]:
+    """The account's totals and per-category counts, read from the counter rows."""
+    totals: dict[str, Any] = dict.fromkeys(COUNTER_FIELDS, 0)
+    categories = {}
+    for counter in db.query(AccountCounter).filter(AccountCounter.account_id == account_id).order_by(AccountCounter.category):
+        counts = {field: getattr(counter, field) for field in COUNTER_FIELDS}
+        if counts["threads"]:
+            categories[counter.category] = counts
+        for field, value in counts.items():
+            totals[field] += value
+    totals["categories"] = categories
+    return totals
@@ -0,0 +1,139 @@
+import logging
+import os
+import threading
+
+from ..db import SessionLocal
+from ..models import Account
+from .imap_client import ImapClient
+from .imap_pool import pool as imap_pool
+from .sync import sync_mailbox
+
+logger = logging.getLogger(__name__)
+
+IDLE_ENABLED = os.getenv("MAILPILOT_IDLE_ENABLED", "0") == "1"
+# Servers may drop IDLE after 30 minutes (RFC 2177); re-issue it well before that.
+IDLE_RENEW_SECONDS = float(os.getenv("MAILPILOT_IDLE_RENEW_SECONDS", str(29 * 60)))
+IDLE_SYNC_LIMIT = int(os.getenv("MAILPILOT_IDLE_SYNC_LIMIT", "50"))
+
+WAKE_EVENTS = (b"EXISTS", b"EXPUNGE", b"FETCH")
+
+
+class IdleWatcher(threading.Thread):
+    """Keeps one dedicated IMAP connection in IDLE on an account's INBOX.
+
+    Whenever the server reports new, expunged or changed messages, and on
+    every renewal, incremental ``sync_mailbox`` runs on the same connection
+    until it has caught up. The connection
+    comes from ``imap_pool.dedicated`` so it counts against the per-host cap.
+    Errors reconnect with exponential backoff.
+    """
+
+    def __init__(self, account_id: int, folder: str = "INBOX"):
+        super().__init__(name=f"imap-idle-{account_id}", daemon=True)
+        self.account_id = account_id
+        self.folder = folder
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        backoff = 5.0
+        while not self._stop_event.is_set():
+            try:
+                self._watch()
+                backoff = 5.0
+            except Exception:
+                logger.exception("IDLE watcher for account %s failed, retrying in %ss", self.account_id, backoff)
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 300.0)
+
+    def _watch(self) -> None:
+        with SessionLocal() as db:
+            account = db.get(Account, self.account_id)
+        if account is None:
+            self._stop_event.set()
+            return
+
+        with imap_pool.dedicated(account, self.folder) as imap:
+            if not imap.supports("IDLE"):
+                logger.warning("IMAP server of account %s does not support IDLE", self.account_id)
+                self._stop_event.set()
+                return
+            self._catch_up(imap)
+            self._idle_loop(imap)
+
+    def _idle_loop(self, imap: ImapClient) -> None:
+        while not self._stop_event.is_set():
+            events = imap.idle(IDLE_RENEW_SECONDS, stop=self._stop_event)
+            if self._stop_event.is_set():
+                return
+            # A renewal (no events) catches up too, in case a notification got lost.
+            if not events or any(_wakes_sync(event) for event in events):
+                self._catch_up(imap)
+
+    def _catch_up(self, imap: ImapClient) -> None:
+        """Sync until nothing is left to fetch.
+
+        One sync stores at most ``IDLE_SYNC_LIMIT`` messages, and mail that
+        arrives while it runs is announced outside IDLE; both take another round.
+        """
+        while not self._stop_event.is_set():
+            # Re-select so UIDVALIDITY/HIGHESTMODSEQ are current for the incremental sync.
+            imap.select_folder(self.folder)
+            imap.pending_changes()  # the SELECT's own EXISTS
+            if self._sync(imap) < IDLE_SYNC_LIMIT and not imap.pending_changes():
+                return
+
+    def _sync(self, imap: ImapClient) -> int:
+        with SessionLocal() as db:
+            account = db.get(Account, self.account_id)
+            if account is None:
+                self._stop_event.set()
+                return 0
+            return sync_mailbox(db, account, imap, limit=IDLE_SYNC_LIMIT)["fetched"]
+
+
+def _wakes_sync(event: bytes) -> bool:
+    """True for ``* n EXISTS``, ``* n EXPUNGE``, ``* n FETCH (...)`` and ``* VANISHED ...``."""
+    parts = event.upper().split()
+    if len(parts) < 2 or parts[0] != b"*":
+        return False
+    return parts[1] == b"VANISHED" or (len(parts) > 2 and parts[2] in WAKE_EVENTS)
+
+
+class IdleManager:
+    def __init__(self):
+        self._watchers: dict[int, IdleWatcher] = {}
+        self._lock = threading.Lock()
+
+    def watch(self, account_id: int) -> None:
+        with self._lock:
+            watcher = self._watchers.get(account_id)
+            if watcher and watcher.is_alive():
+                return
+            watcher = IdleWatcher(account_id)
+            self._watchers[account_id] = watcher
+            watcher.start()
+
+    def unwatch(self, account_id: int) -> None:
+        with self._lock:
+            watcher = self._watchers.pop(account_id, None)
+        if watcher:
+            watcher.stop()
+
+    def start_all(self) -> None:
+        with SessionLocal() as db:
+            account_ids = [account_id for (account_id,) in db.query(Account.id)]
+        for account_id in account_ids:
+            self.watch(account_id)
+
+    def stop_all(self) -> None:
+        with self._lock:
+            watchers = list(self._watchers.values())
+            self._watchers.clear()
+        for watcher in watchers:
+            watcher.stop()
+
+
+manager = IdleManager()
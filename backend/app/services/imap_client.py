@@ -1,32 +1,150 @@
+import base64
+import binascii
 import email
 import imaplib
+import os
+import quopri
 import re
-from datetime import datetime, timezone
+import select
+import threading
+import time
+from datetime import date, datetime, timezone
 from email.header import decode_header
-from typing import Any
+from typing import Any, Callable, NamedTuple
+
+from .imap_protocol import (
+    BodyPart,
+    Folder,
+    chunked,
+    compress_uid_set,
+    find_item,
+    find_text_part,
+    parse_fetch_response,
+    parse_list_response,
+    parse_uid_set,
+)
+from .imap_compress import IMAP_COMPRESS, TrafficSocket
+from .mime_stream import BodyExtractor
+
+DEFAULT_FETCH_BATCH_SIZE = int(os.getenv("MAILPILOT_IMAP_FETCH_BATCH_SIZE", "200"))
+DEFAULT_SNIPPET_BYTES = int(os.getenv("MAILPILOT_IMAP_SNIPPET_BYTES", "4096"))
+
+HEADER_FIELDS = "SUBJECT FROM TO DATE MESSAGE-ID IN-REPLY-TO REFERENCES LIST-UNSUBSCRIBE"
+HEADER_FETCH_ITEMS = f"(UID FLAGS BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])"
+BODY_READ_CHUNK = 65536
+
+_LITERAL_LINE_RE = re.compile(rb"\{(\d+)\}\r?\n?$")
 
 
 class ImapAuthenticationError(Exception):
     pass
 
 
+class FolderChanges(NamedTuple):
+    flags: dict[int, list[str]]
+    vanished: set[int]
+
+
+class SocketReader:
+    """File-like reader used by imaplib in place of its buffered socket file.
+
+    Unlike ``socket.makefile`` it can tell whether input is already buffered,
+    which ``select()`` cannot see; IDLE relies on that.
+    """
+
+    def __init__(self, recv: Callable[[int], bytes], chunk_size: int = 65536):
+        self._recv = recv
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+
+    def has_buffered_data(self) -> bool:
+        return bool(self._buffer)
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) < size and self._fill():
+            pass
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def readline(self, limit: int = -1) -> bytes:
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n", start)
+            if end >= 0:
+                end += 1
+                break
+            # Only the newly received bytes can contain the line end.
+            start = len(self._buffer)
+            if 0 <= limit <= start or not self._fill():
+                end = len(self._buffer)
+                break
+        if 0 <= limit < end:
+            end = limit
+        line = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return line
+
+    def close(self) -> None:
+        self._buffer.clear()
+
+    def _fill(self) -> bool:
+        data = self._recv(self._chunk_size)
+        if not data:
+            return False
+        self._buffer += data
+        return True
+
+
 class ImapClient:
-    def __init__(self, host: str, port: int = 993, tls: bool = True):
+    def __init__(
+        self,
+        host: str,
+        port: int = 993,
+        tls: bool = True,
+        fetch_batch_size: int = DEFAULT_FETCH_BATCH_SIZE,
+        snippet_bytes: int = DEFAULT_SNIPPET_BYTES,
+        compress: bool = IMAP_COMPRESS,
+    ):
         self.host = host
         self.port = port
         self.tls = tls
+        self.fetch_batch_size = fetch_batch_size
+        self.snippet_bytes = snippet_bytes
+        self.compress = compress
         self.conn: imaplib.IMAP4 | imaplib.IMAP4_SSL | None = None
+        self.folder: str | None = None
+        self.uidvalidity: int | None = None
+        self.highest_modseq: int | None = None
+        self.qresync = False
 
     def __enter__(self):
-        self.conn = imaplib.IMAP4_SSL(self.host, self.port) if self.tls else imaplib.IMAP4(self.host, self.port)
+        self.connect()
         return self
 
     def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def connect(self) -> None:
+        self.conn = imaplib.IMAP4_SSL(self.host, self.port) if self.tls else imaplib.IMAP4(self.host, self.port)
+        self.conn.sock = TrafficSocket(self.conn.sock)
+        self.conn.file = SocketReader(self.conn.sock.recv)
+
+    def close(self) -> None:
         if self.conn:
             try:
                 self.conn.logout()
             except Exception:
                 pass
+            self.conn = None
+            self.folder = None
+
+    def noop(self) -> None:
+        if not self.conn:
+            raise RuntimeError("IMAP connection not initialized")
+        status, _ = self.conn.noop()
+        if status != "OK":
+            raise imaplib.IMAP4.abort("NOOP failed")
 
     def login(self, email_addr: str, password: str) -> None:
         if not self.conn:
@@ -37,48 +155,399 @@ class ImapClient:
             if "AUTH" in str(exc).upper():
                 raise ImapAuthenticationError(str(exc))
             raise
+        # Servers commonly advertise extensions such as QRESYNC only once authenticated.
+        status, data = self.conn.capability()
+        if status == "OK" and data and data[-1]:
+            self.conn.capabilities = tuple(data[-1].decode().upper().split())
+        if self.compress and self.supports("COMPRESS=DEFLATE") and isinstance(self.conn.sock, TrafficSocket):
+            self._start_compression()
+        if self.supports("QRESYNC") and self.supports("ENABLE"):
+            status, _ = self.conn.enable("QRESYNC")
+            self.qresync = status == "OK"
+
+    def supports(self, capability: str) -> bool:
+        return bool(self.conn) and capability.upper() in self.conn.capabilities
+
+    def _start_compression(self) -> None:
+        """Negotiate COMPRESS=DEFLATE (RFC 4978); from the tagged OK on both directions are deflated."""
+        tag = self._send_raw_command(b"COMPRESS DEFLATE")
+        try:
+            while True:
+                line = self.conn.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("connection closed during COMPRESS")
+                if line.startswith(tag + b" "):
+                    if line[len(tag):].strip().upper().startswith(b"OK"):
+                        self.conn.sock.start_deflate()
+                    return
+        finally:
+            self._finish_raw_command(tag)
 
     def select_inbox(self) -> None:
+        self.select_folder("INBOX")
+
+    def list_folders(self) -> list[Folder]:
+        """All folders of the account.
+
+        Servers announcing SPECIAL-USE (RFC 6154) include the folder roles
+        (``\\Sent``, ``\\Archive``, ...) in the plain LIST response.
+        """
         if not self.conn:
             raise RuntimeError("IMAP connection not initialized")
-        status, _ = self.conn.select("INBOX")
+        status, data = self.conn.list('""', "*")
         if status != "OK":
-            raise RuntimeError("Failed to select INBOX")
+            raise RuntimeError("Failed to list folders")
+        return parse_list_response(data)
+
+    def select_folder(self, folder: str) -> None:
+        if not self.conn:
+            raise RuntimeError("IMAP connection not initialized")
+        condstore = self.supports("CONDSTORE") and not self.qresync
+        mailbox = _quote_mailbox(folder)
+        status, _ = self.conn.select(f"{mailbox} (CONDSTORE)" if condstore else mailbox)
+        if status != "OK":
+            raise RuntimeError(f"Failed to select {folder}")
+        self.folder = folder
+        _, data = self.conn.response("UIDVALIDITY")
+        self.uidvalidity = int(data[0]) if data and data[0] else None
+        _, data = self.conn.response("HIGHESTMODSEQ")
+        self.highest_modseq = int(data[0]) if data and data[0] else None
 
     def test_connection(self, email_addr: str, password: str) -> None:
         self.login(email_addr, password)
         self.select_inbox()
 
     def fetch_latest(self, limit: int = 50) -> list[dict[str, Any]]:
+        return self._fetch_uids(self._search_uids("ALL"), limit)
+
+    def fetch_since(self, last_uid: int, limit: int = 50) -> list[dict[str, Any]]:
+        """Fetch only messages with a UID above ``last_uid`` (``UID n+1:*``).
+
+        Unlike ``fetch_latest`` this takes the *oldest* ``limit`` new UIDs, so
+        advancing the high-water mark to the highest fetched UID never skips
+        mail; the rest follows on the next sync.
+        """
+        uids = sorted(int(uid) for uid in self._search_uids(f"UID {last_uid + 1}:*") if int(uid) > last_uid)
+        if limit:
+            uids = uids[:limit]
+        return self._fetch_uids(uids, 0)
+
+    def fetch_uids(self, uids: list[int]) -> list[dict[str, Any]]:
+        """Fetch the given UIDs like ``fetch_latest`` does, newest first."""
+        return self._fetch_uids(uids, 0)
+
+    def search_dates(self, since: date | None, before: date) -> list[int]:
+        """UIDs of messages received on or after ``since`` and before ``before`` (INTERNALDATE)."""
+        return sorted(int(uid) for uid in self._search_uids(_date_window_criteria(since, before)))
+
+    def first_message_date(self) -> datetime | None:
+        """INTERNALDATE of the first message in the folder, ``None`` if it is empty."""
+        if not self.conn:
+            raise RuntimeError("IMAP connection not initialized")
+        try:
+            status, msg_data = self.conn.fetch("1", "(UID INTERNALDATE)")
+        except imaplib.IMAP4.abort:
+            raise
+        except imaplib.IMAP4.error:  # some servers answer BAD for an empty folder
+            return None
+        return _parse_internaldate(msg_data) if status == "OK" else None
+
+    def fetch_changes(self, last_uid: int, modseq: int | None, known_uids: Callable[[], set[int]]) -> FolderChanges:
+        """Flag changes and expunges among UIDs ``1:last_uid`` since the last sync.
+
+        With CONDSTORE only messages changed since ``modseq`` are fetched, and
+        with QRESYNC the server also reports expunged UIDs (``VANISHED``).
+        Otherwise flags are re-fetched and ``known_uids()`` is diffed against
+        the UIDs still on the server.
+        """
         if not self.conn:
             raise RuntimeError("IMAP connection not initialized")
-        status, data = self.conn.uid("search", None, "ALL")
+        if not last_uid:
+            return FolderChanges({}, set())
+        condstore = modseq is not None and self.highest_modseq is not None
+        if condstore and self.highest_modseq == modseq:
+            return FolderChanges({}, set())
+
+        status, msg_data = self.conn.uid("fetch", f"1:{last_uid}", _changes_fetch_items(modseq if condstore else None, self.qresync))
+        flags = _parse_flags(msg_data) if status == "OK" else {}
+        if condstore and self.qresync:
+            _, data = self.conn.response("VANISHED")
+            vanished = _parse_vanished(data, last_uid)
+        else:
+            present = {int(uid) for uid in self._search_uids(f"UID 1:{last_uid}")}
+            vanished = {uid for uid in known_uids() if uid <= last_uid and uid not in present}
+        return FolderChanges(flags, vanished)
+
+    def _search_uids(self, criteria: str) -> list[bytes]:
+        if not self.conn:
+            raise RuntimeError("IMAP connection not initialized")
+        status, data = self.conn.uid("search", None, criteria)
         if status != "OK":
             return []
-        uids = data[0].split() if data and data[0] else []
+        return data[0].split() if data and data[0] else []
+
+    def _fetch_uids(self, uids: list[bytes] | list[int], limit: int) -> list[dict[str, Any]]:
+        """Fetch header fields and a snippet for the newest ``limit`` of ``uids`` (0 = all), one UID FETCH per chunk.
+
+        Only ``BODYSTRUCTURE``, the header fields we store and the first
+        ``snippet_bytes`` of the first text part are transferred. All sections
+        use ``BODY.PEEK`` so syncing never marks mail as read.
+        """
+        if not self.conn:
+            raise RuntimeError("IMAP connection not initialized")
         if limit and len(uids) > limit:
             uids = uids[-limit:]
         results: list[dict[str, Any]] = []
-        for uid_bytes in reversed(uids):
-            status, msg_data = self.conn.uid("fetch", uid_bytes, "(RFC822.HEADER RFC822.TEXT)")
+        for chunk in chunked(sorted((int(uid) for uid in uids), reverse=True), self.fetch_batch_size):
+            status, msg_data = self.conn.uid("fetch", compress_uid_set(chunk), HEADER_FETCH_ITEMS)
             if status != "OK" or not msg_data:
                 continue
-            raw = b"".join(part[1] for part in msg_data if isinstance(part, tuple) and isinstance(part[1], (bytes, bytearray)))
-            if not raw:
-                continue
-            msg = email.message_from_bytes(raw)
-            results.append(_extract_headers(msg, int(uid_bytes)))
+            fetched, text_parts = _parse_header_fetch(msg_data)
+            for section, section_uids in _group_by_section(text_parts).items():
+                status, msg_data = self.conn.uid("fetch", compress_uid_set(section_uids), _snippet_fetch_items(section, self.snippet_bytes))
+                if status == "OK" and msg_data:
+                    _apply_snippets(fetched, text_parts, section, msg_data)
+            results.extend(sorted(fetched.values(), key=lambda msg: msg["uid"], reverse=True))
         return results
 
-    def fetch_body(self, uid: int) -> str:
+    def idle(self, timeout: float, stop: threading.Event | None = None) -> list[bytes]:
+        """Run IDLE until the server reports something, ``timeout`` expires or ``stop`` is set.
+
+        Returns the untagged responses received while idling (e.g. ``b"* 12 EXISTS"``).
+        """
         if not self.conn:
             raise RuntimeError("IMAP connection not initialized")
-        status, msg_data = self.conn.uid("fetch", str(uid).encode(), "(RFC822)")
-        if status != "OK" or not msg_data:
-            raise RuntimeError("Failed to fetch message")
-        raw = b"".join(part[1] for part in msg_data if isinstance(part, tuple) and isinstance(part[1], (bytes, bytearray)))
-        msg = email.message_from_bytes(raw)
-        return _extract_body(msg)
+        if not self.supports("IDLE"):
+            raise RuntimeError("Server does not support IDLE")
+        tag = self._send_raw_command(b"IDLE")
+        try:
+            return self._idle(tag, timeout, stop)
+        finally:
+            self._finish_raw_command(tag)
+
+    def pending_changes(self) -> bool:
+        """Whether the server reported changes outside IDLE since the last call.
+
+        Servers may announce new mail with the response to any command (e.g.
+        an ``EXISTS`` during a FETCH); imaplib keeps those until popped.
+        """
+        if not self.conn:
+            return False
+        found = False
+        for typ in ("EXISTS", "EXPUNGE", "VANISHED", "FETCH"):
+            found |= bool(self.conn.untagged_responses.pop(typ, None))
+        return found
+
+    def _send_raw_command(self, command: bytes) -> bytes:
+        """Send a command imaplib has no method for; the caller reads the responses itself.
+
+        This is the only place that relies on imaplib internals (``_new_tag``,
+        which registers the tag in ``tagged_commands``); ``_finish_raw_command``
+        removes it again.
+        """
+        tag = self.conn._new_tag()
+        self.conn.send(tag + b" " + command + b"\r\n")
+        return tag
+
+    def _finish_raw_command(self, tag: bytes) -> None:
+        if self.conn:
+            self.conn.tagged_commands.pop(tag, None)
+
+    def _idle(self, tag: bytes, timeout: float, stop: threading.Event | None) -> list[bytes]:
+        line = self.conn.readline()
+        if not line.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"IDLE rejected: {line.strip()!r}")
+
+        events: list[bytes] = []
+        deadline = time.monotonic() + timeout
+        sock = self.conn.sock
+        reader = self.conn.file
+        while not events and time.monotonic() < deadline and not (stop and stop.is_set()):
+            buffered = getattr(reader, "has_buffered_data", lambda: False)() or getattr(sock, "pending", lambda: 0)()
+            if not buffered:
+                readable, _, _ = select.select([sock], [], [], min(1.0, max(0.0, deadline - time.monotonic())))
+                if not readable:
+                    continue
+            line = self.conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            events.append(line.strip())
+
+        self.conn.send(b"DONE\r\n")
+        while True:
+            line = self.conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            if line.startswith(tag):
+                if not line[len(tag):].strip().upper().startswith(b"OK"):
+                    raise imaplib.IMAP4.error(f"IDLE failed: {line.strip()!r}")
+                return events
+            events.append(line.strip())
+
+    def fetch_structure(self, uid: int) -> Any:
+        """The parsed ``BODYSTRUCTURE`` of a message (see ``walk_bodystructure``)."""
+        if not self.conn:
+            raise RuntimeError("IMAP connection not initialized")
+        status, msg_data = self.conn.uid("fetch", str(uid), "(UID BODYSTRUCTURE)")
+        if status != "OK":
+            raise RuntimeError("Failed to fetch message structure")
+        return _structure_from_fetch(msg_data, uid)
+
+    def fetch_partial(self, uid: int, section: str, offset: int, length: int) -> bytes:
+        """Up to ``length`` encoded bytes of body part ``section`` starting at ``offset``."""
+        if not self.conn:
+            raise RuntimeError("IMAP connection not initialized")
+        status, msg_data = self.conn.uid("fetch", str(uid), _partial_fetch_items(section, offset, length))
+        if status != "OK":
+            raise RuntimeError("Failed to fetch message part")
+        return _partial_from_fetch(msg_data, uid, section)
+
+    def fetch_body(self, uid: int, extractor: BodyExtractor | None = None) -> str:
+        """Fetch a message and return its readable body.
+
+        The message literal is read in chunks straight into a ``BodyExtractor``
+        (a new one unless ``extractor`` is given) instead of through imaplib,
+        which would buffer the whole message.
+        """
+        if not self.conn:
+            raise RuntimeError("IMAP connection not initialized")
+        extractor = extractor or BodyExtractor()
+        tag = self._send_raw_command(f"UID FETCH {uid} (RFC822)".encode())
+        try:
+            found = False
+            while True:
+                line = self.conn.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("connection closed during FETCH")
+                if line.startswith(tag + b" "):
+                    if not line[len(tag):].strip().upper().startswith(b"OK") or not found:
+                        raise RuntimeError("Failed to fetch message")
+                    return extractor.close()
+                literal = _LITERAL_LINE_RE.search(line)
+                if literal:
+                    wanted = line.startswith(b"* ") and b"RFC822" in line.upper()
+                    found = found or wanted
+                    remaining = int(literal.group(1))
+                    while remaining:
+                        chunk = self.conn.read(min(remaining, BODY_READ_CHUNK))
+                        if not chunk:
+                            raise imaplib.IMAP4.abort("connection closed during FETCH")
+                        remaining -= len(chunk)
+                        if wanted:
+                            extractor.feed(chunk)
+        finally:
+            self._finish_raw_command(tag)
+
+
+# Helpers shared with ``AsyncImapClient``: they build command arguments and
+# parse ``imaplib``-shaped ``(status, data)`` results without doing any I/O.
+
+
+def _snippet_fetch_items(section: str, snippet_bytes: int) -> str:
+    return _partial_fetch_items(section, 0, snippet_bytes)
+
+
+def _partial_fetch_items(section: str, offset: int, length: int) -> str:
+    return f"(UID BODY.PEEK[{section}]<{offset}.{length}>)"
+
+
+def _changes_fetch_items(modseq: int | None, qresync: bool) -> str:
+    if modseq is None:
+        return "(UID FLAGS)"
+    return f"(UID FLAGS) (CHANGEDSINCE {modseq} VANISHED)" if qresync else f"(UID FLAGS) (CHANGEDSINCE {modseq})"
+
+
+def _parse_header_fetch(msg_data: list[Any]) -> tuple[dict[int, dict[str, Any]], dict[int, BodyPart]]:
+    """Messages from a ``HEADER_FETCH_ITEMS`` response plus the text part to build each snippet from."""
+    fetched: dict[int, dict[str, Any]] = {}
+    text_parts: dict[int, BodyPart] = {}
+    for item in parse_fetch_response(msg_data):
+        header = find_item(item, "BODY[HEADER")
+        if "UID" not in item or not isinstance(header, bytes):
+            continue
+        uid = item["UID"]
+        fetched[uid] = _extract_headers(email.message_from_bytes(header), uid)
+        fetched[uid]["flags"] = [str(flag) for flag in item.get("FLAGS") or []]
+        part = find_text_part(item.get("BODYSTRUCTURE"))
+        if part:
+            text_parts[uid] = part
+    return fetched, text_parts
+
+
+def _group_by_section(text_parts: dict[int, BodyPart]) -> dict[str, list[int]]:
+    """Snippets are fetched in one command per section number."""
+    by_section: dict[str, list[int]] = {}
+    for uid, part in text_parts.items():
+        by_section.setdefault(part.section, []).append(uid)
+    return by_section
+
+
+def _apply_snippets(fetched: dict[int, dict[str, Any]], text_parts: dict[int, BodyPart], section: str, msg_data: list[Any]) -> None:
+    for item in parse_fetch_response(msg_data):
+        data = find_item(item, f"BODY[{section}]")
+        part = text_parts.get(item.get("UID"))
+        if part and isinstance(data, bytes) and item["UID"] in fetched:
+            fetched[item["UID"]]["snippet"] = _partial_snippet(data, part)
+
+
+def _parse_flags(msg_data: list[Any]) -> dict[int, list[str]]:
+    flags: dict[int, list[str]] = {}
+    for item in parse_fetch_response(msg_data or []):
+        if "UID" in item and isinstance(item.get("FLAGS"), list):
+            flags[item["UID"]] = [str(flag) for flag in item["FLAGS"]]
+    return flags
+
+
+def _parse_vanished(data: list[Any], last_uid: int) -> set[int]:
+    vanished: set[int] = set()
+    for line in data or []:
+        if line:
+            vanished |= parse_uid_set(line.split()[-1], max_uid=last_uid)
+    return vanished
+
+
+def _date_window_criteria(since: date | None, before: date) -> str:
+    # IMAP dates use English month names whatever the locale.
+    months = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+    criteria = f"BEFORE {before.day}-{months[before.month - 1]}-{before.year}"
+    if since is not None:
+        criteria = f"SINCE {since.day}-{months[since.month - 1]}-{since.year} {criteria}"
+    return criteria
+
+
+def _parse_internaldate(msg_data: list[Any]) -> datetime | None:
+    for item in parse_fetch_response(msg_data or []):
+        value = item.get("INTERNALDATE")
+        if isinstance(value, (bytes, bytearray)):
+            value = bytes(value).decode("ascii", errors="replace")
+        if isinstance(value, str):
+            timestamp = imaplib.Internaldate2tuple(f'INTERNALDATE "{value}"'.encode())
+            if timestamp:
+                return datetime.utcfromtimestamp(time.mktime(timestamp))
+    return None
+
+
+def _structure_from_fetch(msg_data: list[Any], uid: int) -> Any:
+    for item in parse_fetch_response(msg_data or []):
+        if item.get("UID") == uid and "BODYSTRUCTURE" in item:
+            return item["BODYSTRUCTURE"]
+    raise RuntimeError("Failed to fetch message structure")
+
+
+def _partial_from_fetch(msg_data: list[Any], uid: int, section: str) -> bytes:
+    """The bytes of a ``_partial_fetch_items`` response; empty past the end of the part."""
+    for item in parse_fetch_response(msg_data or []):
+        if item.get("UID") == uid:
+            data = find_item(item, f"BODY[{section}]")
+            return bytes(data) if isinstance(data, (bytes, bytearray)) else b""
+    raise RuntimeError("Failed to fetch message part")
+
+
+def _quote_mailbox(name: str) -> str:
+    """Quote a mailbox name for the command line unless it is a plain atom like ``INBOX``."""
+    if re.fullmatch(r'[^\s()"{%*\\\]\x00-\x1f]+', name):
+        return name
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
 
 
 def _decode_header(value: str | None) -> str | None:
@@ -114,6 +583,27 @@ def _extract_snippet(msg: email.message.Message, max_len: int = 240) -> str | No
     return text[:max_len]
 
 
+def _partial_snippet(data: bytes, part: BodyPart, max_len: int = 240) -> str | None:
+    """Build a snippet from the (possibly truncated) start of a single text part."""
+    if part.encoding == "base64":
+        data = re.sub(rb"\s+", b"", data)
+        data = data[: len(data) - len(data) % 4]
+        try:
+            data = base64.b64decode(data)
+        except (binascii.Error, ValueError):
+            return None
+    elif part.encoding == "quoted-printable":
+        data = quopri.decodestring(re.sub(rb"=[0-9A-Fa-f]?$", b"", data))
+    try:
+        text = data.decode(part.charset or "utf-8", errors="replace")
+    except LookupError:
+        text = data.decode("utf-8", errors="replace")
+    if part.content_type == "text/html":
+        text = re.sub(r"<[^>]*(>|$)", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text[:max_len] or None
+
+
 def _extract_body(msg: email.message.Message) -> str:
     if msg.is_multipart():
         for part in msg.walk():
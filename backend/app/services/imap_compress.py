@@ -0,0 +1,167 @@
+import asyncio
+import os
+import socket
+import threading
+import zlib
+from typing import Any
+
+IMAP_COMPRESS = os.getenv("MAILPILOT_IMAP_COMPRESS", "1") == "1"
+COMPRESS_LEVEL = int(os.getenv("MAILPILOT_IMAP_COMPRESS_LEVEL", "6"))
+
+_READ_CHUNK = 65536
+
+
+class TrafficCounter:
+    """Bytes sent and received by all IMAP connections, on the wire and before/after DEFLATE."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wire_in = 0
+        self.wire_out = 0
+        self.data_in = 0
+        self.data_out = 0
+
+    def add(self, wire_in: int = 0, data_in: int = 0, wire_out: int = 0, data_out: int = 0) -> None:
+        with self._lock:
+            self.wire_in += wire_in
+            self.data_in += data_in
+            self.wire_out += wire_out
+            self.data_out += data_out
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "wire_in": self.wire_in,
+                "data_in": self.data_in,
+                "wire_out": self.wire_out,
+                "data_out": self.data_out,
+                "ratio_in": self.wire_in / self.data_in if self.data_in else None,
+                "ratio_out": self.wire_out / self.data_out if self.data_out else None,
+            }
+
+
+traffic = TrafficCounter()
+
+
+class _Deflate:
+    """Raw DEFLATE streams in both directions as RFC 4978 requires (no zlib header)."""
+
+    def __init__(self, level: int):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        self.decompressor = zlib.decompressobj(-15)
+
+    def compress(self, data: bytes) -> bytes:
+        # Every command must reach the server now, so each write ends with a sync flush.
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self.decompressor.decompress(data)
+
+
+class TrafficSocket:
+    """Socket wrapper for imaplib that counts traffic and can switch to DEFLATE.
+
+    imaplib only calls ``sendall`` on it; reads go through ``SocketReader``,
+    which is given ``recv``. Everything else (``fileno`` for ``select()``,
+    ``shutdown``, ``close``) is passed to the wrapped socket.
+    """
+
+    def __init__(self, sock: socket.socket, counter: TrafficCounter = traffic):
+        self.sock = sock
+        self.counter = counter
+        self._deflate: _Deflate | None = None
+
+    @property
+    def compressed(self) -> bool:
+        return self._deflate is not None
+
+    def start_deflate(self, level: int = COMPRESS_LEVEL) -> None:
+        self._deflate = _Deflate(level)
+
+    def sendall(self, data: bytes) -> None:
+        wire = self._deflate.compress(data) if self._deflate else data
+        self.sock.sendall(wire)
+        self.counter.add(wire_out=len(wire), data_out=len(data))
+
+    def recv(self, size: int) -> bytes:
+        while True:
+            wire = self.sock.recv(size)
+            if not wire or not self._deflate:
+                self.counter.add(wire_in=len(wire), data_in=len(wire))
+                return wire
+            data = self._deflate.decompress(wire)
+            self.counter.add(wire_in=len(wire), data_in=len(data))
+            # An incomplete deflate block yields nothing yet; b"" would read as EOF.
+            if data:
+                return data
+
+    def pending(self) -> int:
+        return getattr(self.sock, "pending", lambda: 0)()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.sock, name)
+
+
+class AsyncTrafficStream:
+    """``StreamReader``/``StreamWriter`` pair as used by ``AsyncImapConnection``, counting
+    traffic and optionally speaking DEFLATE."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, counter: TrafficCounter = traffic):
+        self.reader = reader
+        self.writer = writer
+        self.counter = counter
+        self._deflate: _Deflate | None = None
+        self._buffer = bytearray()
+        self._eof = False
+
+    @property
+    def compressed(self) -> bool:
+        return self._deflate is not None
+
+    def start_deflate(self, level: int = COMPRESS_LEVEL) -> None:
+        self._deflate = _Deflate(level)
+
+    def write(self, data: bytes) -> None:
+        wire = self._deflate.compress(data) if self._deflate else data
+        self.writer.write(wire)
+        self.counter.add(wire_out=len(wire), data_out=len(data))
+
+    async def drain(self) -> None:
+        await self.writer.drain()
+
+    def close(self) -> None:
+        self.writer.close()
+
+    async def wait_closed(self) -> None:
+        await self.writer.wait_closed()
+
+    async def readline(self) -> bytes:
+        start = 0
+        while (end := self._buffer.find(b"\n", start)) < 0:
+            start = len(self._buffer)
+            if not await self._fill():
+                end = len(self._buffer) - 1
+                break
+        line = bytes(self._buffer[:end + 1])
+        del self._buffer[:end + 1]
+        return line
+
+    async def readexactly(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            if not await self._fill():
+                raise asyncio.IncompleteReadError(bytes(self._buffer), size)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    async def _fill(self) -> bool:
+        if self._eof:
+            return False
+        wire = await self.reader.read(_READ_CHUNK)
+        if not wire:
+            self._eof = True
+            return False
+        data = self._deflate.decompress(wire) if self._deflate else wire
+        self.counter.add(wire_in=len(wire), data_in=len(data))
+        self._buffer += data
+        return True
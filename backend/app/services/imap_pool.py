@@ -0,0 +1,311 @@
+import asyncio
+import imaplib
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+
+from ..models import Account
+from .crypto import decrypt
+from .imap_client import ImapClient
+
+T = TypeVar("T")
+
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("MAILPILOT_IMAP_POOL_MAX_PER_HOST", "10"))
+IDLE_TIMEOUT = float(os.getenv("MAILPILOT_IMAP_POOL_IDLE_TIMEOUT", "300"))
+KEEPALIVE_INTERVAL = float(os.getenv("MAILPILOT_IMAP_POOL_KEEPALIVE", "60"))
+WAIT_TIMEOUT = float(os.getenv("MAILPILOT_IMAP_POOL_WAIT_TIMEOUT", "30"))
+
+# Errors after which a connection is dropped instead of returned to the pool.
+CONNECTION_ERRORS = (imaplib.IMAP4.abort, OSError)
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class AccountCredentials:
+    account_id: int
+    host: str
+    port: int
+    tls: bool
+    email: str
+    password_enc: str
+
+    @classmethod
+    def from_account(cls, account: Account) -> "AccountCredentials":
+        return cls(account.id, account.imap_host, account.imap_port, account.imap_tls, account.email, account.password_enc)
+
+
+@dataclass
+class _PooledConnection:
+    creds: AccountCredentials
+    client: ImapClient
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ImapConnectionPool:
+    """Authenticated IMAP connections kept open per account.
+
+    ``max_per_host`` caps open connections (busy and idle) per IMAP host;
+    when the cap is reached, idle connections of other accounts on that host
+    are closed first, otherwise callers wait up to ``wait_timeout``. Idle
+    connections are closed after ``idle_timeout`` and kept alive with NOOP by
+    ``maintain()``. Every checkout re-selects the folder, which also detects
+    dead connections; those are replaced transparently.
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = MAX_CONNECTIONS_PER_HOST,
+        idle_timeout: float = IDLE_TIMEOUT,
+        keepalive_interval: float = KEEPALIVE_INTERVAL,
+        wait_timeout: float = WAIT_TIMEOUT,
+        client_factory: Callable[[str, int, bool], ImapClient] = ImapClient,
+    ):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.wait_timeout = wait_timeout
+        self.client_factory = client_factory
+        self._cond = threading.Condition()
+        self._idle: dict[int, list[_PooledConnection]] = {}
+        self._open: Counter[str] = Counter()
+        self._maintenance: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    @contextmanager
+    def connection(self, account: Account, folder: str = "INBOX") -> Iterator[ImapClient]:
+        creds = AccountCredentials.from_account(account)
+        pooled = self._checkout(creds, folder)
+        healthy = True
+        try:
+            yield pooled.client
+        except CONNECTION_ERRORS:
+            healthy = False
+            raise
+        finally:
+            self._checkin(pooled, healthy)
+
+    @asynccontextmanager
+    async def async_connection(self, account: Account, folder: str = "INBOX") -> AsyncIterator[ImapClient]:
+        """``connection()`` for coroutines; checkout and checkin run in worker threads.
+
+        The client is still blocking, so run its commands in threads as well.
+        A connection left by any exception is closed instead of returned: a
+        cancelled caller may have left a command running on it.
+        """
+        creds = AccountCredentials.from_account(account)
+        checkout = asyncio.ensure_future(asyncio.to_thread(self._checkout, creds, folder))
+        try:
+            pooled = await asyncio.shield(checkout)
+        except asyncio.CancelledError:
+            # The checkout completes in its thread regardless; hand the connection straight back.
+            checkout.add_done_callback(lambda done: done.exception() or self._checkin(done.result(), healthy=True))
+            raise
+        try:
+            yield pooled.client
+        except BaseException:
+            await asyncio.to_thread(self._checkin, pooled, False)
+            raise
+        await asyncio.to_thread(self._checkin, pooled, True)
+
+    @contextmanager
+    def dedicated(self, account: Account, folder: str = "INBOX") -> Iterator[ImapClient]:
+        """A connection that counts against the host cap but is never shared.
+
+        Meant for long-lived sessions such as IDLE; the connection is closed
+        and its slot released when the block exits.
+        """
+        pooled = self._checkout(AccountCredentials.from_account(account), folder)
+        try:
+            yield pooled.client
+        finally:
+            self._checkin(pooled, healthy=False)
+
+    def run(self, account: Account, folder: str, operation: Callable[[ImapClient], T]) -> T:
+        """Run ``operation`` on a pooled connection, retrying once if the connection dies."""
+        try:
+            with self.connection(account, folder) as imap:
+                return operation(imap)
+        except CONNECTION_ERRORS:
+            with self.connection(account, folder) as imap:
+                return operation(imap)
+
+    def reserve_slot(self, host: str) -> None:
+        """Count a connection opened outside the pool against ``host``'s cap.
+
+        For the asyncio clients, which cannot share the pool's sockets but must
+        not push a host past ``max_per_host`` either. Waits like a checkout
+        (closing idle pooled connections on the host first); every reserved
+        slot is given back with ``release_slot``.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            while True:
+                if self._open[host] < self.max_per_host:
+                    self._open[host] += 1
+                    return
+                victim = self._pop_idle_on_host(host)
+                if victim is not None:
+                    # The victim's slot is handed over to the caller.
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No IMAP connection to {host} available within {self.wait_timeout}s")
+                self._cond.wait(remaining)
+        victim.client.close()
+
+    def release_slot(self, host: str) -> None:
+        with self._cond:
+            self._open[host] -= 1
+            self._cond.notify_all()
+
+    def maintain(self) -> None:
+        """Close expired idle connections and NOOP the ones that have been idle a while."""
+        now = time.monotonic()
+        expired: list[_PooledConnection] = []
+        stale: list[_PooledConnection] = []
+        with self._cond:
+            for account_id, entries in list(self._idle.items()):
+                for entry in list(entries):
+                    if now - entry.last_used > self.idle_timeout:
+                        entries.remove(entry)
+                        self._open[entry.creds.host] -= 1
+                        expired.append(entry)
+                    elif now - entry.last_used > self.keepalive_interval:
+                        entries.remove(entry)
+                        stale.append(entry)
+                if not entries:
+                    del self._idle[account_id]
+            self._cond.notify_all()
+        for entry in expired:
+            entry.client.close()
+        for entry in stale:
+            try:
+                entry.client.noop()
+            except Exception:
+                self._checkin(entry, healthy=False)
+            else:
+                self._checkin(entry, healthy=True)
+
+    def start_maintenance(self, interval: float | None = None) -> None:
+        if self._maintenance and self._maintenance.is_alive():
+            return
+        self._stopping.clear()
+        interval = interval or max(1.0, self.keepalive_interval / 2)
+
+        def loop() -> None:
+            while not self._stopping.wait(interval):
+                self.maintain()
+
+        self._maintenance = threading.Thread(target=loop, name="imap-pool-maintenance", daemon=True)
+        self._maintenance.start()
+
+    def close_all(self) -> None:
+        self._stopping.set()
+        with self._cond:
+            entries = [entry for entries in self._idle.values() for entry in entries]
+            self._idle.clear()
+            for entry in entries:
+                self._open[entry.creds.host] -= 1
+            self._cond.notify_all()
+        for entry in entries:
+            entry.client.close()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            idle = Counter(entry.creds.host for entries in self._idle.values() for entry in entries)
+            return {host: {"open": count, "idle": idle[host]} for host, count in self._open.items() if count}
+
+    def _checkout(self, creds: AccountCredentials, folder: str) -> _PooledConnection:
+        pooled = self._reserve(creds, folder)
+        if pooled is not None:
+            try:
+                pooled.client.select_folder(folder)
+                return pooled
+            except CONNECTION_ERRORS:
+                # Dead idle connection: keep the reserved slot and reconnect below.
+                pooled.client.close()
+            except imaplib.IMAP4.error:
+                # The server refused the SELECT (e.g. unknown folder); the connection itself is fine.
+                self._checkin(pooled, healthy=True)
+                raise
+            except Exception:
+                self._checkin(pooled, healthy=False)
+                raise
+        client = self.client_factory(creds.host, creds.port, creds.tls)
+        try:
+            client.connect()
+            client.login(creds.email, decrypt(creds.password_enc))
+            client.select_folder(folder)
+        except Exception:
+            client.close()
+            with self._cond:
+                self._open[creds.host] -= 1
+                self._cond.notify_all()
+            raise
+        return _PooledConnection(creds, client)
+
+    def _reserve(self, creds: AccountCredentials, folder: str) -> _PooledConnection | None:
+        """Take an idle connection for the account, or reserve a slot for a new one."""
+        deadline = time.monotonic() + self.wait_timeout
+        victim: _PooledConnection | None = None
+        with self._cond:
+            while True:
+                entries = self._idle.get(creds.account_id)
+                if entries:
+                    entries.sort(key=lambda entry: entry.client.folder == folder)
+                    pooled = entries.pop()
+                    if not entries:
+                        del self._idle[creds.account_id]
+                    if pooled.creds == creds:
+                        return pooled
+                    victim = pooled
+                    break
+                if self._open[creds.host] < self.max_per_host:
+                    self._open[creds.host] += 1
+                    return None
+                victim = self._pop_idle_on_host(creds.host)
+                if victim is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No IMAP connection to {creds.host} available within {self.wait_timeout}s")
+                self._cond.wait(remaining)
+            # The victim's slot is handed over to the new connection; host counts
+            # only change if the credentials point to a different host now.
+            if victim.creds.host != creds.host:
+                self._open[victim.creds.host] -= 1
+                self._open[creds.host] += 1
+        victim.client.close()
+        return None
+
+    def _pop_idle_on_host(self, host: str) -> _PooledConnection | None:
+        candidates = [entry for entries in self._idle.values() for entry in entries if entry.creds.host == host]
+        if not candidates:
+            return None
+        oldest = min(candidates, key=lambda entry: entry.last_used)
+        entries = self._idle[oldest.creds.account_id]
+        entries.remove(oldest)
+        if not entries:
+            del self._idle[oldest.creds.account_id]
+        return oldest
+
+    def _checkin(self, pooled: _PooledConnection, healthy: bool) -> None:
+        if not healthy:
+            pooled.client.close()
+        with self._cond:
+            if healthy:
+                pooled.last_used = time.monotonic()
+                self._idle.setdefault(pooled.creds.account_id, []).append(pooled)
+            else:
+                self._open[pooled.creds.host] -= 1
+            self._cond.notify_all()
+
+
+pool = ImapConnectionPool()
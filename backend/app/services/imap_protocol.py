@@ -0,0 +1,265 @@
+import re
+from typing import Any, Iterable, Iterator, NamedTuple, Sequence, TypeVar
+
+T = TypeVar("T")
+
+_LITERAL_RE = re.compile(rb"\{(\d+)\}$")
+_TOKEN_RE = re.compile(rb'\s*(?:(?P<paren>[()])|"(?P<quoted>(?:[^"\\]|\\.)*)"|(?P<atom>(?:[^\s()"\[\]]|\[[^\]]*\])+))')
+
+
+class BodyPart(NamedTuple):
+    section: str
+    content_type: str
+    charset: str | None
+    encoding: str
+    size: int
+    disposition: str | None
+    filename: str | None
+
+
+SPECIAL_USE_FLAGS = ("\\All", "\\Archive", "\\Drafts", "\\Flagged", "\\Junk", "\\Sent", "\\Trash")
+
+
+class Folder(NamedTuple):
+    name: str
+    delimiter: str | None
+    flags: tuple[str, ...]
+
+    @property
+    def selectable(self) -> bool:
+        lowered = {flag.lower() for flag in self.flags}
+        return "\\noselect" not in lowered and "\\nonexistent" not in lowered
+
+    @property
+    def special_use(self) -> str | None:
+        """The RFC 6154 role of the folder (``\\Sent``, ``\\Archive``, ...), if any."""
+        lowered = {flag.lower() for flag in self.flags}
+        for flag in SPECIAL_USE_FLAGS:
+            if flag.lower() in lowered:
+                return flag
+        return None
+
+
+class Literal(bytes):
+    """Marks a ``{n}`` literal so it is never mistaken for an atom."""
+
+
+def compress_uid_set(uids: Iterable[int]) -> str:
+    """Render UIDs as an IMAP sequence set, e.g. ``[1, 2, 3, 7]`` -> ``1:3,7``."""
+    ranges: list[str] = []
+    start = prev = None
+    for uid in sorted(set(int(u) for u in uids)):
+        if start is None:
+            start = prev = uid
+        elif uid == prev + 1:
+            prev = uid
+        else:
+            ranges.append(f"{start}:{prev}" if start != prev else str(start))
+            start = prev = uid
+    if start is not None:
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(ranges)
+
+
+def parse_uid_set(value: str | bytes, max_uid: int | None = None) -> set[int]:
+    """Expand an IMAP sequence set such as ``300:310,405`` (``*`` means ``max_uid``)."""
+    if isinstance(value, (bytes, bytearray)):
+        value = bytes(value).decode("ascii", errors="ignore")
+    uids: set[int] = set()
+    for token in value.strip().split(","):
+        if not token:
+            continue
+        start, _, end = token.partition(":")
+        if "*" in (start, end) and max_uid is None:
+            continue
+        low = max_uid if start == "*" else int(start)
+        high = low if not end else (max_uid if end == "*" else int(end))
+        low, high = min(low, high), max(low, high)
+        if max_uid is not None:
+            high = min(high, max_uid)
+        uids.update(range(low, high + 1))
+    return uids
+
+
+def chunked(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    size = max(1, size)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def parse_fetch_response(data: list[Any]) -> list[dict[str, Any]]:
+    """Parse the ``data`` list returned by ``imaplib`` for a FETCH command.
+
+    Every FETCH response becomes a dict of its items keyed by the upper-cased
+    item name (``UID``, ``FLAGS``, ``BODY[HEADER.FIELDS (...)]``, ...) plus
+    ``SEQ`` for the message sequence number. Literals are returned as bytes.
+    """
+    tokens = _tokenize(data)
+    messages: list[dict[str, Any]] = []
+    pos = 0
+    while pos < len(tokens):
+        token = tokens[pos]
+        if isinstance(token, int) and pos + 1 < len(tokens) and tokens[pos + 1] == "(":
+            items, pos = _parse_list(tokens, pos + 2)
+            message: dict[str, Any] = {"SEQ": token}
+            for i in range(0, len(items) - 1, 2):
+                if isinstance(items[i], str):
+                    message[items[i].upper()] = items[i + 1]
+            messages.append(message)
+        else:
+            pos += 1
+    return messages
+
+
+def parse_list_response(data: list[Any]) -> list[Folder]:
+    """Parse the ``data`` list returned by ``imaplib`` for LIST, e.g. ``(\\HasNoChildren \\Sent) "/" "Sent"``."""
+    folders: list[Folder] = []
+    for entry in data:
+        if entry is None:
+            continue
+        tokens = _tokenize([entry])
+        if not tokens or tokens[0] != "(":
+            continue
+        flags, pos = _parse_list(tokens, 1)
+        if pos + 1 >= len(tokens):
+            continue
+        delimiter, name = tokens[pos], tokens[pos + 1]
+        folders.append(Folder(
+            _text(name),
+            _text(delimiter) if delimiter is not None else None,
+            tuple(_text(flag) for flag in flags),
+        ))
+    return folders
+
+
+def find_item(message: dict[str, Any], prefix: str) -> Any:
+    """Return the first item whose name starts with ``prefix`` (servers echo sections slightly differently)."""
+    prefix = prefix.upper()
+    for key, value in message.items():
+        if key.startswith(prefix):
+            return value
+    return None
+
+
+def walk_bodystructure(structure: Any, section: str = "") -> list[BodyPart]:
+    """Flatten a parsed BODYSTRUCTURE into its leaf parts with their section numbers.
+
+    Embedded ``message/rfc822`` parts are returned as a single leaf.
+    """
+    if not isinstance(structure, list) or not structure:
+        return []
+    if isinstance(structure[0], list):
+        parts: list[BodyPart] = []
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            parts.extend(walk_bodystructure(child, f"{section}.{index}" if section else str(index)))
+        return parts
+
+    maintype = _text(structure[0] or "").lower()
+    subtype = _text(structure[1] or "").lower() if len(structure) > 1 else ""
+    params = _param_dict(structure[2] if len(structure) > 2 else None)
+    encoding = _text(structure[5] or "7bit").lower() if len(structure) > 5 else "7bit"
+    size = structure[6] if len(structure) > 6 and isinstance(structure[6], int) else 0
+    if maintype == "text":
+        disposition_index = 9
+    elif maintype == "message" and subtype == "rfc822":
+        disposition_index = 11
+    else:
+        disposition_index = 8
+    disposition = None
+    filename = params.get("name")
+    raw_disposition = structure[disposition_index] if len(structure) > disposition_index else None
+    if isinstance(raw_disposition, list) and raw_disposition:
+        disposition = _text(raw_disposition[0]).lower()
+        filename = _param_dict(raw_disposition[1] if len(raw_disposition) > 1 else None).get("filename") or filename
+    return [BodyPart(section or "1", f"{maintype}/{subtype}", params.get("charset"), encoding, size, disposition, filename)]
+
+
+def find_text_part(structure: Any) -> BodyPart | None:
+    """Pick the part a snippet should be built from: first inline text/plain, else text/html."""
+    parts = [part for part in walk_bodystructure(structure) if part.disposition != "attachment"]
+    for content_type in ("text/plain", "text/html"):
+        for part in parts:
+            if part.content_type == content_type:
+                return part
+    return None
+
+
+def find_attachments(structure: Any) -> list[BodyPart]:
+    """Parts to offer as attachments: those with an attachment disposition or a filename."""
+    return [part for part in walk_bodystructure(structure) if part.disposition == "attachment" or part.filename]
+
+
+def _param_dict(params: Any) -> dict[str, str]:
+    if not isinstance(params, list):
+        return {}
+    return {_text(params[i]).lower(): _text(params[i + 1]) for i in range(0, len(params) - 1, 2) if params[i + 1] is not None}
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+
+def _tokenize(data: list[Any]) -> list[Any]:
+    tokens: list[Any] = []
+    for part in data:
+        if isinstance(part, tuple):
+            meta, literal = part[0], part[1]
+            tokens.extend(_tokenize_bytes(_LITERAL_RE.sub(b"", meta.rstrip())))
+            tokens.append(Literal(literal or b""))
+        elif isinstance(part, (bytes, bytearray)):
+            tokens.extend(_tokenize_bytes(bytes(part)))
+    return tokens
+
+
+def _tokenize_bytes(raw: bytes) -> list[Any]:
+    tokens: list[Any] = []
+    pos = 0
+    while pos < len(raw):
+        match = _TOKEN_RE.match(raw, pos)
+        if not match:
+            break
+        pos = match.end()
+        if match.group("paren"):
+            tokens.append(match.group("paren").decode())
+        elif match.group("quoted") is not None:
+            value = re.sub(rb"\\(.)", rb"\1", match.group("quoted"))
+            tokens.append(_QuotedString(value.decode("utf-8", errors="replace")))
+        elif match.group("atom"):
+            atom = match.group("atom").decode("utf-8", errors="replace")
+            if atom.isdigit():
+                tokens.append(int(atom))
+            elif atom.upper() == "NIL":
+                tokens.append(None)
+            else:
+                tokens.append(atom)
+    return tokens
+
+
+class _QuotedString(str):
+    """A quoted string, which unlike a bare atom can never be ``(`` or ``)``."""
+
+
+def _parse_value(tokens: list[Any], pos: int) -> tuple[Any, int]:
+    token = tokens[pos]
+    if token == "(" and not isinstance(token, _QuotedString):
+        return _parse_list(tokens, pos + 1)
+    if isinstance(token, _QuotedString):
+        return str(token), pos + 1
+    return token, pos + 1
+
+
+def _parse_list(tokens: list[Any], pos: int) -> tuple[list[Any], int]:
+    items: list[Any] = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token == ")" and not isinstance(token, _QuotedString):
+            return items, pos + 1
+        value, pos = _parse_value(tokens, pos)
+        items.append(value)
+    return items, pos
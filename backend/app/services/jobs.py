@@ -0,0 +1,322 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, AsyncContextManager, Callable
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models import Account, SyncJob
+from .archive import archive_cutoff, archive_messages
+from .async_imap_client import connect
+from .backfill import BACKFILL_PAUSE, backfill_window
+from .sync import SYNC_FOLDER_PARALLELISM, account_write_lock, needs_full_resync, sync_mailbox_async, syncable_folders
+
+logger = logging.getLogger(__name__)
+
+JOB_CHUNK_SIZE = int(os.getenv("MAILPILOT_SYNC_JOB_CHUNK_SIZE", "200"))
+JOB_CONCURRENCY = int(os.getenv("MAILPILOT_SYNC_JOB_CONCURRENCY", "20"))
+JOB_LEASE_SECONDS = float(os.getenv("MAILPILOT_SYNC_JOB_LEASE_SECONDS", "120"))
+
+FINISHED = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def create_job(
+    db: Session,
+    account_id: int,
+    limit: int,
+    folders: list[str] | None,
+    kind: str = "sync",
+    older_than_days: int | None = None,
+) -> SyncJob:
+    job = SyncJob(
+        account_id=account_id,
+        kind=kind,
+        limit=limit,
+        folders=json.dumps(folders) if folders is not None else None,
+        older_than_days=older_than_days,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def job_progress(job: SyncJob) -> dict[str, Any]:
+    end = job.finished_at or datetime.utcnow()
+    elapsed = (end - job.started_at).total_seconds() if job.started_at else 0.0
+    return {
+        "id": job.id,
+        "account_id": job.account_id,
+        "kind": job.kind,
+        "status": job.status,
+        "fetched": job.fetched,
+        "stored": job.stored,
+        "threads_new": job.threads_new,
+        "chunks": job.chunks,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "elapsed_seconds": elapsed,
+        "messages_per_second": job.fetched / elapsed if elapsed > 0 else None,
+    }
+
+
+class SyncJobRunner:
+    """Runs sync jobs as coroutines on an asyncio loop in a background thread.
+
+    Each folder is synced in chunks of ``chunk_size`` messages and every chunk
+    is committed (followed by the job's counters), so a failed or cancelled
+    job resumes from the last committed chunk: the folders' high-water marks.
+    Backfill jobs commit one date window per chunk and resume from the
+    folders' backfill checkpoints; archive jobs commit one segment per chunk
+    and count the archived messages as ``stored``. Cancellation is checked
+    between chunks.
+
+    With several worker processes, each job is claimed by exactly one: the
+    claim is a conditional UPDATE, and the claiming process renews the job's
+    ``heartbeat_at`` while it runs. A running job whose heartbeat is older
+    than ``lease_seconds`` (its process died) can be claimed again.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = JOB_CHUNK_SIZE,
+        concurrency: int = JOB_CONCURRENCY,
+        folder_parallelism: int = SYNC_FOLDER_PARALLELISM,
+        session_factory: Callable[[], Session] = SessionLocal,
+        connect: Callable[[Account, str | None], AsyncContextManager[Any]] = connect,
+        backfill_pause: float = BACKFILL_PAUSE,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+    ):
+        self.chunk_size = max(1, chunk_size)
+        self.concurrency = concurrency
+        self.folder_parallelism = folder_parallelism
+        self.session_factory = session_factory
+        self.connect = connect
+        self.backfill_pause = backfill_pause
+        self.lease_seconds = lease_seconds
+        self._progress_lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="sync-jobs", daemon=True)
+        self._thread.start()
+        # Jobs interrupted by a restart continue from their last committed chunk;
+        # the claim in _begin skips those another live process is running.
+        with self.session_factory() as db:
+            job_ids = [job_id for (job_id,) in db.query(SyncJob.id).filter(SyncJob.status.in_(("queued", "running")))]
+        for job_id in job_ids:
+            self.submit(job_id)
+
+    def stop(self) -> None:
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+    def submit(self, job_id: int) -> None:
+        if self._loop is None:
+            self.start()
+        asyncio.run_coroutine_threadsafe(self._run_limited(job_id), self._loop)
+
+    async def _run_limited(self, job_id: int) -> None:
+        async with self._slots:
+            await self.run(job_id)
+
+    async def run(self, job_id: int) -> None:
+        account = await asyncio.to_thread(self._begin, job_id)
+        if account is None:
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            kind, folders = await asyncio.to_thread(self._job_spec, job_id)
+            if kind == "archive":
+                folders = [None]  # one pass over the whole account
+            elif folders is None:
+                async with self.connect(account, None) as imap:
+                    folders = syncable_folders(await imap.list_folders())
+            semaphore = asyncio.Semaphore(max(1, self.folder_parallelism))
+
+            async def run_folder(folder: str | None) -> None:
+                async with semaphore:
+                    if kind == "archive":
+                        await asyncio.to_thread(self._archive, job_id, account.id)
+                    elif kind == "backfill":
+                        await self._backfill_folder(job_id, account, folder)
+                    else:
+                        await self._sync_folder(job_id, account, folder)
+
+            outcomes = await asyncio.gather(*(run_folder(folder) for folder in folders), return_exceptions=True)
+            errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+            if any(isinstance(error, JobCancelled) for error in errors):
+                status, error = "cancelled", None
+            elif errors:
+                status, error = "failed", "; ".join(str(error) or error.__class__.__name__ for error in errors)
+            else:
+                status, error = "completed", None
+        except Exception as exc:
+            logger.exception("Sync job %s failed", job_id)
+            status, error = "failed", str(exc)
+        finally:
+            heartbeat.cancel()
+        await asyncio.to_thread(self._finish, job_id, status, error)
+
+    async def _heartbeat(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self._renew_lease, job_id)
+            except Exception:
+                logger.exception("Renewing the lease of sync job %s failed", job_id)
+
+    async def _sync_folder(self, job_id: int, account: Account, folder: str) -> None:
+        async with self.connect(account, folder) as imap:
+            db = self.session_factory()
+            try:
+                job = await asyncio.to_thread(db.get, SyncJob, job_id)
+                # A resumed job only fetches what its earlier runs left of the folder's limit.
+                remaining = job.limit - json.loads(job.folder_progress or "{}").get(folder, 0)
+                # A full resync fetches the newest messages and cannot be split into chunks.
+                if await asyncio.to_thread(needs_full_resync, db, account.id, folder, imap.uidvalidity):
+                    chunk = remaining
+                else:
+                    chunk = min(self.chunk_size, remaining)
+                while remaining > 0:
+                    if await asyncio.to_thread(self._cancel_requested, db, job_id):
+                        raise JobCancelled()
+                    worker_account = await asyncio.to_thread(db.get, Account, account.id)
+                    result = await sync_mailbox_async(db, worker_account, imap, limit=chunk)
+                    await asyncio.to_thread(self._record_chunk, db, job_id, result, folder)
+                    remaining -= result["fetched"]
+                    if result["fetched"] < chunk:
+                        break
+                    chunk = min(self.chunk_size, remaining)
+            finally:
+                await asyncio.to_thread(db.close)
+
+    async def _backfill_folder(self, job_id: int, account: Account, folder: str) -> None:
+        """Import older mail window by window (see ``backfill_window``), each window one chunk."""
+        async with self.connect(account, folder) as imap:
+            db = self.session_factory()
+            try:
+                # Backfill needs a folder state with the current UIDVALIDITY.
+                if await asyncio.to_thread(needs_full_resync, db, account.id, folder, imap.uidvalidity):
+                    worker_account = await asyncio.to_thread(db.get, Account, account.id)
+                    result = await sync_mailbox_async(db, worker_account, imap, limit=self.chunk_size)
+                    await asyncio.to_thread(self._record_chunk, db, job_id, result)
+                while True:
+                    if await asyncio.to_thread(self._cancel_requested, db, job_id):
+                        raise JobCancelled()
+                    worker_account = await asyncio.to_thread(db.get, Account, account.id)
+                    result = await backfill_window(db, worker_account, imap, pause=self.backfill_pause)
+                    if result is None:
+                        break
+                    await asyncio.to_thread(self._record_chunk, db, job_id, result)
+            finally:
+                await asyncio.to_thread(db.close)
+
+    def _archive(self, job_id: int, account_id: int) -> None:
+        """Archive old messages ``chunk_size`` at a time, one segment and commit per chunk."""
+        with self.session_factory() as db:
+            before = archive_cutoff(db.get(SyncJob, job_id).older_than_days)
+            while True:
+                if self._cancel_requested(db, job_id):
+                    raise JobCancelled()
+                with account_write_lock(account_id):
+                    archived = archive_messages(db, account_id, before, limit=self.chunk_size)
+                    db.commit()
+                if not archived:
+                    break
+                self._record_chunk(db, job_id, {"fetched": 0, "messages_new": archived, "threads_new": 0})
+
+    def _begin(self, job_id: int) -> Account | None:
+        """Claim the job for this process; its account, or ``None`` if there is nothing to run."""
+        with self.session_factory() as db:
+            now = datetime.utcnow()
+            claimed = db.execute(
+                update(SyncJob)
+                .where(
+                    SyncJob.id == job_id,
+                    or_(
+                        SyncJob.status == "queued",
+                        and_(
+                            SyncJob.status == "running",
+                            or_(SyncJob.heartbeat_at.is_(None), SyncJob.heartbeat_at < now - timedelta(seconds=self.lease_seconds)),
+                        ),
+                    ),
+                )
+                .values(status="running", heartbeat_at=now, started_at=func.coalesce(SyncJob.started_at, now))
+            ).rowcount
+            db.commit()
+            if not claimed:
+                return None
+            job = db.get(SyncJob, job_id)
+            account = db.get(Account, job.account_id)
+            if account is None:
+                job.status, job.error, job.finished_at = "failed", "Account not found", datetime.utcnow()
+                db.commit()
+                return None
+            db.refresh(account)
+            db.expunge(account)
+            return account
+
+    def _job_spec(self, job_id: int) -> tuple[str, list[str] | None]:
+        with self.session_factory() as db:
+            job = db.get(SyncJob, job_id)
+            return job.kind, json.loads(job.folders) if job.folders is not None else None
+
+    @staticmethod
+    def _cancel_requested(db: Session, job_id: int) -> bool:
+        return bool(db.query(SyncJob.cancel_requested).filter(SyncJob.id == job_id).scalar())
+
+    def _record_chunk(self, db: Session, job_id: int, result: dict[str, Any], folder: str | None = None) -> None:
+        # Increment in SQL: folders of one job report their chunks concurrently.
+        values = {
+            SyncJob.fetched: SyncJob.fetched + result["fetched"],
+            SyncJob.stored: SyncJob.stored + result["messages_new"],
+            SyncJob.threads_new: SyncJob.threads_new + result["threads_new"],
+            SyncJob.chunks: SyncJob.chunks + 1,
+            SyncJob.heartbeat_at: datetime.utcnow(),
+        }
+        # The per-folder counts are one JSON value; only this process runs the job, so a lock suffices.
+        with self._progress_lock:
+            if folder is not None:
+                progress_json = db.query(SyncJob.folder_progress).filter(SyncJob.id == job_id).scalar()
+                progress = json.loads(progress_json or "{}")
+                progress[folder] = progress.get(folder, 0) + result["fetched"]
+                values[SyncJob.folder_progress] = json.dumps(progress)
+            db.query(SyncJob).filter(SyncJob.id == job_id).update(values, synchronize_session=False)
+            db.commit()
+
+    def _renew_lease(self, job_id: int) -> None:
+        with self.session_factory() as db:
+            db.query(SyncJob).filter(SyncJob.id == job_id, SyncJob.status == "running").update(
+                {SyncJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+
+    def _finish(self, job_id: int, status: str, error: str | None) -> None:
+        with self.session_factory() as db:
+            job = db.get(SyncJob, job_id)
+            job.status = status
+            job.error = error
+            job.finished_at = datetime.utcnow()
+            db.commit()
+
+
+runner = SyncJobRunner()
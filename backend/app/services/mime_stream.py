@@ -0,0 +1,158 @@
+import base64
+import binascii
+import hashlib
+import os
+import quopri
+import re
+from email.message import Message
+from email.parser import BytesHeaderParser
+from email.policy import compat32
+
+MIME_MEMORY_LIMIT = int(os.getenv("MAILPILOT_MIME_MEMORY_LIMIT", str(4 * 1024 * 1024)))
+
+_HEADER_PARSER = BytesHeaderParser(policy=compat32)
+
+
+class BodyExtractor:
+    """Incremental MIME parser that keeps only the readable body of a message.
+
+    Data is fed as it arrives from the socket. Part headers are parsed with
+    ``email.parser``, but the payload of a part is only kept if it can become
+    the body (the first inline ``text/plain``, else ``text/html``, or the only
+    part of a single-part message); attachment payloads are dropped line by
+    line. Buffered headers plus kept payloads never exceed ``max_bytes``, the
+    rest of an oversized body is cut off.
+
+    ``close()`` returns the same text ``_extract_body`` would; ``digest`` is
+    the SHA-256 of the raw message fed so far.
+    """
+
+    def __init__(self, max_bytes: int = MIME_MEMORY_LIMIT):
+        self.max_bytes = max_bytes
+        self.truncated = False
+        self._pending = bytearray()
+        self._boundaries: list[bytes] = []
+        self._mode = "headers"
+        self._headers: list[bytes] = []
+        self._multipart = False
+        self._part: Message | None = None
+        self._payload: bytearray | None = None
+        self._found: dict[str, tuple[Message, bytes]] = {}
+        self._used = 0
+        self._hash = hashlib.sha256()
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    def feed(self, data: bytes) -> None:
+        self._hash.update(data)
+        self._pending += data
+        start = 0
+        while (end := self._pending.find(b"\n", start)) >= 0:
+            self._line(bytes(self._pending[start:end + 1]))
+            start = end + 1
+        del self._pending[:start]
+
+    def close(self) -> str:
+        if self._pending:
+            self._line(bytes(self._pending))
+            self._pending.clear()
+        if self._mode == "headers" and self._headers:
+            self._start_body()
+        self._end_part()
+        if not self._multipart:
+            found = self._found.get("single")
+            return _decode_text(*found) if found else ""
+        if "text/plain" in self._found:
+            return _decode_text(*self._found["text/plain"])
+        if "text/html" in self._found:
+            text = re.sub(r"<[^>]+>", " ", _decode_text(*self._found["text/html"]))
+            return re.sub(r"\s+", " ", text).strip()
+        return ""
+
+    def _line(self, line: bytes) -> None:
+        if self._boundaries and line.startswith(b"--"):
+            marker = line.rstrip()
+            for depth in range(len(self._boundaries) - 1, -1, -1):
+                boundary = self._boundaries[depth]
+                if marker == boundary or marker == boundary + b"--":
+                    self._end_part()
+                    del self._boundaries[depth + 1:]
+                    if marker == boundary:
+                        self._mode = "headers"
+                    else:
+                        # Epilogue: skipped until the next boundary of an enclosing multipart.
+                        self._boundaries.pop()
+                        self._mode = "skip"
+                    return
+        if self._mode == "headers":
+            if not line.strip():
+                self._start_body()
+            elif self._keep(len(line)):
+                self._headers.append(line)
+        elif self._payload is not None and self._keep(len(line)):
+            self._payload += line
+
+    def _start_body(self) -> None:
+        part = _HEADER_PARSER.parsebytes(b"".join(self._headers))
+        self._used -= sum(len(line) for line in self._headers)
+        self._headers = []
+        self._mode = "skip"
+        content_type = part.get_content_type()
+        if part.get_content_maintype() == "multipart":
+            boundary = part.get_boundary()
+            if boundary:
+                self._multipart = True
+                self._boundaries.append(b"--" + boundary.encode("ascii", errors="replace"))
+            return
+        if content_type == "message/rfc822" and part.get_content_disposition() != "attachment":
+            # The embedded message's headers follow directly.
+            self._mode = "headers"
+            return
+        self._mode = "body"
+        if not self._multipart and not self._boundaries:
+            wanted = "single"
+        elif part.get_content_disposition() != "attachment" and content_type in ("text/plain", "text/html"):
+            wanted = content_type
+        else:
+            return
+        if wanted not in self._found and "text/plain" not in self._found:
+            self._part = part
+            self._payload = bytearray()
+
+    def _end_part(self) -> None:
+        if self._payload is None:
+            return
+        # The line break before a boundary belongs to the boundary.
+        payload = bytes(self._payload)
+        if self._boundaries:
+            payload = payload[:-2] if payload.endswith(b"\r\n") else payload.removesuffix(b"\n")
+        key = self._part.get_content_type() if self._multipart else "single"
+        self._found.setdefault(key, (self._part, payload))
+        self._part = None
+        self._payload = None
+
+    def _keep(self, size: int) -> bool:
+        if self._used + size > self.max_bytes:
+            self.truncated = True
+            return False
+        self._used += size
+        return True
+
+
+def _decode_text(part: Message, payload: bytes) -> str:
+    encoding = str(part.get("Content-Transfer-Encoding", "")).strip().lower()
+    if encoding == "base64":
+        data = re.sub(rb"[^A-Za-z0-9+/]", b"", payload)
+        try:
+            payload = base64.b64decode(data[: len(data) - len(data) % 4])
+        except (binascii.Error, ValueError):
+            payload = b""
+    elif encoding == "quoted-printable":
+        payload = quopri.decodestring(payload)
+    charset = part.get_content_charset() or "utf-8"
+    try:
+        return payload.decode(charset, errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
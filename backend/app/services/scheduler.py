@@ -0,0 +1,217 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy import func
+
+from ..db import SessionLocal
+from ..models import Account, Thread
+from .imap_pool import MAX_CONNECTIONS_PER_HOST
+from .sync import SYNC_FOLDER_PARALLELISM, sync_account_folders
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_ENABLED = os.getenv("MAILPILOT_SCHEDULER_ENABLED", "0") == "1"
+SCHEDULER_INTERVAL = float(os.getenv("MAILPILOT_SCHEDULER_INTERVAL", "300"))
+SCHEDULER_WORKERS = int(os.getenv("MAILPILOT_SCHEDULER_WORKERS", "8"))
+SCHEDULER_SYNC_LIMIT = int(os.getenv("MAILPILOT_SCHEDULER_SYNC_LIMIT", "50"))
+SCHEDULER_MAX_BACKOFF = float(os.getenv("MAILPILOT_SCHEDULER_MAX_BACKOFF", "3600"))
+# Every account sync may open SYNC_FOLDER_PARALLELISM connections; keep the
+# accounts in flight per host within the pool's per-host connection cap.
+ACCOUNTS_PER_HOST = max(1, MAX_CONNECTIONS_PER_HOST // max(1, SYNC_FOLDER_PARALLELISM))
+# Accounts with mail newer than this are synced before the others.
+ACTIVE_WINDOW = timedelta(days=7)
+
+
+@dataclass
+class AccountSchedule:
+    account_id: int
+    host: str
+    last_activity: datetime | None = None
+    next_run: float = 0.0
+    running: bool = False
+    failures: int = 0
+    last_error: str | None = None
+    last_duration: float | None = None
+    last_synced_at: datetime | None = None
+
+
+def load_accounts() -> list[tuple[int, str, datetime | None]]:
+    """``(account_id, imap_host, newest message date)`` for every account."""
+    with SessionLocal() as db:
+        rows = (
+            db.query(Account.id, Account.imap_host, func.max(Thread.last_message_at))
+            .outerjoin(Thread, Thread.account_id == Account.id)
+            .group_by(Account.id, Account.imap_host)
+            .all()
+        )
+    return [(account_id, host, last_activity) for account_id, host, last_activity in rows]
+
+
+def sync_account(account_id: int) -> dict[str, Any]:
+    with SessionLocal() as db:
+        account = db.get(Account, account_id)
+        if account is None:
+            return {}
+        return sync_account_folders(account, limit=SCHEDULER_SYNC_LIMIT)
+
+
+class SyncScheduler:
+    """Periodically syncs every account on a bounded worker pool.
+
+    Due accounts are started most-recently-active first, with at most
+    ``per_host`` accounts of one IMAP host in flight. A failing account is
+    retried after ``interval * 2**failures`` (capped at ``max_backoff``).
+    """
+
+    def __init__(
+        self,
+        interval: float = SCHEDULER_INTERVAL,
+        workers: int = SCHEDULER_WORKERS,
+        per_host: int = ACCOUNTS_PER_HOST,
+        max_backoff: float = SCHEDULER_MAX_BACKOFF,
+        sync: Callable[[int], dict[str, Any]] = sync_account,
+        accounts: Callable[[], list[tuple[int, str, datetime | None]]] = load_accounts,
+    ):
+        self.interval = interval
+        self.workers = workers
+        self.per_host = per_host
+        self.max_backoff = max_backoff
+        self.sync = sync
+        self.accounts = accounts
+        self._schedules: dict[int, AccountSchedule] = {}
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sync-scheduler")
+        self._thread = threading.Thread(target=self._loop, name="sync-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def refresh(self) -> None:
+        """Pick up new and deleted accounts and their latest activity."""
+        rows = self.accounts()
+        with self._cond:
+            seen = set()
+            for account_id, host, last_activity in rows:
+                seen.add(account_id)
+                schedule = self._schedules.get(account_id)
+                if schedule is None:
+                    self._schedules[account_id] = AccountSchedule(account_id, host, last_activity)
+                else:
+                    schedule.host = host
+                    schedule.last_activity = last_activity
+            for account_id in set(self._schedules) - seen:
+                if not self._schedules[account_id].running:
+                    del self._schedules[account_id]
+
+    def take_due(self, now: float | None = None) -> list[AccountSchedule]:
+        """Mark and return the accounts to start now, respecting the worker and per-host caps."""
+        now = time.monotonic() if now is None else now
+        active_since = datetime.utcnow() - ACTIVE_WINDOW
+        with self._cond:
+            running = [schedule for schedule in self._schedules.values() if schedule.running]
+            per_host = Counter(schedule.host for schedule in running)
+            free = self.workers - len(running)
+            due = [s for s in self._schedules.values() if not s.running and s.next_run <= now]
+            due.sort(key=lambda s: (
+                not (s.last_activity and s.last_activity >= active_since),
+                -s.last_activity.timestamp() if s.last_activity else 0.0,
+                s.next_run,
+            ))
+            taken: list[AccountSchedule] = []
+            for schedule in due:
+                if len(taken) >= free:
+                    break
+                if per_host[schedule.host] >= self.per_host:
+                    continue
+                per_host[schedule.host] += 1
+                schedule.running = True
+                taken.append(schedule)
+            return taken
+
+    def run_one(self, schedule: AccountSchedule) -> None:
+        started = time.monotonic()
+        try:
+            result = self.sync(schedule.account_id)
+        except Exception as exc:
+            logger.warning("Scheduled sync of account %s failed: %s", schedule.account_id, exc)
+            error: str | None = str(exc) or exc.__class__.__name__
+            result = {}
+        else:
+            error = None
+        finished = time.monotonic()
+        with self._cond:
+            schedule.running = False
+            schedule.last_duration = finished - started
+            schedule.last_error = error
+            if error is None:
+                schedule.failures = 0
+                schedule.next_run = finished + self.interval
+                schedule.last_synced_at = datetime.utcnow()
+                if result.get("messages_new"):
+                    schedule.last_activity = datetime.utcnow()
+            else:
+                schedule.failures += 1
+                schedule.next_run = finished + min(self.interval * 2 ** schedule.failures, self.max_backoff)
+            self._cond.notify_all()
+
+    def status(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._cond:
+            schedules = sorted(self._schedules.values(), key=lambda s: s.account_id)
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "queue_depth": sum(1 for s in schedules if not s.running and s.next_run <= now),
+                "in_flight": sum(1 for s in schedules if s.running),
+                "accounts": [
+                    {
+                        "account_id": s.account_id,
+                        "host": s.host,
+                        "syncing": s.running,
+                        "last_sync_seconds": s.last_duration,
+                        "last_synced_at": s.last_synced_at,
+                        "next_sync_in": max(0.0, s.next_run - now),
+                        "failures": s.failures,
+                        "last_error": s.last_error,
+                    }
+                    for s in schedules
+                ],
+            }
+
+    def _loop(self) -> None:
+        next_refresh = 0.0
+        while not self._stopping.is_set():
+            now = time.monotonic()
+            try:
+                if now >= next_refresh:
+                    self.refresh()
+                    next_refresh = now + min(self.interval, 60.0)
+                for schedule in self.take_due(now):
+                    self._executor.submit(self.run_one, schedule)
+            except Exception:
+                logger.exception("Sync scheduler iteration failed")
+            with self._cond:
+                self._cond.wait(timeout=1.0)
+
+
+scheduler = SyncScheduler()
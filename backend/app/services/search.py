@@ -0,0 +1,145 @@
+import re
+from typing import Any, Iterable
+
+from sqlalchemy import DateTime, Float, Integer, String, Text, bindparam, column, delete, table, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from .imap_protocol import chunked
+
+SEARCH_DIALECTS = ("sqlite", "postgresql")
+
+# bm25 weights of subject, from_addr, to_addr, snippet and body on SQLite.
+_SQLITE_RANK = "bm25(message_search, 10.0, 5.0, 5.0, 2.0, 1.0)"
+# The same columns weighted A to D on Postgres; the body is added separately.
+_POSTGRES_DOCUMENT = """
+    setweight(to_tsvector('simple', coalesce(m.subject, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce(m.from_addr, '') || ' ' || coalesce(m.to_addr, '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(m.snippet, '')), 'C')
+"""
+_POSTGRES_BODY = "setweight(to_tsvector('simple', coalesce(:body, '')), 'D')"
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class SearchUnavailable(RuntimeError):
+    pass
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def index_threads(db: Session, thread_ids: Iterable[int]) -> None:
+    """Add the not yet indexed messages of ``thread_ids`` to the search index.
+
+    Called by ingest right after its bulk insert, whose ids are not known;
+    the body is added later by ``index_body`` once it has been fetched.
+    Archived stubs are skipped: they stay indexed with the content they had.
+    """
+    dialect = _dialect(db)
+    for chunk in chunked(list(thread_ids), 500):
+        params = {"thread_ids": list(chunk)}
+        if dialect == "sqlite":
+            db.execute(text(
+                """
+                INSERT INTO message_search (rowid, subject, from_addr, to_addr, snippet, body)
+                SELECT m.id, m.subject, m.from_addr, m.to_addr, m.snippet, ''
+                FROM messages m
+                WHERE m.thread_id IN :thread_ids AND m.archive_segment IS NULL
+                  AND NOT EXISTS (SELECT 1 FROM message_search s WHERE s.rowid = m.id)
+                """
+            ).bindparams(bindparam("thread_ids", expanding=True)), params)
+        elif dialect == "postgresql":
+            db.execute(text(
+                f"""
+                INSERT INTO message_search (message_id, document)
+                SELECT m.id, {_POSTGRES_DOCUMENT}
+                FROM messages m
+                WHERE m.thread_id IN :thread_ids AND m.archive_segment IS NULL
+                ON CONFLICT (message_id) DO NOTHING
+                """
+            ).bindparams(bindparam("thread_ids", expanding=True)), params)
+
+
+def index_body(db: Session, message_id: int, body: str) -> None:
+    """Make the body text of an indexed message searchable.
+
+    On Postgres the document is rebuilt from the row, which an archived stub
+    no longer has; stubs keep the document they were archived with.
+    """
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        db.execute(text("UPDATE message_search SET body = :body WHERE rowid = :id"), {"id": message_id, "body": body})
+    elif dialect == "postgresql":
+        db.execute(text(
+            f"""
+            UPDATE message_search s SET document = {_POSTGRES_DOCUMENT} || {_POSTGRES_BODY}
+            FROM messages m WHERE m.id = s.message_id AND s.message_id = :id AND m.archive_segment IS NULL
+            """
+        ), {"id": message_id, "body": body})
+
+
+def unindex(db: Session, message_ids: Iterable[int] | Select) -> None:
+    """Drop messages from the search index; call before deleting them.
+
+    ``message_ids`` may be a ``select()`` of ids, which is run as a subquery.
+    """
+    dialect = _dialect(db)
+    if dialect not in SEARCH_DIALECTS:
+        return
+    key = column("rowid" if dialect == "sqlite" else "message_id")
+    index = table("message_search", key)
+    if isinstance(message_ids, Select):
+        db.execute(delete(index).where(key.in_(message_ids)))
+        return
+    for chunk in chunked(list(message_ids), 500):
+        db.execute(delete(index).where(key.in_(chunk)))
+
+
+def search_messages(
+    db: Session, account_id: int, query: str, limit: int, after: list[Any] | None = None
+) -> list[dict[str, Any]]:
+    """Messages of the account matching every word of ``query`` as a prefix, best first.
+
+    Archived stubs are among them with their archived columns empty (see
+    ``archive.rehydrate_results``).
+
+    Rows are ordered by ``rank`` (lower is better) and id; ``after`` is the
+    ``(rank, id)`` of the previous page's last row.
+    """
+    words = [word.lower() for word in _WORD_RE.findall(query)]
+    if not words:
+        return []
+    dialect = _dialect(db)
+    params: dict[str, Any] = {"account_id": account_id, "limit": limit}
+    if dialect == "sqlite":
+        params["query"] = " ".join(f'"{word}"*' for word in words)
+        rank = _SQLITE_RANK
+        source = "message_search JOIN messages m ON m.id = message_search.rowid"
+        match = "message_search MATCH :query"
+    elif dialect == "postgresql":
+        params["query"] = " & ".join(f"{word}:*" for word in words)
+        rank = "-ts_rank_cd(s.document, to_tsquery('simple', :query))"
+        source = "message_search s JOIN messages m ON m.id = s.message_id"
+        match = "s.document @@ to_tsquery('simple', :query)"
+    else:
+        raise SearchUnavailable(f"Full-text search is not supported on {dialect}")
+    page = ""
+    if after is not None:
+        params["after_rank"], params["after_id"] = after
+        page = f"AND ({rank} > :after_rank OR ({rank} = :after_rank AND m.id > :after_id))"
+    rows = db.execute(text(
+        f"""
+        SELECT m.id, m.thread_id, m.subject, m.from_addr, m.date, m.snippet, m.archive_segment, {rank} AS rank
+        FROM {source} JOIN threads t ON t.id = m.thread_id
+        WHERE {match} AND t.account_id = :account_id {page}
+        ORDER BY rank, m.id
+        LIMIT :limit
+        """
+    ).columns(
+        id=Integer, thread_id=Integer, subject=String, from_addr=String, date=DateTime, snippet=Text,
+        archive_segment=Integer, rank=Float,
+    ), params)
+    return [dict(row._mapping) for row in rows]
+
@@ -0,0 +1,498 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal, insert_ignore
+from ..models import Account, ActionItem, FolderState, Message, Subscription, Thread, ThreadMessageId
+from .archive import read_archived
+from .async_imap_client import AsyncImapClient
+from .classifier import is_newsletter, guess_category, priority
+from .counters import apply_changes, recount, thread_states, tracked
+from .crypto import decrypt
+from .imap_client import FolderChanges, ImapClient
+from .imap_pool import ImapConnectionPool, pool as imap_pool
+from .imap_protocol import Folder, chunked
+from .search import index_threads, unindex
+from .threader import assign_threads
+
+
+SYNC_FOLDER_PARALLELISM = int(os.getenv("MAILPILOT_SYNC_FOLDER_PARALLELISM", "4"))
+# Virtual or throwaway folders: \All and \Flagged duplicate other folders' mail.
+SKIP_SPECIAL_USE = {"\\All", "\\Flagged", "\\Junk", "\\Trash"}
+
+_locks: dict[tuple, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _named_lock(key: tuple) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def folder_lock(account_id: int, folder: str) -> threading.Lock:
+    """Lock serializing syncs of one folder (manual sync vs. IDLE watcher)."""
+    return _named_lock(("folder", account_id, folder))
+
+
+def account_write_lock(account_id: int) -> threading.Lock:
+    """Lock serializing the database writes of an account's folder syncs.
+
+    Folders share threads, so concurrent ingests could race on ``uq_thread_key``;
+    only the IMAP round trips run in parallel.
+    """
+    return _named_lock(("account", account_id))
+
+
+def get_folder_state(db: Session, account_id: int, folder: str) -> FolderState:
+    state = (
+        db.query(FolderState)
+        .filter(FolderState.account_id == account_id, FolderState.folder == folder)
+        .first()
+    )
+    if not state:
+        state = FolderState(account_id=account_id, folder=folder, last_uid=0)
+        db.add(state)
+    return state
+
+
+def sync_mailbox(db: Session, account: Account, imap: ImapClient, limit: int = 50) -> dict[str, Any]:
+    """Fetch new mail from the selected folder and store it.
+
+    Only UIDs above the stored high-water mark are fetched. When the server
+    reports a different UIDVALIDITY the stored UIDs are meaningless, so the
+    folder's messages are dropped and the latest ``limit`` are fetched again.
+    Otherwise flag changes and expunges of already stored messages are
+    reconciled (see ``ImapClient.fetch_changes``). Concurrent syncs of the
+    same folder are serialized with ``folder_lock``.
+    """
+    folder = imap.folder or "INBOX"
+    with folder_lock(account.id, folder):
+        return _sync_folder(db, account, imap, folder, limit)
+
+
+def _sync_folder(db: Session, account: Account, imap: ImapClient, folder: str, limit: int) -> dict[str, Any]:
+    state, full_resync = _load_state(db, account.id, folder, imap.uidvalidity)
+    changes = FolderChanges({}, set())
+    if full_resync:
+        messages = imap.fetch_latest(limit=limit)
+    else:
+        changes = imap.fetch_changes(state.last_uid, state.highest_modseq, lambda: _known_uids(db, account.id, folder))
+        messages = imap.fetch_since(state.last_uid, limit=limit)
+    return _store_folder(db, account, imap, state, full_resync, messages, changes)
+
+
+async def sync_mailbox_async(db: Session, account: Account, imap: AsyncImapClient, limit: int = 50) -> dict[str, Any]:
+    """``sync_mailbox`` for ``AsyncImapClient``; database work runs in worker threads."""
+    account_id = account.id
+    folder = imap.folder or "INBOX"
+    lock = folder_lock(account_id, folder)
+    # Poll instead of blocking a thread on acquire(): a cancelled request must not leave the lock taken.
+    while not lock.acquire(blocking=False):
+        await asyncio.sleep(0.05)
+    try:
+        state, full_resync = await asyncio.to_thread(_load_state, db, account_id, folder, imap.uidvalidity)
+        changes = FolderChanges({}, set())
+        if full_resync:
+            messages = await imap.fetch_latest(limit=limit)
+        else:
+            changes = await imap.fetch_changes(
+                state.last_uid, state.highest_modseq, lambda: asyncio.to_thread(_known_uids, db, account_id, folder)
+            )
+            messages = await imap.fetch_since(state.last_uid, limit=limit)
+        return await asyncio.to_thread(_store_folder, db, account, imap, state, full_resync, messages, changes)
+    finally:
+        lock.release()
+
+
+def needs_full_resync(db: Session, account_id: int, folder: str, uidvalidity: int | None) -> bool:
+    stored = (
+        db.query(FolderState.uidvalidity)
+        .filter(FolderState.account_id == account_id, FolderState.folder == folder)
+        .scalar()
+    )
+    return stored is None or stored != uidvalidity
+
+
+def _load_state(db: Session, account_id: int, folder: str, uidvalidity: int | None) -> tuple[FolderState, bool]:
+    # Re-read the state inside the folder lock; another sync may just have advanced it.
+    db.expire_all()
+    state = get_folder_state(db, account_id, folder)
+    return state, state.uidvalidity is None or state.uidvalidity != uidvalidity
+
+
+def _store_folder(
+    db: Session,
+    account: Account,
+    imap: ImapClient | AsyncImapClient,
+    state: FolderState,
+    full_resync: bool,
+    messages: list[dict[str, Any]],
+    changes: FolderChanges,
+) -> dict[str, Any]:
+    folder = state.folder
+    with account_write_lock(account.id):
+        if full_resync and state.uidvalidity is not None:
+            _drop_messages(db, account.id, folder)
+        flags_updated = apply_flag_changes(db, account.id, changes.flags, folder)
+        vanished = remove_vanished(db, account.id, changes.vanished, folder)
+        result = ingest_messages(db, account, messages, folder)
+        if full_resync:
+            db.flush()
+            _delete_empty_threads(db, select(Thread.id).where(Thread.account_id == account.id))
+            # Dropping the folder changed counts of threads all over the account.
+            recount(db, account.id)
+            state.backfill_before = None
+            state.backfill_complete = False
+
+        state.uidvalidity = imap.uidvalidity
+        state.highest_modseq = imap.highest_modseq
+        state.last_uid = max([state.last_uid or 0] + [msg["uid"] for msg in messages])
+        state.synced_at = datetime.utcnow()
+        db.commit()
+    result.update({
+        "fetched": len(messages),
+        "full_resync": full_resync,
+        "flags_updated": flags_updated,
+        "vanished": vanished,
+    })
+    return result
+
+
+def discover_folders(account: Account, pool: ImapConnectionPool = imap_pool) -> list[str]:
+    """Names of the account's folders worth syncing, INBOX first."""
+    return syncable_folders(pool.run(account, "INBOX", lambda imap: imap.list_folders()))
+
+
+def syncable_folders(folders: list[Folder]) -> list[str]:
+    names = [
+        folder.name
+        for folder in folders
+        if folder.selectable and folder.special_use not in SKIP_SPECIAL_USE
+    ]
+    return sorted(names, key=lambda name: name.upper() != "INBOX")
+
+
+def sync_account_folders(
+    account: Account,
+    limit: int = 50,
+    folders: list[str] | None = None,
+    parallelism: int = SYNC_FOLDER_PARALLELISM,
+    pool: ImapConnectionPool = imap_pool,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> dict[str, Any]:
+    """Sync several folders concurrently, each on its own pooled connection and session.
+
+    At most ``parallelism`` folders are in flight; the pool's per-host cap
+    applies on top. See ``_summarize`` for the result and error handling.
+    """
+    account_id = account.id
+    if folders is None:
+        folders = discover_folders(account, pool)
+
+    def sync_one(folder: str) -> dict[str, Any]:
+        with session_factory() as db:
+            worker_account = db.get(Account, account_id)
+            with pool.connection(worker_account, folder) as imap:
+                return sync_mailbox(db, worker_account, imap, limit=limit)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(folders) or 1)), thread_name_prefix="folder-sync") as executor:
+        futures = [executor.submit(sync_one, folder) for folder in folders]
+    outcomes: list[dict[str, Any] | BaseException] = []
+    for future in futures:
+        exc = future.exception()
+        outcomes.append(exc if exc is not None else future.result())
+    return _summarize(folders, outcomes)
+
+
+async def sync_account_folders_async(
+    account: Account,
+    limit: int = 50,
+    folders: list[str] | None = None,
+    parallelism: int = SYNC_FOLDER_PARALLELISM,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> dict[str, Any]:
+    """``sync_account_folders`` on ``AsyncImapClient`` connections, one per folder in flight."""
+    account_id = account.id
+    host, port, tls, email_addr = account.imap_host, account.imap_port, account.imap_tls, account.email
+    password = decrypt(account.password_enc)
+
+    def client() -> AsyncImapClient:
+        return AsyncImapClient(host, port, tls)
+
+    if folders is None:
+        async with client() as imap:
+            await imap.login(email_addr, password)
+            folders = syncable_folders(await imap.list_folders())
+
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+
+    async def sync_one(folder: str) -> dict[str, Any]:
+        async with semaphore, client() as imap:
+            await imap.login(email_addr, password)
+            await imap.select_folder(folder)
+            db = session_factory()
+            try:
+                worker_account = await asyncio.to_thread(db.get, Account, account_id)
+                return await sync_mailbox_async(db, worker_account, imap, limit=limit)
+            finally:
+                await asyncio.to_thread(db.close)
+
+    outcomes = await asyncio.gather(*(sync_one(folder) for folder in folders), return_exceptions=True)
+    return _summarize(folders, outcomes)
+
+
+def _summarize(folders: list[str], outcomes: list[dict[str, Any] | BaseException]) -> dict[str, Any]:
+    """Totals over all folders plus per-folder results; raises if every folder failed.
+
+    A failing folder does not stop the others, its error is reported in its result.
+    """
+    errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    if folders and len(errors) == len(folders):
+        raise errors[0]
+    results = {
+        folder: {"error": str(outcome)} if isinstance(outcome, BaseException) else outcome
+        for folder, outcome in zip(folders, outcomes)
+    }
+    totals: dict[str, Any] = {key: 0 for key in ("threads_new", "messages_new", "fetched", "flags_updated", "vanished")}
+    for result in results.values():
+        for key in totals:
+            totals[key] += result.get(key, 0)
+    totals["full_resync"] = any(result.get("full_resync") for result in results.values())
+    totals["folders"] = results
+    return totals
+
+
+def ingest_messages(db: Session, account: Account, messages: list[dict[str, Any]], folder: str = "INBOX") -> dict[str, Any]:
+    """Store fetched messages as one batch.
+
+    Existing threads, messages and subscriptions of the batch are preloaded
+    with one query per 500 keys; the missing rows are written with bulk
+    ``INSERT ... ON CONFLICT DO NOTHING`` and threads are updated in one
+    executemany by primary key. When a thread gets several messages, the
+    classification of the last one in ``messages`` wins, as it would when
+    storing them one by one.
+    """
+    if not messages:
+        return {"threads_new": 0, "messages_new": 0}
+    db.flush()
+
+    assignment = assign_threads(db, account.id, messages)
+    threads = _load_threads(db, set(assignment.thread_ids))
+    batch = [
+        (msg, thread_id, is_newsletter(msg.get("list_unsubscribe"), msg.get("snippet")))
+        for msg, thread_id in zip(messages, assignment.thread_ids)
+    ]
+
+    before = thread_states(db, threads)
+    updates: dict[int, dict[str, Any]] = {}
+    for msg, thread_id, newsletter in batch:
+        thread = threads[thread_id]
+        row = updates.setdefault(
+            thread.id, {"id": thread.id, "subject": thread.subject, "last_message_at": thread.last_message_at}
+        )
+        score, reason = priority(msg.get("subject"), msg.get("snippet"), newsletter)
+        row.update(
+            category=guess_category(msg.get("subject"), msg.get("snippet"), newsletter),
+            priority_score=score,
+            priority_reason=reason,
+            is_newsletter=newsletter,
+        )
+        if msg.get("date") and (row["last_message_at"] is None or msg["date"] > row["last_message_at"]):
+            row["last_message_at"] = msg["date"]
+            row["subject"] = msg.get("subject") or row["subject"]
+    db.execute(update(Thread), list(updates.values()))
+
+    stored = _stored_uids(db, list(threads), folder)
+    rows = []
+    senders: dict[str, str | None] = {}
+    for msg, thread_id, newsletter in batch:
+        pair = (thread_id, msg["uid"])
+        if pair in stored:
+            continue
+        stored.add(pair)
+        flags = msg.get("flags") or []
+        rows.append({
+            "thread_id": pair[0],
+            "folder": folder,
+            "imap_uid": msg["uid"],
+            "message_id": msg.get("message_id"),
+            "in_reply_to": msg.get("in_reply_to"),
+            "references": msg.get("references"),
+            "from_addr": msg.get("from"),
+            "to_addr": msg.get("to"),
+            "subject": msg.get("subject"),
+            "date": msg.get("date"),
+            "list_unsubscribe": msg.get("list_unsubscribe"),
+            "snippet": msg.get("snippet"),
+            "flags": " ".join(flags),
+            "is_seen": "\\Seen" in flags,
+        })
+        if newsletter and msg.get("from"):
+            senders.setdefault(msg["from"], msg.get("list_unsubscribe"))
+    insert_ignore(db, Message, rows, ["thread_id", "folder", "imap_uid"])
+    touched = {row["thread_id"] for row in rows} | assignment.merged_into
+    refresh_thread_summaries(db, touched)
+    apply_changes(db, before, thread_states(db, threads))
+    index_threads(db, touched)
+
+    if senders:
+        known: set[str] = set()
+        for chunk in chunked(list(senders), 500):
+            known.update(db.scalars(
+                select(Subscription.sender).where(Subscription.account_id == account.id, Subscription.sender.in_(chunk))
+            ))
+        new_senders = [
+            {"account_id": account.id, "sender": sender, "list_unsubscribe": list_unsubscribe}
+            for sender, list_unsubscribe in senders.items()
+            if sender not in known
+        ]
+        if new_senders:
+            db.execute(insert(Subscription), new_senders)
+
+    return {"threads_new": assignment.created, "messages_new": len(rows)}
+
+
+def _load_threads(db: Session, thread_ids: set[int]) -> dict[int, Any]:
+    threads = {}
+    for chunk in chunked(list(thread_ids), 500):
+        rows = db.execute(select(Thread.id, Thread.subject, Thread.last_message_at).where(Thread.id.in_(chunk)))
+        threads.update((row.id, row) for row in rows)
+    return threads
+
+
+def _stored_uids(db: Session, thread_ids: list[int], folder: str) -> set[tuple[int, int]]:
+    # By thread, so that uq_imap_uid (thread_id, folder, imap_uid) is seeked;
+    # no index starts with imap_uid, a lookup by UID scans all messages.
+    stored: set[tuple[int, int]] = set()
+    for chunk in chunked(thread_ids, 500):
+        stored.update(db.execute(
+            select(Message.thread_id, Message.imap_uid).where(Message.thread_id.in_(chunk), Message.folder == folder)
+        ).tuples())
+    return stored
+
+
+def apply_flag_changes(db: Session, account_id: int, flags: dict[int, list[str]], folder: str = "INBOX") -> int:
+    if not flags:
+        return 0
+    changed = []
+    for uids in chunked(list(flags), 500):
+        for message in _folder_messages(db, account_id, folder).filter(Message.imap_uid.in_(uids)):
+            if message.flags != " ".join(flags[message.imap_uid]):
+                changed.append(message)
+    # Only a changed \Seen flag changes the unread counts.
+    read_changed = {
+        message.thread_id for message in changed if message.is_seen != ("\\Seen" in flags[message.imap_uid])
+    }
+    with tracked(db, read_changed):
+        for message in changed:
+            message.flags = " ".join(flags[message.imap_uid])
+            message.is_seen = "\\Seen" in flags[message.imap_uid]
+        refresh_thread_summaries(db, read_changed)
+    return len(changed)
+
+
+def remove_vanished(db: Session, account_id: int, uids: set[int], folder: str = "INBOX") -> int:
+    if not uids:
+        return 0
+    messages = []
+    for chunk in chunked(list(uids), 500):
+        messages.extend(_folder_messages(db, account_id, folder).filter(Message.imap_uid.in_(chunk)))
+    thread_ids = {message.thread_id for message in messages}
+    unindex(db, [message.id for message in messages])
+    with tracked(db, thread_ids):
+        for message in messages:
+            db.delete(message)
+        refresh_thread_summaries(db, thread_ids)
+        _delete_empty_threads(db, thread_ids)
+    return len(messages)
+
+
+def _folder_messages(db: Session, account_id: int, folder: str):
+    return db.query(Message).join(Thread).filter(Thread.account_id == account_id, Message.folder == folder)
+
+
+def _known_uids(db: Session, account_id: int, folder: str) -> set[int]:
+    return {uid for (uid,) in _folder_messages(db, account_id, folder).with_entities(Message.imap_uid)}
+
+
+def _drop_messages(db: Session, account_id: int, folder: str) -> None:
+    """Forget the folder's stored messages; threads are kept so re-fetched mail lands in them again.
+
+    ``sync_mailbox`` removes the threads that stay empty after the re-fetch.
+    """
+    thread_ids = select(Thread.id).where(Thread.account_id == account_id)
+    unindex(db, select(Message.id).where(Message.thread_id.in_(thread_ids), Message.folder == folder))
+    db.query(Message).filter(Message.thread_id.in_(thread_ids), Message.folder == folder).delete(synchronize_session=False)
+    latest = select(func.max(Message.date)).where(Message.thread_id == Thread.id).scalar_subquery()
+    db.query(Thread).filter(Thread.account_id == account_id).update({Thread.last_message_at: latest}, synchronize_session=False)
+    refresh_thread_summaries(db, db.scalars(thread_ids).all())
+    db.expire_all()
+
+
+def refresh_thread_summaries(db: Session, thread_ids: Iterable[int]) -> None:
+    """Recompute the latest-message columns and message counts of ``thread_ids``.
+
+    Runs in the caller's transaction after every change to a thread's
+    messages, so the thread endpoints can read them instead of querying for
+    the latest message. The latest message is the one ``thread_messages``
+    lists first: newest date, undated last, highest id on ties. If that is an
+    archived stub (its newer messages were expunged), its snippet and sender
+    are read back from the segment.
+    """
+    db.flush()
+    ids = list(thread_ids)
+    for chunk in chunked(ids, 500):
+        ranked = (
+            select(
+                Message.id,
+                Message.thread_id,
+                Message.snippet,
+                Message.from_addr,
+                Message.archive_segment,
+                Thread.account_id,
+                func.row_number()
+                .over(partition_by=Message.thread_id, order_by=(Message.date.desc().nullslast(), Message.id.desc()))
+                .label("position"),
+                func.count().over(partition_by=Message.thread_id).label("total"),
+                func.sum(case((Message.is_seen.is_(True), 0), else_=1))
+                .over(partition_by=Message.thread_id)
+                .label("unread"),
+            )
+            .join(Thread, Thread.id == Message.thread_id)
+            .where(Message.thread_id.in_(chunk))
+            .subquery()
+        )
+        latest = {row.thread_id: row for row in db.execute(select(ranked).where(ranked.c.position == 1))}
+        stubs: dict[int, list[tuple[int, int]]] = {}
+        for row in latest.values():
+            if row.archive_segment is not None:
+                stubs.setdefault(row.account_id, []).append((row.id, row.archive_segment))
+        archived = {}
+        for account_id, messages in stubs.items():
+            archived.update(read_archived(account_id, messages))
+        summaries = []
+        for thread_id in chunk:
+            row = latest.get(thread_id)
+            columns = archived.get(row.id, row._mapping) if row else {}
+            summaries.append({
+                "id": thread_id,
+                "last_message_id": row.id if row else None,
+                "last_snippet": columns.get("snippet"),
+                "last_from": columns.get("from_addr"),
+                "message_count": row.total if row else 0,
+                "unread_count": row.unread if row else 0,
+            })
+        db.execute(update(Thread), summaries)
+
+
+def _delete_empty_threads(db: Session, thread_ids) -> None:
+    for thread in db.query(Thread).filter(Thread.id.in_(thread_ids), ~Thread.messages.any()):
+        db.query(ActionItem).filter(ActionItem.thread_id == thread.id).delete(synchronize_session=False)
+        db.query(ThreadMessageId).filter(ThreadMessageId.thread_id == thread.id).delete(synchronize_session=False)
+        db.delete(thread)
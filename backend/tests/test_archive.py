@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Account, Message, Thread
+from app.routers.threads import thread_messages
+from app.services.archive import SegmentStore, archive_messages, rehydrate_results, segments
+from app.services.search import search_messages
+from app.services.sync import ingest_messages, remove_vanished
+
+
+class FakeResponse:
+    def __init__(self):
+        self.headers: dict[str, str] = {}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(segments, "directory", tmp_path)
+    return segments
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    account = Account(email="me@example.com", imap_host="imap", smtp_host="smtp", password_enc="x")
+    db.add(account)
+    db.commit()
+    return db, account
+
+
+def mail(uid, days_ago, parent=None):
+    return {
+        "uid": uid,
+        "message_id": f"<{uid}@example.com>",
+        "in_reply_to": f"<{parent}@example.com>" if parent else None,
+        "references": f"<{parent}@example.com>" if parent else None,
+        "subject": f"Angebot {uid}",
+        "from": "anna@example.com",
+        "to": "me@example.com",
+        "date": datetime.utcnow() - timedelta(days=days_ago),
+        "snippet": f"Zeile {uid}",
+        "flags": ["\\Seen"],
+    }
+
+
+def response_rows(db, thread_id):
+    rows = thread_messages(thread_id, FakeResponse(), 100, None, db)
+    return [row if isinstance(row, dict) else {key: getattr(row, key) for key in row.__table__.columns.keys()} for row in rows]
+
+
+def test_old_messages_become_stubs_and_are_read_back(store):
+    db, account = make_session()
+    ingest_messages(db, account, [mail(1, 800), mail(2, 700, parent=1), mail(3, 600, parent=2), mail(4, 5, parent=3), mail(5, 900)])
+    db.commit()
+    thread_id = db.query(Message).filter(Message.imap_uid == 1).one().thread_id
+    before = response_rows(db, thread_id)
+
+    assert archive_messages(db, account.id, datetime.utcnow() - timedelta(days=365), limit=2) == 2
+    assert archive_messages(db, account.id, datetime.utcnow() - timedelta(days=365)) == 1
+    assert archive_messages(db, account.id, datetime.utcnow() - timedelta(days=365)) == 0
+    db.commit()
+
+    stubs = db.query(Message).filter(Message.archive_segment.isnot(None)).all()
+    assert sorted(message.imap_uid for message in stubs) == [1, 2, 3]
+    assert all(message.subject is None and message.references is None and message.is_seen for message in stubs)
+    # uid 5 is the latest message of its own thread and uid 4 is recent.
+    assert {message.archive_segment for message in stubs} == {1, 2}
+    assert sorted(path.name for path in (store.directory / str(account.id)).iterdir()) == [
+        "00000001.idx", "00000001.seg", "00000002.idx", "00000002.seg"
+    ]
+
+    after = response_rows(db, thread_id)
+    assert [{**row, "archive_segment": None} for row in after] == before
+    found = rehydrate_results(account.id, search_messages(db, account.id, "angebot", 10))
+    assert sorted(row["subject"] for row in found) == [f"Angebot {uid}" for uid in range(1, 6)]
+    assert {row["id"] for row in search_messages(db, account.id, "zeile 2", 10)} == {stubs[1].id}
+
+    # A later ingest into the thread does not index the stubs a second time.
+    ingest_messages(db, account, [mail(6, 1, parent=4)])
+    assert len(search_messages(db, account.id, "angebot", 10)) == 6
+
+
+def test_expunging_the_latest_message_summarizes_the_thread_from_its_stub(store):
+    db, account = make_session()
+    ingest_messages(db, account, [mail(1, 800), mail(2, 700, parent=1), mail(3, 5, parent=2)])
+    assert archive_messages(db, account.id, datetime.utcnow() - timedelta(days=365)) == 2
+    db.commit()
+
+    remove_vanished(db, account.id, {3})
+    db.commit()
+
+    thread = db.query(Thread).one()
+    assert (thread.last_message_id, thread.last_snippet, thread.last_from) == (
+        db.query(Message).filter(Message.imap_uid == 2).one().id, "Zeile 2", "anna@example.com"
+    )
+
+
+def test_segment_frames_are_found_by_message_id(tmp_path):
+    store = SegmentStore(str(tmp_path), compression="zlib")
+    number = store.write(7, [[{"id": 1, "subject": "a"}, {"id": 2, "subject": "b"}], [{"id": 3, "subject": "c"}]])
+    assert store.write(7, [[{"id": 4, "subject": "d"}]]) == number + 1
+    assert store.read(7, number, {2, 3}) == {2: {"id": 2, "subject": "b"}, 3: {"id": 3, "subject": "c"}}
@@ -0,0 +1,94 @@
+import asyncio
+
+from app.services.async_imap_client import AsyncImapClient
+from app.services.async_smtp_client import AsyncSmtpClient
+
+
+async def serve(script, handler_result):
+    """Start a server answering each received line with the next scripted reply."""
+
+    async def handle(reader, writer):
+        received = []
+        writer.write(script[0])
+        for reply in script[1:]:
+            line = await reader.readline()
+            received.append(line)
+            if callable(reply):
+                reply = await reply(reader, line)
+            writer.write(reply)
+            await writer.drain()
+        handler_result.set_result(received)
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_async_imap_client_fetches_latest_with_literals():
+    header = b"Subject: Hallo\r\nFrom: a@example.com\r\n\r\n"
+    script = [
+        b"* OK ready\r\n",
+        b"* CAPABILITY IMAP4rev1\r\nM0001 OK done\r\n",
+        b"M0002 OK logged in\r\n",
+        b"* CAPABILITY IMAP4rev1 IDLE\r\nM0003 OK done\r\n",
+        b"* 2 EXISTS\r\n* OK [UIDVALIDITY 77] valid\r\nM0004 OK [READ-WRITE] selected\r\n",
+        b"* SEARCH 41 42\r\nM0005 OK search\r\n",
+        b"* 2 FETCH (UID 42 BODYSTRUCTURE (\"TEXT\" \"PLAIN\" NIL NIL NIL \"7BIT\" 5 1 NIL NIL NIL) BODY[HEADER.FIELDS (SUBJECT)] {%d}\r\n%s)\r\n"
+        b"M0006 OK fetched\r\n" % (len(header), header),
+        b"* 2 FETCH (UID 42 BODY[1]<0> {5}\r\nHallo)\r\nM0007 OK fetched\r\n",
+        b"* BYE\r\nM0008 OK bye\r\n",
+    ]
+
+    async def run():
+        done = asyncio.get_running_loop().create_future()
+        server, port = await serve(script, done)
+        async with server:
+            async with AsyncImapClient("127.0.0.1", port, tls=False) as imap:
+                await imap.login("me@example.com", 'pa"ss')
+                await imap.select_inbox()
+                messages = await imap.fetch_latest(limit=1)
+                uidvalidity = imap.uidvalidity
+                supports_idle = imap.supports("IDLE")
+            return messages, uidvalidity, supports_idle, await asyncio.wait_for(done, 5)
+
+    messages, uidvalidity, supports_idle, received = asyncio.run(run())
+
+    assert received[1] == b'M0002 LOGIN "me@example.com" "pa\\"ss"\r\n'
+    assert received[5].startswith(b"M0006 UID FETCH 42 (UID FLAGS BODYSTRUCTURE BODY.PEEK")
+    assert uidvalidity == 77 and supports_idle
+    assert [(m["uid"], m["subject"], m["snippet"]) for m in messages] == [(42, "Hallo", "Hallo")]
+
+
+def test_async_smtp_client_authenticates_and_dot_stuffs():
+    async def data_reply(reader, line):
+        body = b""
+        while not body.endswith(b"\r\n.\r\n"):
+            body += await reader.readline()
+        data_reply.body = body
+        return b"250 queued\r\n"
+
+    script = [
+        b"220 smtp ready\r\n",
+        b"250-smtp\r\n250-AUTH LOGIN PLAIN\r\n250 8BITMIME\r\n",
+        b"235 ok\r\n",
+        b"250 ok\r\n",
+        b"250 ok\r\n",
+        b"354 go\r\n",
+        data_reply,
+        b"221 bye\r\n",
+    ]
+
+    async def run():
+        done = asyncio.get_running_loop().create_future()
+        server, port = await serve(script, done)
+        async with server:
+            async with AsyncSmtpClient("127.0.0.1", port, tls=False) as smtp:
+                await smtp.login("me@example.com", "secret")
+                await smtp.send_email("me@example.com", "you@example.com", "Hi", "line\n.dot\n")
+            return await asyncio.wait_for(done, 5)
+
+    received = asyncio.run(run())
+
+    assert received[1] == b"AUTH PLAIN AG1lQGV4YW1wbGUuY29tAHNlY3JldA==\r\n"
+    assert received[2] == b"MAIL FROM:<me@example.com>\r\n"
+    assert b"\r\n..dot\r\n" in data_reply.body
@@ -0,0 +1,101 @@
+import asyncio
+import inspect
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import Base, async_database_url, create_async_db_engine, create_db_engine
+from app.models import Account, Message, Subscription, Thread
+from app.routers.threads import (
+    list_threads,
+    list_threads_async,
+    newsletters,
+    newsletters_async,
+    thread_messages,
+    thread_messages_async,
+)
+
+pytest.importorskip("aiosqlite")
+
+
+class FakeResponse:
+    def __init__(self):
+        self.headers: dict[str, str] = {}
+
+
+def make_database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'mail.db'}"
+    engine = create_db_engine(url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Account(id=1, email="me@example.com", imap_host="imap", smtp_host="smtp", password_enc="x"))
+        for i in range(7):
+            db.add(Thread(id=i + 1, account_id=1, thread_key=f"t{i}", priority_score=(i % 2) * 50, last_message_at=datetime(2025, 1, i + 1)))
+        for i in range(5):
+            db.add(Message(thread_id=1, imap_uid=i + 1, date=None if i == 2 else datetime(2025, 1, 1) + timedelta(hours=i)))
+        db.add(Subscription(account_id=1, sender="news@shop.example", list_unsubscribe="<mailto:off@shop.example>"))
+        db.commit()
+    return url, engine
+
+
+async def pages(fetch, limit):
+    seen, cursor = [], None
+    while True:
+        response = FakeResponse()
+        rows = fetch(response, limit, cursor)
+        seen.append([row.id for row in (await rows if inspect.isawaitable(rows) else rows)])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen
+
+
+def test_async_database_url_swaps_the_driver():
+    assert async_database_url("sqlite:///./mailpilot.db") == "sqlite+aiosqlite:///./mailpilot.db"
+    assert async_database_url("postgresql://u:p@db/mail") == "postgresql+asyncpg://u:p@db/mail"
+    assert async_database_url("postgresql+psycopg2://db/mail") == "postgresql+asyncpg://db/mail"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://db/mail")
+
+
+def test_async_routes_return_the_blocking_routes_pages(tmp_path):
+    url, engine = make_database(tmp_path)
+
+    async def run():
+        async_engine = create_async_db_engine(url)
+        try:
+            async with AsyncSession(async_engine) as db:
+                threads = await pages(lambda response, limit, cursor: list_threads_async(1, response, limit, cursor, db), 3)
+                messages = await pages(lambda response, limit, cursor: thread_messages_async(1, response, limit, cursor, db), 2)
+                return threads, messages, await newsletters_async(1, db)
+        finally:
+            await async_engine.dispose()
+
+    threads, messages, subs = asyncio.run(run())
+    with Session(engine) as db:
+        assert threads == asyncio.run(pages(lambda response, limit, cursor: list_threads(1, response, limit, cursor, db), 3))
+        assert messages == asyncio.run(pages(lambda response, limit, cursor: thread_messages(1, response, limit, cursor, db), 2))
+        assert subs == newsletters(1, db)
+    assert [len(page) for page in threads] == [3, 3, 1]
+
+
+def test_reads_are_served_while_a_sync_holds_a_write_transaction(tmp_path):
+    url, engine = make_database(tmp_path)
+
+    async def read():
+        async_engine = create_async_db_engine(url)
+        try:
+            async with AsyncSession(async_engine) as db:
+                return await asyncio.wait_for(list_threads_async(1, FakeResponse(), 100, None, db), timeout=1)
+        finally:
+            await async_engine.dispose()
+
+    with engine.connect() as writer:
+        # What a sync's commit holds at worst; without WAL readers would wait for it.
+        writer.execute(text("BEGIN EXCLUSIVE"))
+        writer.execute(text("UPDATE threads SET priority_score = 99"))
+        threads = asyncio.run(read())
+        writer.rollback()
+    assert len(threads) == 7 and 99 not in {thread.priority_score for thread in threads}
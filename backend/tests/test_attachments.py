@@ -0,0 +1,66 @@
+import asyncio
+import base64
+import os
+import quopri
+
+import pytest
+
+from app.services.attachments import RangeNotSatisfiable, parse_range, probe_layout, stream_part
+from app.services.imap_protocol import BodyPart
+
+
+class FakeImap:
+    def __init__(self, encoded):
+        self.encoded = encoded
+        self.fetches = []
+
+    async def fetch_partial(self, uid, section, offset, length):
+        self.fetches.append((offset, length))
+        return self.encoded[offset:offset + length]
+
+
+def read(imap, part, start=0, end=None):
+    async def run():
+        layout = await probe_layout(imap, 1, part)
+        return layout, b"".join([chunk async for chunk in stream_part(imap, 1, part, layout, start, end, chunk_size=1000)])
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("length", [1, 57, 58, 5000, 100_000])
+@pytest.mark.parametrize("trailer", [b"", b"\r\n"])
+def test_base64_parts_decode_and_seek(length, trailer):
+    data = os.urandom(length)
+    encoded = base64.encodebytes(data).rstrip(b"\n").replace(b"\n", b"\r\n") + trailer
+    part = BodyPart("2", "application/pdf", None, "base64", len(encoded), "attachment", "a.pdf")
+
+    layout, content = read(FakeImap(encoded), part)
+    assert layout.size == length
+    assert content == data
+
+    start, end = length // 2, min(length - 1, length // 2 + 1500)
+    imap = FakeImap(encoded)
+    assert read(imap, part, start, end)[1] == data[start:end + 1]
+    if length > 10_000:
+        # Seeking skips the encoded bytes before the range instead of fetching them.
+        assert min(offset for offset, _ in imap.fetches[2:]) > len(encoded) // 3
+
+
+def test_quoted_printable_part_is_streamed_from_the_start():
+    data = ("Grüße " * 2000).encode("latin-1")
+    encoded = quopri.encodestring(data)
+    part = BodyPart("3", "text/plain", "latin-1", "quoted-printable", len(encoded), "attachment", "a.txt")
+
+    layout, content = read(FakeImap(encoded), part, start=10, end=19)
+    assert layout.size is None
+    assert content == data[10:20]
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=0-9,20-29", 100) is None
+    assert parse_range("bytes=0-9", None) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=100-", 100)
@@ -0,0 +1,58 @@
+import hashlib
+
+from app.services.body_cache import BodyCache, CacheKey
+
+
+def digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def test_get_put_counts_hits_and_misses(tmp_path):
+    cache = BodyCache(str(tmp_path), max_bytes=10_000, compression="zlib")
+    key = CacheKey(1, "INBOX", 7, 42)
+
+    assert cache.get(key) is None
+    cache.put(key, digest("raw"), "Hallo Welt")
+    assert cache.get(key) == "Hallo Welt"
+    # Other UIDVALIDITY, other key.
+    assert cache.get(key._replace(uidvalidity=8)) is None
+    assert BodyCache(str(tmp_path), compression="none").get(key) == "Hallo Welt"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["objects"]) == (1, 2, 1)
+
+
+def test_identical_messages_share_one_object(tmp_path):
+    cache = BodyCache(str(tmp_path), compression="none")
+    cache.put(CacheKey(1, "INBOX", 7, 1), digest("same"), "Text")
+    cache.put(CacheKey(1, "Archive", 3, 9), digest("same"), "Text")
+
+    assert cache.get(CacheKey(1, "Archive", 3, 9)) == "Text"
+    assert cache.stats()["objects"] == 1
+
+
+def test_least_recently_read_body_is_evicted(tmp_path):
+    cache = BodyCache(str(tmp_path), max_bytes=250, compression="none")
+    keys = [CacheKey(1, "INBOX", 7, uid) for uid in range(3)]
+    cache.put(keys[0], digest("0"), "a" * 100)
+    cache.put(keys[1], digest("1"), "b" * 100)
+    cache.get(keys[0])
+    cache.put(keys[2], digest("2"), "c" * 100)
+
+    # The evicted body's key went with it.
+    assert len(list((tmp_path / "keys").glob("*/*"))) == 2
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "a" * 100
+    assert cache.get(keys[2]) == "c" * 100
+    assert cache.stats()["evictions"] == 1
+
+
+def test_keys_of_missing_objects_are_dropped_on_start(tmp_path):
+    cache = BodyCache(str(tmp_path), compression="none")
+    cache.put(CacheKey(1, "INBOX", 7, 1), digest("1"), "eins")
+    cache.put(CacheKey(1, "INBOX", 7, 2), digest("2"), "zwei")
+    # Evicted by another worker process.
+    next((tmp_path / "objects").glob(f"*/{digest('2')}")).unlink()
+
+    assert BodyCache(str(tmp_path), compression="none").stats()["keys"] == 1
+    assert len(list((tmp_path / "keys").glob("*/*"))) == 1
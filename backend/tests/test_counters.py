@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Account, AccountCounter, Thread
+from app.services.counters import account_counters, recount
+from app.services.sync import apply_flag_changes, ingest_messages, remove_vanished
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    account = Account(email="me@example.com", imap_host="imap", smtp_host="smtp", password_enc="x")
+    db.add(account)
+    db.commit()
+    return db, account
+
+
+def mail(uid, subject, flags=(), **extra):
+    return {
+        "uid": uid,
+        "message_id": f"<{uid}@example.com>",
+        "subject": subject,
+        "from": "a@example.com",
+        "date": datetime(2024, 5, 1) + timedelta(hours=uid),
+        "snippet": "hallo",
+        "flags": list(flags),
+        **extra,
+    }
+
+
+def counts(db, account):
+    return {key: value for key, value in account_counters(db, account.id).items() if key != "categories"}
+
+
+def test_ingest_flags_and_expunge_keep_counters_in_step():
+    db, account = make_session()
+    ingest_messages(db, account, [
+        mail(1, "Rechnung April"),
+        mail(2, "Re: Rechnung April", ["\\Seen"], references="<1@example.com>"),
+        mail(3, "Sommer-Angebote", list_unsubscribe="<mailto:off@shop.example>"),
+        mail(4, "Hallo", ["\\Seen"]),
+    ])
+    assert counts(db, account) == {"threads": 3, "unread_threads": 2, "messages": 4, "unread_messages": 2, "newsletters": 1}
+    assert account_counters(db, account.id)["categories"]["finance"] == {
+        "threads": 1, "unread_threads": 1, "messages": 2, "unread_messages": 1, "newsletters": 0
+    }
+
+    apply_flag_changes(db, account.id, {1: ["\\Seen"], 3: ["\\Seen", "\\Flagged"]})
+    assert counts(db, account)["unread_threads"] == 0
+    assert db.query(Thread).filter(Thread.unread_count > 0).count() == 0
+
+    remove_vanished(db, account.id, {3, 4})
+    expected = {"threads": 1, "unread_threads": 0, "messages": 2, "unread_messages": 0, "newsletters": 0}
+    assert counts(db, account) == expected
+
+    db.query(AccountCounter).update({AccountCounter.messages: 99})
+    recount(db, account.id)
+    assert counts(db, account) == expected
+
+
+def test_counters_are_read_without_touching_threads_or_messages():
+    db, account = make_session()
+    ingest_messages(db, account, [mail(uid, f"Mail {uid}") for uid in range(1, 50)])
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    assert account_counters(db, account.id)["threads"] == 49
+    assert len(statements) == 1
+    assert statements[0].split("FROM")[1].split()[0] == "account_counters"
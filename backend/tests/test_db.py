@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+from app.db import create_db_engine
+
+
+def test_sqlite_connections_use_wal_and_pragmas(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'mail.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -65536
+
+
+def test_reads_are_not_blocked_by_an_open_write_transaction(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'mail.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+
+    with engine.connect() as writer, engine.connect() as reader:
+        # In rollback-journal mode an exclusive lock would shut out readers.
+        writer.execute(text("BEGIN EXCLUSIVE"))
+        writer.execute(text("INSERT INTO t VALUES (2)"))
+        assert reader.execute(text("SELECT count(*) FROM t")).scalar() == 1
+        writer.commit()
+    engine.dispose()
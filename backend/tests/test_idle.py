@@ -0,0 +1,113 @@
+import threading
+
+from app.services import idle
+from app.services.idle import IdleManager, IdleWatcher, _wakes_sync
+
+
+def test_wakes_sync_on_mailbox_changes_only():
+    assert _wakes_sync(b"* 12 EXISTS")
+    assert _wakes_sync(b"* 3 expunge")
+    assert _wakes_sync(b"* 4 FETCH (FLAGS (\\Seen))")
+    assert _wakes_sync(b"* VANISHED 5:7")
+    assert not _wakes_sync(b"* 2 RECENT")
+    assert not _wakes_sync(b"* OK Still here")
+    assert not _wakes_sync(b"A1 OK IDLE terminated")
+
+
+class FakeImap:
+    def __init__(self, watcher, rounds, pending=()):
+        self.watcher = watcher
+        self.rounds = rounds
+        self.pending = list(pending)
+        self.timeouts: list[float] = []
+        self.selects = 0
+
+    def idle(self, timeout, stop=None):
+        self.timeouts.append(timeout)
+        if not self.rounds:
+            self.watcher.stop()
+            return []
+        return self.rounds.pop(0)
+
+    def select_folder(self, folder):
+        self.selects += 1
+        self.pending.insert(0, True)
+
+    def pending_changes(self):
+        return self.pending.pop(0) if self.pending else False
+
+
+def test_idle_loop_syncs_on_changes_and_renewals(monkeypatch):
+    monkeypatch.setattr(idle, "IDLE_RENEW_SECONDS", 42)
+    watcher = IdleWatcher(1)
+    synced = []
+    watcher._sync = lambda imap: synced.append(imap) or 0
+    # Timeout without events (renew), a RECENT-only wakeup, then a new message.
+    imap = FakeImap(watcher, [[], [b"* 2 RECENT"], [b"* 3 EXISTS", b"* 3 RECENT"]])
+
+    watcher._idle_loop(imap)
+
+    assert imap.timeouts == [42, 42, 42, 42]
+    assert synced == [imap, imap]
+    assert imap.selects == 2
+
+
+def test_catch_up_drains_full_batches_and_changes_seen_while_syncing(monkeypatch):
+    monkeypatch.setattr(idle, "IDLE_SYNC_LIMIT", 50)
+    watcher = IdleWatcher(1)
+    fetched = [50, 50, 3, 0]
+    watcher._sync = lambda imap: fetched.pop(0)
+    # An EXISTS arrives during the third round's fetch.
+    imap = FakeImap(watcher, [], pending=[True])
+
+    watcher._catch_up(imap)
+
+    assert fetched == []
+    assert imap.selects == 4
+
+
+def test_stop_interrupts_backoff():
+    watcher = IdleWatcher(1)
+    failed = threading.Event()
+
+    def broken_watch():
+        failed.set()
+        raise OSError("connection refused")
+
+    watcher._watch = broken_watch
+    watcher.start()
+    assert failed.wait(1)
+    watcher.stop()
+    watcher.join(1)
+    assert not watcher.is_alive()
+
+
+def test_manager_starts_one_watcher_per_account(monkeypatch):
+    started = []
+
+    class FakeWatcher:
+        def __init__(self, account_id):
+            self.account_id = account_id
+            self.stopped = False
+
+        def start(self):
+            started.append(self.account_id)
+
+        def is_alive(self):
+            return not self.stopped
+
+        def stop(self):
+            self.stopped = True
+
+    monkeypatch.setattr(idle, "IdleWatcher", FakeWatcher)
+    manager = IdleManager()
+    manager.watch(1)
+    manager.watch(1)
+    manager.watch(2)
+    watcher = manager._watchers[1]
+    manager.unwatch(1)
+    manager.stop_all()
+
+    assert started == [1, 2]
+    assert watcher.stopped
+    assert manager._watchers == {}
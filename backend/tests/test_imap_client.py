@@ -0,0 +1,138 @@
+import socket
+import threading
+
+from app.services.imap_client import ImapClient, SocketReader
+
+
+class FakeConn:
+    def __init__(self, responses):
+        self.responses = responses
+        self.commands: list[tuple] = []
+
+    def uid(self, command, *args):
+        self.commands.append((command, *args))
+        return "OK", self.responses.pop(0)
+
+
+def test_fetch_latest_uses_peek_and_partial_text():
+    header = b"Subject: Hallo\r\nFrom: a@example.com\r\n\r\n"
+    conn = FakeConn([
+        [b"41 42"],
+        [
+            (b"1 (UID 41 BODYSTRUCTURE (\"TEXT\" \"PLAIN\" (\"CHARSET\" \"utf-8\") NIL NIL \"BASE64\" 20 1 NIL NIL NIL) BODY[HEADER.FIELDS (SUBJECT FROM)] {%d}" % len(header), header),
+            b")",
+            (b"2 (UID 42 BODYSTRUCTURE ((\"TEXT\" \"HTML\" NIL NIL NIL \"7BIT\" 30 1 NIL NIL NIL)(\"APPLICATION\" \"PDF\" (\"NAME\" \"a.pdf\") NIL NIL \"BASE64\" 9000 NIL (\"ATTACHMENT\" (\"FILENAME\" \"a.pdf\")) NIL) \"MIXED\") BODY[HEADER.FIELDS (SUBJECT FROM)] {%d}" % len(header), header),
+            b")",
+        ],
+        [
+            (b"1 (UID 41 BODY[1]<0> {14}", b"R3LDvMOfZSBh\r\n"),
+            b")",
+            (b"2 (UID 42 BODY[1]<0> {25}", b"<p>Hallo <b>Welt</b></p><"),
+            b")",
+        ],
+    ])
+    imap = ImapClient("imap.example.com", snippet_bytes=512)
+    imap.conn = conn
+
+    messages = imap.fetch_latest()
+
+    assert [m["uid"] for m in messages] == [42, 41]
+    assert messages[0]["snippet"] == "Hallo Welt"
+    assert messages[1]["snippet"] == "Grüße a"
+    assert messages[1]["subject"] == "Hallo"
+    fetch_items = [cmd[2] for cmd in conn.commands[1:]]
+    assert all("PEEK" in items and "RFC822" not in items for items in fetch_items)
+    assert conn.commands[2][1] == "41:42"
+    assert "BODY.PEEK[1]<0.512>" in fetch_items[1]
+
+
+def test_fetch_since_takes_oldest_new_uids_first():
+    conn = FakeConn([[b"5 6 7 8 9"], []])
+    imap = ImapClient("imap.example.com")
+    imap.conn = conn
+
+    imap.fetch_since(4, limit=2)
+
+    assert conn.commands[0] == ("search", None, "UID 5:*")
+    assert conn.commands[1][1] == "5:6"
+
+
+def test_fetch_changes_with_qresync_reads_vanished():
+    conn = FakeConn([[b"1 (UID 3 FLAGS (\\Seen) MODSEQ (121))"]])
+    conn.response = lambda code: (code, [b"(EARLIER) 5:6,9"] if code == "VANISHED" else [None])
+    imap = ImapClient("imap.example.com")
+    imap.conn = conn
+    imap.qresync = True
+    imap.highest_modseq = 121
+
+    changes = imap.fetch_changes(8, 100, known_uids=lambda: set())
+
+    assert conn.commands == [("fetch", "1:8", "(UID FLAGS) (CHANGEDSINCE 100 VANISHED)")]
+    assert changes.flags == {3: ["\\Seen"]}
+    assert changes.vanished == {5, 6}
+
+
+def test_fetch_changes_without_condstore_diffs_uids():
+    conn = FakeConn([[b"1 (UID 1 FLAGS ())"], [b"1 3"]])
+    imap = ImapClient("imap.example.com")
+    imap.conn = conn
+
+    changes = imap.fetch_changes(3, None, known_uids=lambda: {1, 2, 3})
+
+    assert conn.commands[1] == ("search", None, "UID 1:3")
+    assert changes.vanished == {2}
+
+
+def test_socket_reader_splits_lines_from_one_chunk():
+    chunks = [b"* OK hi\r\nA1 OK done\r\n* 3 EXI", b"STS\r\n", b""]
+    reader = SocketReader(lambda size: chunks.pop(0))
+
+    assert reader.readline() == b"* OK hi\r\n"
+    assert reader.has_buffered_data()
+    assert reader.readline() == b"A1 OK done\r\n"
+    assert reader.readline() == b"* 3 EXISTS\r\n"
+    assert reader.readline() == b""
+
+
+def test_idle_returns_untagged_events_and_ends_with_done():
+    client_sock, server_sock = socket.socketpair()
+    # A reader regression must fail the test instead of hanging it.
+    client_sock.settimeout(5)
+    server_sock.settimeout(5)
+    server_file = server_sock.makefile("rb")
+
+    def server():
+        assert server_file.readline() == b"A1 IDLE\r\n"
+        server_sock.sendall(b"+ idling\r\n")
+        server_sock.sendall(b"* 5 EXISTS\r\n")
+        assert server_file.readline() == b"DONE\r\n"
+        server_sock.sendall(b"* 1 RECENT\r\nA1 OK IDLE terminated\r\n")
+
+    thread = threading.Thread(target=server)
+    thread.start()
+
+    class Conn:
+        capabilities = ("IDLE",)
+        sock = client_sock
+        file = SocketReader(client_sock.recv)
+        tagged_commands: dict = {}
+
+        def _new_tag(self):
+            self.tagged_commands[b"A1"] = None
+            return b"A1"
+
+        def send(self, data):
+            client_sock.sendall(data)
+
+        def readline(self):
+            return self.file.readline()
+
+    imap = ImapClient("imap.example.com")
+    imap.conn = Conn()
+    events = imap.idle(timeout=5)
+    thread.join(timeout=5)
+    client_sock.close()
+    server_sock.close()
+
+    assert events == [b"* 5 EXISTS", b"* 1 RECENT"]
+    assert imap.conn.tagged_commands == {}
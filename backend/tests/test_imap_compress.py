@@ -0,0 +1,97 @@
+import asyncio
+import socket
+import threading
+import zlib
+
+from app.services.async_imap_client import AsyncImapConnection
+from app.services.imap_client import ImapClient, SocketReader
+from app.services.imap_compress import AsyncTrafficStream, TrafficCounter, TrafficSocket
+
+
+class DeflatePeer:
+    """Server side of a COMPRESS=DEFLATE connection."""
+
+    def __init__(self):
+        self.out = zlib.compressobj(6, zlib.DEFLATED, -15)
+        self.inp = zlib.decompressobj(-15)
+
+    def pack(self, data):
+        return self.out.compress(data) + self.out.flush(zlib.Z_SYNC_FLUSH)
+
+
+def test_imap_client_negotiates_deflate_and_counts_bytes():
+    client_sock, server_sock = socket.socketpair()
+    client_sock.settimeout(5)
+    server_sock.settimeout(5)
+    received = []
+
+    def server():
+        server_file = server_sock.makefile("rb")
+        received.append(server_file.readline())
+        server_sock.sendall(b"A1 OK DEFLATE active\r\n")
+        peer = DeflatePeer()
+        received.append(peer.inp.decompress(server_sock.recv(4096)))
+        server_sock.sendall(peer.pack(b"* 3 EXISTS\r\n" + b"A2 OK " + b"x" * 2000 + b"\r\n"))
+
+    thread = threading.Thread(target=server)
+    thread.start()
+    counter = TrafficCounter()
+
+    class Conn:
+        sock = TrafficSocket(client_sock, counter)
+        file = SocketReader(sock.recv)
+        tagged_commands: dict = {}
+        tags = iter([b"A1", b"A2"])
+
+        def _new_tag(self):
+            tag = next(self.tags)
+            self.tagged_commands[tag] = None
+            return tag
+
+        def send(self, data):
+            self.sock.sendall(data)
+
+        def readline(self):
+            return self.file.readline()
+
+    imap = ImapClient("imap.example.com")
+    imap.conn = Conn()
+    imap._start_compression()
+    imap.conn.send(b"A2 NOOP\r\n")
+    lines = [imap.conn.readline(), imap.conn.readline()]
+    thread.join(timeout=5)
+    client_sock.close()
+    server_sock.close()
+
+    assert received == [b"A1 COMPRESS DEFLATE\r\n", b"A2 NOOP\r\n"]
+    assert imap.conn.sock.compressed
+    assert lines[0] == b"* 3 EXISTS\r\n" and lines[1].startswith(b"A2 OK xxx")
+    stats = counter.stats()
+    assert stats["data_in"] > 2000 and stats["wire_in"] < stats["data_in"] / 5
+
+
+def test_async_connection_switches_to_deflate():
+    async def handle(reader, writer):
+        writer.write(b"* OK ready\r\n")
+        await reader.readline()
+        writer.write(b"* CAPABILITY IMAP4rev1 COMPRESS=DEFLATE\r\nM0001 OK done\r\n")
+        assert await reader.readline() == b"M0002 COMPRESS DEFLATE\r\n"
+        writer.write(b"M0002 OK DEFLATE active\r\n")
+        peer = DeflatePeer()
+        command = peer.inp.decompress(await reader.read(4096))
+        assert command == b"M0003 CAPABILITY\r\n"
+        writer.write(peer.pack(b"* CAPABILITY IMAP4rev1 IDLE\r\nM0003 OK done\r\n"))
+        await writer.drain()
+
+    async def run():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        async with server:
+            conn = await AsyncImapConnection.open("127.0.0.1", server.sockets[0].getsockname()[1], tls=False, timeout=5)
+            assert isinstance(conn.reader, AsyncTrafficStream)
+            compressed = await conn.compress()
+            await conn.capability()
+            conn.writer.close()
+            return compressed, conn.capabilities
+
+    compressed, capabilities = asyncio.run(run())
+    assert compressed and "IDLE" in capabilities
@@ -0,0 +1,144 @@
+import asyncio
+import imaplib
+
+import pytest
+from cryptography.fernet import Fernet
+
+from app.models import Account
+from app.services.imap_pool import ImapConnectionPool, PoolTimeout
+
+
+class FakeClient:
+    connects = 0
+
+    def __init__(self, host, port, tls):
+        self.host = host
+        self.folder = None
+        self.alive = True
+        self.closed = False
+
+    def connect(self):
+        FakeClient.connects += 1
+
+    def login(self, email_addr, password):
+        assert password == "secret"
+
+    def select_folder(self, folder):
+        if not self.alive:
+            raise imaplib.IMAP4.abort("socket closed")
+        if folder == "Missing":
+            raise imaplib.IMAP4.error("SELECT failed")
+        if folder == "Broken":
+            raise RuntimeError("unexpected response")
+        self.folder = folder
+
+    def noop(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def account_factory(monkeypatch):
+    key = Fernet.generate_key()
+    monkeypatch.setenv("MAILPILOT_FERNET_KEY", key.decode())
+    token = Fernet(key).encrypt(b"secret").decode()
+
+    def make(account_id, host="imap.example.com"):
+        return Account(id=account_id, email=f"u{account_id}@example.com", imap_host=host, imap_port=993, imap_tls=True, password_enc=token)
+
+    return make
+
+
+def test_connections_are_reused_and_dead_ones_replaced(account_factory):
+    FakeClient.connects = 0
+    pool = ImapConnectionPool(client_factory=FakeClient)
+    account = account_factory(1)
+
+    with pool.connection(account) as first:
+        pass
+    with pool.connection(account) as second:
+        assert second is first
+    assert FakeClient.connects == 1
+
+    first.alive = False
+    with pool.connection(account) as third:
+        assert third is not first
+    assert FakeClient.connects == 2
+    assert pool.stats() == {"imap.example.com": {"open": 1, "idle": 1}}
+
+
+def test_host_limit_evicts_idle_connections_of_other_accounts(account_factory):
+    pool = ImapConnectionPool(max_per_host=1, wait_timeout=0.01, client_factory=FakeClient)
+    with pool.connection(account_factory(1)) as first:
+        with pytest.raises(PoolTimeout):
+            with pool.connection(account_factory(2)):
+                pass
+    with pool.connection(account_factory(2)) as second:
+        assert first.closed
+        assert second is not first
+    assert pool.stats() == {"imap.example.com": {"open": 1, "idle": 1}}
+
+
+def test_dedicated_connections_count_against_host_limit(account_factory):
+    pool = ImapConnectionPool(max_per_host=1, wait_timeout=0.01, client_factory=FakeClient)
+    with pool.dedicated(account_factory(1)) as idle_conn:
+        with pytest.raises(PoolTimeout):
+            with pool.connection(account_factory(2)):
+                pass
+    assert idle_conn.closed
+    assert pool.stats() == {}
+
+
+def test_failed_select_on_reused_connection_releases_the_slot(account_factory):
+    pool = ImapConnectionPool(max_per_host=1, wait_timeout=0.01, client_factory=FakeClient)
+    account = account_factory(1)
+    with pool.connection(account) as first:
+        pass
+
+    with pytest.raises(imaplib.IMAP4.error):
+        with pool.connection(account, "Missing"):
+            pass
+    assert not first.closed
+    with pytest.raises(RuntimeError):
+        with pool.connection(account, "Broken"):
+            pass
+    assert first.closed
+
+    with pool.connection(account) as second:
+        assert second is not first
+    assert pool.stats() == {"imap.example.com": {"open": 1, "idle": 1}}
+
+
+def test_reserved_slots_share_the_host_limit_with_pooled_connections(account_factory):
+    pool = ImapConnectionPool(max_per_host=2, wait_timeout=0.01, client_factory=FakeClient)
+    with pool.connection(account_factory(1)) as idle_conn:
+        pass
+    pool.reserve_slot("imap.example.com")
+    pool.reserve_slot("imap.example.com")
+    assert idle_conn.closed
+    with pytest.raises(PoolTimeout):
+        pool.reserve_slot("imap.example.com")
+
+    pool.release_slot("imap.example.com")
+    with pool.connection(account_factory(2)):
+        assert pool.stats() == {"imap.example.com": {"open": 2, "idle": 0}}
+
+
+def test_async_leases_reuse_connections_and_drop_them_on_errors(account_factory):
+    pool = ImapConnectionPool(client_factory=FakeClient)
+    account = account_factory(1)
+
+    async def lease(fail=False):
+        async with pool.async_connection(account) as client:
+            if fail:
+                raise asyncio.CancelledError
+            return client
+
+    first = asyncio.run(lease())
+    assert asyncio.run(lease()) is first
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(lease(fail=True))
+    assert first.closed
+    assert pool.stats() == {}
@@ -0,0 +1,47 @@
+from app.services.imap_protocol import compress_uid_set, parse_fetch_response, parse_list_response
+
+
+def test_compress_uid_set():
+    assert compress_uid_set([1003, 1001, 1002, 1005, 1007, 1008]) == "1001:1003,1005,1007:1008"
+    assert compress_uid_set([]) == ""
+
+
+def test_parse_multi_message_fetch_response():
+    data = [
+        (b"1 (UID 1001 RFC822.HEADER {18}", b"Subject: Hallo\r\n\r\n"),
+        (b" RFC822.TEXT {5}", b"Text1"),
+        b")",
+        (b'2 (FLAGS (\\Seen) UID 1002 BODY[HEADER.FIELDS (SUBJECT FROM)] {9}', b"Subject:\r"),
+        b' BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" "utf-8") NIL NIL "7BIT" 12 1 NIL NIL NIL))',
+    ]
+    first, second = parse_fetch_response(data)
+    assert first["UID"] == 1001
+    assert first["RFC822.HEADER"] == b"Subject: Hallo\r\n\r\n"
+    assert first["RFC822.TEXT"] == b"Text1"
+    assert second["FLAGS"] == ["\\Seen"]
+    assert second["BODY[HEADER.FIELDS (SUBJECT FROM)]"] == b"Subject:\r"
+    assert second["BODYSTRUCTURE"][:2] == ["TEXT", "PLAIN"]
+
+
+def test_parse_fetch_response_keeps_quoted_parens_in_strings():
+    data = [b'3 (UID 7 BODYSTRUCTURE ("TEXT" "PLAIN" ("NAME" "a(b).txt" "X" ")") NIL NIL "7BIT" 3 1 NIL NIL NIL))']
+    (message,) = parse_fetch_response(data)
+    assert message["UID"] == 7
+    assert message["BODYSTRUCTURE"][2] == ["NAME", "a(b).txt", "X", ")"]
+    assert message["BODYSTRUCTURE"][5:7] == ["7BIT", 3]
+
+
+def test_parse_list_response_reads_special_use_and_literals():
+    data = [
+        b'(\\HasNoChildren) "/" INBOX',
+        b'(\\HasNoChildren \\Sent) "/" "Sent Items"',
+        b'(\\Noselect \\HasChildren) "/" "[Gmail]"',
+        (b'(\\HasNoChildren \\Archive) "/" {6}', b"Archiv"),
+        b'(\\HasNoChildren) NIL 2024',
+    ]
+    inbox, sent, gmail, archive, year = parse_list_response(data)
+    assert (inbox.name, inbox.delimiter, inbox.special_use) == ("INBOX", "/", None)
+    assert (sent.name, sent.special_use) == ("Sent Items", "\\Sent")
+    assert not gmail.selectable
+    assert (archive.name, archive.special_use) == ("Archiv", "\\Archive")
+    assert (year.name, year.delimiter) == ("2024", None)
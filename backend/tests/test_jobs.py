@@ -0,0 +1,188 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base
+from app.models import Account, FolderState, Message, SyncJob
+from app.services.imap_client import FolderChanges
+from app.services.archive import segments
+from app.services.jobs import SyncJobRunner, create_job
+from app.services.sync import ingest_messages
+
+
+class FakeAsyncImap:
+    folder = "INBOX"
+    uidvalidity = 7
+    highest_modseq = None
+    fetch_batch_size = 2
+
+    def __init__(self, uids):
+        self.uids = uids
+        self.limits = []
+
+    def _msg(self, uid):
+        return {"uid": uid, "subject": f"Mail {uid}", "from": "a@example.com", "snippet": "hallo"}
+
+    async def fetch_latest(self, limit=50):
+        self.limits.append(("latest", limit))
+        return [self._msg(uid) for uid in self.uids[-limit:]]
+
+    async def fetch_since(self, last_uid, limit=50):
+        self.limits.append(("since", limit))
+        return [self._msg(uid) for uid in self.uids if uid > last_uid][:limit]
+
+    async def fetch_changes(self, last_uid, modseq, known_uids):
+        return FolderChanges({}, set())
+
+    async def fetch_uids(self, uids):
+        return [self._msg(uid) for uid in sorted(uids, reverse=True)]
+
+    async def search_dates(self, since, before):
+        return [uid for uid, when in self.dates.items() if (since is None or when.date() >= since) and when.date() < before]
+
+    async def first_message_date(self):
+        return self.dates[min(self.dates)] if self.dates else None
+
+
+def make_runner(imap):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    @asynccontextmanager
+    async def connect(account, folder):
+        yield imap
+
+    with session_factory() as db:
+        db.add(Account(id=1, email="me@example.com", imap_host="imap", smtp_host="smtp", password_enc="x"))
+        db.commit()
+    return SyncJobRunner(chunk_size=2, session_factory=session_factory, connect=connect, backfill_pause=0), session_factory
+
+
+def test_job_syncs_in_committed_chunks():
+    imap = FakeAsyncImap([1, 2, 3])
+    runner, session_factory = make_runner(imap)
+    with session_factory() as db:
+        first = create_job(db, 1, 10, ["INBOX"]).id
+    asyncio.run(runner.run(first))
+
+    imap.uids = list(range(1, 9))
+    with session_factory() as db:
+        second = create_job(db, 1, 10, ["INBOX"]).id
+    asyncio.run(runner.run(second))
+
+    assert imap.limits == [("latest", 10), ("since", 2), ("since", 2), ("since", 2)]
+    with session_factory() as db:
+        job = db.get(SyncJob, second)
+        assert (job.status, job.fetched, job.stored, job.chunks) == ("completed", 5, 5, 3)
+        assert db.query(FolderState).one().last_uid == 8
+        assert db.query(Message).count() == 8
+
+
+def test_cancelled_job_resumes_where_it_stopped():
+    imap = FakeAsyncImap([1, 2, 3])
+    runner, session_factory = make_runner(imap)
+    with session_factory() as db:
+        job_id = create_job(db, 1, 10, ["INBOX"]).id
+        db.get(SyncJob, job_id).cancel_requested = True
+        db.commit()
+    asyncio.run(runner.run(job_id))
+
+    with session_factory() as db:
+        job = db.get(SyncJob, job_id)
+        assert (job.status, job.fetched) == ("cancelled", 0)
+        job.status, job.cancel_requested = "queued", False
+        db.commit()
+    asyncio.run(runner.run(job_id))
+
+    with session_factory() as db:
+        job = db.get(SyncJob, job_id)
+        assert (job.status, job.fetched) == ("completed", 3)
+
+
+def test_resumed_job_fetches_only_what_is_left_of_its_limit():
+    imap = FakeAsyncImap([1, 2, 3])
+    runner, session_factory = make_runner(imap)
+    with session_factory() as db:
+        asyncio.run(runner.run(create_job(db, 1, 10, ["INBOX"]).id))
+        job_id = create_job(db, 1, 4, ["INBOX"]).id
+    imap.uids = list(range(1, 11))
+    imap.limits.clear()
+    with session_factory() as db:
+        # Interrupted after its first chunk.
+        job = db.get(SyncJob, job_id)
+        job.fetched, job.folder_progress = 2, '{"INBOX": 2}'
+        db.commit()
+    asyncio.run(runner.run(job_id))
+
+    assert imap.limits == [("since", 2)]
+    with session_factory() as db:
+        assert db.get(SyncJob, job_id).fetched == 4
+
+
+def test_running_jobs_are_claimed_only_once_their_lease_expired():
+    imap = FakeAsyncImap([1, 2, 3])
+    runner, session_factory = make_runner(imap)
+    with session_factory() as db:
+        job_id = create_job(db, 1, 10, ["INBOX"]).id
+        job = db.get(SyncJob, job_id)
+        job.status, job.heartbeat_at = "running", datetime.utcnow()
+        db.commit()
+    asyncio.run(runner.run(job_id))
+    assert imap.limits == []
+
+    with session_factory() as db:
+        db.get(SyncJob, job_id).heartbeat_at = datetime.utcnow() - timedelta(seconds=runner.lease_seconds + 1)
+        db.commit()
+    asyncio.run(runner.run(job_id))
+    with session_factory() as db:
+        assert (db.get(SyncJob, job_id).status, db.get(SyncJob, job_id).fetched) == ("completed", 3)
+
+
+def test_backfill_walks_date_windows_without_duplicates():
+    now = datetime.utcnow()
+    imap = FakeAsyncImap([1, 2, 3, 4, 5, 6])
+    imap.dates = {uid: now - timedelta(days=days) for uid, days in zip(imap.uids, (100, 80, 60, 40, 20, 1))}
+    runner, session_factory = make_runner(imap)
+    with session_factory() as db:
+        sync_id = create_job(db, 1, 2, ["INBOX"]).id
+        backfill_id = create_job(db, 1, 0, ["INBOX"], kind="backfill").id
+    asyncio.run(runner.run(sync_id))
+    asyncio.run(runner.run(backfill_id))
+    # Nothing left: a second run only confirms the checkpoint.
+    with session_factory() as db:
+        again_id = create_job(db, 1, 0, ["INBOX"], kind="backfill").id
+    asyncio.run(runner.run(again_id))
+
+    with session_factory() as db:
+        job = db.get(SyncJob, backfill_id)
+        assert (job.status, job.fetched, job.stored, job.chunks) == ("completed", 4, 4, 4)
+        assert db.get(SyncJob, again_id).fetched == 0
+        state = db.query(FolderState).one()
+        assert state.backfill_complete and state.last_uid == 6
+        assert sorted(uid for (uid,) in db.query(Message.imap_uid)) == [1, 2, 3, 4, 5, 6]
+
+
+def test_archive_job_moves_old_messages_in_committed_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(segments, "directory", tmp_path)
+    runner, session_factory = make_runner(FakeAsyncImap([]))
+    now = datetime.utcnow()
+    with session_factory() as db:
+        messages = [
+            {"uid": uid, "subject": "Bericht", "from": "a@example.com", "date": now - timedelta(days=400 - uid)}
+            for uid in range(1, 6)
+        ]
+        ingest_messages(db, db.get(Account, 1), messages)
+        db.commit()
+        job_id = create_job(db, 1, 0, None, kind="archive", older_than_days=365).id
+    asyncio.run(runner.run(job_id))
+
+    with session_factory() as db:
+        job = db.get(SyncJob, job_id)
+        # The newest message stays hot as its thread's latest.
+        assert (job.status, job.stored, job.chunks) == ("completed", 4, 2)
+        assert sorted(uid for (uid,) in db.query(Message.imap_uid).filter(Message.archive_segment.isnot(None))) == [1, 2, 3, 4]
@@ -0,0 +1,87 @@
+import email
+import io
+from email.message import EmailMessage
+
+from app.services.imap_client import ImapClient, SocketReader, _extract_body
+from app.services.mime_stream import BodyExtractor
+
+
+def build_message(text="Hallo Welt\n", html=None, attachment=b"", forwarded=False):
+    msg = EmailMessage()
+    msg["Subject"] = "Test"
+    msg.set_content(text, charset="utf-8", cte="quoted-printable")
+    if html:
+        msg.add_alternative(html, subtype="html")
+    if attachment:
+        msg.add_attachment(attachment, maintype="application", subtype="octet-stream", filename="big.bin")
+    if forwarded:
+        inner = EmailMessage()
+        inner["Subject"] = "Inner"
+        inner.set_content("Weitergeleitet\n")
+        msg.add_attachment(inner)
+    return msg.as_bytes()
+
+
+def extract(raw, chunk_size=7, max_bytes=1024 * 1024):
+    extractor = BodyExtractor(max_bytes=max_bytes)
+    for start in range(0, len(raw), chunk_size):
+        extractor.feed(raw[start:start + chunk_size])
+    return extractor.close(), extractor
+
+
+def test_matches_email_parser_for_common_layouts():
+    messages = [
+        build_message(),
+        build_message("Grüße, =Gleich\n" * 3, html="<p>Hallo <b>HTML</b></p>"),
+        build_message(attachment=b"\x00\x01" * 500, forwarded=True),
+        b"Subject: plain\r\nContent-Type: text/html\r\n\r\n<p>nur html</p>\r\n",
+        b"Subject: only html\r\nContent-Type: multipart/mixed; boundary=b1\r\n\r\npreamble\r\n--b1\r\n"
+        b"Content-Type: text/html; charset=latin-1\r\nContent-Transfer-Encoding: base64\r\n\r\nPHA+R3L832U8L3A+\r\n--b1--\r\nepilogue\r\n",
+    ]
+    for raw in messages:
+        assert extract(raw)[0] == _extract_body(email.message_from_bytes(raw))
+
+
+def test_attachment_payload_is_not_kept():
+    raw = build_message("Siehe Anhang\n", attachment=b"x" * 300_000)
+    body, extractor = extract(raw, chunk_size=65536, max_bytes=4096)
+    assert body == "Siehe Anhang\n"
+    assert not extractor.truncated
+
+
+def test_oversized_body_is_cut_at_the_ceiling():
+    raw = b"Subject: long\r\n\r\n" + b"0123456789\r\n" * 10_000
+    body, extractor = extract(raw, max_bytes=1200)
+    assert extractor.truncated
+    assert 1000 < len(body) <= 1200
+
+
+def test_fetch_body_streams_the_literal():
+    raw = build_message("Stream\n", attachment=b"y" * 50_000)
+    response = b"* 1 FETCH (UID 9 RFC822 {%d}\r\n%s FLAGS (\\Seen))\r\nA1 OK done\r\n" % (len(raw), raw)
+    server = io.BytesIO(response)
+
+    class Conn:
+        tagged_commands: dict = {}
+        file = SocketReader(lambda size: server.read(min(size, 4096)))
+        sent = b""
+
+        def _new_tag(self):
+            self.tagged_commands[b"A1"] = None
+            return b"A1"
+
+        def send(self, data):
+            self.sent += data
+
+        def readline(self):
+            return self.file.readline()
+
+        def read(self, size):
+            return self.file.read(size)
+
+    imap = ImapClient("imap.example.com")
+    imap.conn = Conn()
+
+    assert imap.fetch_body(9) == "Stream\n"
+    assert imap.conn.sent == b"A1 UID FETCH 9 (RFC822)\r\n"
+    assert imap.conn.tagged_commands == {}
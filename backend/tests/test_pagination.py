@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db import Base
+from app.models import Account, Message, Thread
+from app.routers.threads import list_threads, thread_messages
+from app.services.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+def make_account(db):
+    account = Account(email="me@example.com", imap_host="imap", smtp_host="smtp", password_enc="x")
+    db.add(account)
+    db.commit()
+    return account
+
+
+class FakeResponse:
+    def __init__(self):
+        self.headers: dict[str, str] = {}
+
+
+def page_through(fetch, limit):
+    seen, cursor = [], None
+    while True:
+        response = FakeResponse()
+        seen.append([row.id for row in fetch(response, limit, cursor)])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return seen
+
+
+def test_cursor_round_trip():
+    when = datetime(2025, 3, 1, 12, 30)
+    assert decode_cursor(encode_cursor(5, when, 7), int, datetime, int) == [5, when, 7]
+    assert decode_cursor(encode_cursor(5, None, 7), int, datetime, int) == [5, None, 7]
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", int, datetime, int)
+
+
+def test_thread_pages_follow_the_list_order_with_ties_and_nulls():
+    db = make_session()
+    account = make_account(db)
+    start = datetime(2025, 1, 1)
+    for i in range(23):
+        db.add(Thread(
+            account_id=account.id,
+            thread_key=f"t{i}",
+            priority_score=(i % 3) * 20,
+            last_message_at=None if i % 5 == 0 else start + timedelta(days=i % 4),
+        ))
+    db.commit()
+    expected = [
+        thread.id
+        for thread in sorted(
+            db.query(Thread),
+            key=lambda t: (-t.priority_score, t.last_message_at is None, -(t.last_message_at or start).timestamp(), -t.id),
+        )
+    ]
+
+    pages = page_through(lambda response, limit, cursor: list_threads(account.id, response, limit, cursor, db), 4)
+    assert [len(page) for page in pages] == [4, 4, 4, 4, 4, 3]
+    assert [thread_id for page in pages for thread_id in page] == expected
+
+
+def test_new_messages_do_not_shift_later_pages():
+    db = make_session()
+    account = make_account(db)
+    thread = Thread(account_id=account.id, thread_key="t")
+    db.add(thread)
+    db.flush()
+    start = datetime(2025, 1, 1)
+    for uid in range(10):
+        db.add(Message(thread_id=thread.id, imap_uid=uid, date=None if uid == 0 else start + timedelta(hours=uid)))
+    db.commit()
+
+    response = FakeResponse()
+    first = thread_messages(thread.id, response, 4, None, db)
+    assert [m.imap_uid for m in first] == [9, 8, 7, 6]
+    db.add(Message(thread_id=thread.id, imap_uid=10, date=start + timedelta(hours=10)))
+    db.commit()
+    second = thread_messages(thread.id, FakeResponse(), 10, response.headers["X-Next-Cursor"], db)
+    assert [m.imap_uid for m in second] == [5, 4, 3, 2, 1, 0]
+
+    with pytest.raises(HTTPException) as exc:
+        thread_messages(thread.id, FakeResponse(), 10, "garbage", db)
+    assert exc.value.status_code == 400
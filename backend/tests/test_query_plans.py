@@ -0,0 +1,89 @@
+import os
+from datetime import datetime
+from typing import Any
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app.db import Base
+from app.models import Account, Subscription, Thread
+from app.routers.threads import list_threads, thread_messages
+from app.services.pagination import encode_cursor
+
+POSTGRES_URL = os.getenv("MAILPILOT_TEST_POSTGRES_URL")
+
+
+class FakeResponse:
+    def __init__(self):
+        self.headers: dict[str, str] = {}
+
+
+def hot_queries(db: Session) -> dict[str, list[tuple[str, Any]]]:
+    """The statements the list routes run, first and later pages, with their parameters."""
+    db.add(Account(id=1, email="me@example.com", imap_host="imap", smtp_host="smtp", password_enc="x"))
+    db.add(Thread(id=1, account_id=1, thread_key="t"))
+    db.flush()
+    routes = {
+        "ix_threads_account_priority": lambda cursor: list_threads(1, FakeResponse(), 200, cursor, db),
+        "ix_messages_thread_date": lambda cursor: thread_messages(1, FakeResponse(), 100, cursor, db),
+    }
+    cursors = {
+        "ix_threads_account_priority": encode_cursor(20, datetime(2025, 1, 1), 5),
+        "ix_messages_thread_date": encode_cursor(datetime(2025, 1, 1), 5),
+    }
+    queries: dict[str, list[tuple[str, Any]]] = {}
+    for index, route in routes.items():
+        statements: list[tuple[str, Any]] = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if "ORDER BY" in statement:
+                statements.append((statement, parameters))
+
+        event.listen(db.get_bind(), "before_cursor_execute", capture)
+        try:
+            route(None)
+            route(cursors[index])
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", capture)
+        queries[index] = statements
+    subscription = db.query(Subscription).filter(Subscription.account_id == 1, Subscription.sender == "news@example.com")
+    compiled = subscription.statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    queries["ix_subscriptions_account_sender"] = [(str(compiled), None)]
+    return queries
+
+
+def explain(db: Session, statement: str, parameters: Any, prefix: str) -> str:
+    rows = db.connection().exec_driver_sql(f"{prefix} {statement}", parameters or ()).all()
+    return "\n".join(" ".join(str(value) for value in row) for row in rows)
+
+
+def test_hot_queries_use_their_index_on_sqlite():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        for index, statements in hot_queries(db).items():
+            for statement, parameters in statements:
+                plan = explain(db, statement, parameters, "EXPLAIN QUERY PLAN")
+                assert f"INDEX {index}" in plan
+                assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="MAILPILOT_TEST_POSTGRES_URL not set")
+def test_hot_queries_use_their_index_on_postgres():
+    engine = create_engine(POSTGRES_URL)
+    with engine.connect() as conn:
+        conn.execute(text("CREATE SCHEMA query_plans"))
+        conn.execute(text("SET search_path TO query_plans"))
+        Base.metadata.create_all(conn)
+        try:
+            with Session(conn) as db:
+                # The tables are empty; keep the planner from preferring a sequential scan.
+                db.execute(text("SET enable_seqscan = off"))
+                for index, statements in hot_queries(db).items():
+                    for statement, parameters in statements:
+                        plan = explain(db, statement, parameters, "EXPLAIN")
+                        assert index in plan
+                        assert "Sort" not in plan
+        finally:
+            conn.rollback()
@@ -0,0 +1,53 @@
+import time
+from datetime import datetime, timedelta
+
+from app.services.scheduler import SyncScheduler
+
+
+def make_scheduler(rows, sync=lambda account_id: {}, **kwargs):
+    scheduler = SyncScheduler(interval=60, workers=3, per_host=1, sync=sync, accounts=lambda: rows, **kwargs)
+    scheduler.refresh()
+    return scheduler
+
+
+def test_due_accounts_respect_host_cap_and_prefer_active_ones():
+    now = datetime.utcnow()
+    scheduler = make_scheduler([
+        (1, "imap.a", now - timedelta(days=30)),
+        (2, "imap.a", now - timedelta(hours=1)),
+        (3, "imap.b", None),
+        (4, "imap.c", now - timedelta(minutes=5)),
+    ])
+
+    taken = scheduler.take_due(now=0)
+
+    assert [s.account_id for s in taken] == [4, 2, 3]
+    assert scheduler.status()["queue_depth"] == 1
+    assert scheduler.take_due(now=0) == []
+
+
+def test_failures_back_off_exponentially_and_success_resets():
+    calls = []
+
+    def sync(account_id):
+        calls.append(account_id)
+        if len(calls) < 3:
+            raise OSError("connection refused")
+        return {"messages_new": 1}
+
+    scheduler = make_scheduler([(1, "imap.a", None)], sync=sync, max_backoff=200)
+    (schedule,) = scheduler.take_due(now=0)
+    scheduler.run_one(schedule)
+    assert (schedule.failures, schedule.last_error) == (1, "connection refused")
+    assert 110 < schedule.next_run - time.monotonic() <= 120
+
+    scheduler.run_one(schedule)
+    assert schedule.failures == 2
+    # 60 * 2**2 is capped at max_backoff.
+    assert 190 < schedule.next_run - time.monotonic() <= 200
+
+    scheduler.run_one(schedule)
+    status = scheduler.status()["accounts"][0]
+    assert (status["failures"], status["last_error"]) == (0, None)
+    assert status["last_sync_seconds"] is not None
+    assert schedule.last_activity is not None
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.db import Base
+from app.models import Account, Message
+from app.routers.accounts import search
+from app.services.search import index_body, search_messages
+from app.services.sync import ingest_messages, remove_vanished
+
+
+class FakeResponse:
+    def __init__(self):
+        self.headers: dict[str, str] = {}
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+def make_account(db, email="me@example.com"):
+    account = Account(email=email, imap_host="imap", smtp_host="smtp", password_enc="x")
+    db.add(account)
+    db.commit()
+    return account
+
+
+def msg(uid, subject, snippet="", sender="anna@example.com"):
+    return {"uid": uid, "subject": subject, "from": sender, "snippet": snippet, "date": datetime(2025, 3, uid)}
+
+
+def test_prefix_search_ranks_subject_matches_first_and_is_account_scoped():
+    db = make_session()
+    account, other = make_account(db), make_account(db, "other@example.com")
+    ingest_messages(db, account, [
+        msg(1, "Lunch", "the invoice is attached"),
+        msg(2, "Invoice March"),
+        msg(3, "Holiday plans"),
+    ])
+    ingest_messages(db, other, [msg(1, "Invoice for someone else")])
+    db.commit()
+
+    results = search_messages(db, account.id, "invo", 10)
+    assert [row["subject"] for row in results] == ["Invoice March", "Lunch"]
+    assert [row["subject"] for row in search_messages(db, account.id, "anna hol", 10)] == ["Holiday plans"]
+    assert search_messages(db, account.id, "  ", 10) == []
+
+
+def test_bodies_are_indexed_once_opened_and_vanished_messages_dropped():
+    db = make_session()
+    account = make_account(db)
+    ingest_messages(db, account, [msg(1, "Hello"), msg(2, "Hello again")])
+    db.commit()
+    first = db.query(Message).filter(Message.imap_uid == 1).one()
+    assert search_messages(db, account.id, "quarterly", 10) == []
+
+    index_body(db, first.id, "Please review the quarterly numbers.")
+    db.commit()
+    assert [row["id"] for row in search_messages(db, account.id, "quarterly", 10)] == [first.id]
+
+    remove_vanished(db, account.id, {1})
+    db.commit()
+    assert search_messages(db, account.id, "quarterly", 10) == []
+
+
+def test_search_endpoint_pages_with_a_cursor():
+    db = make_session()
+    account = make_account(db)
+    ingest_messages(db, account, [msg(uid, f"Report {uid}") for uid in range(1, 8)])
+    db.commit()
+
+    ids, cursor = [], None
+    while True:
+        response = FakeResponse()
+        ids += [row["id"] for row in search(account.id, response, "report", 3, cursor, db)]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert sorted(ids) == [message.id for message in db.query(Message).order_by(Message.id)]
+    assert len(ids) == 7
@@ -0,0 +1,199 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base
+from app.models import Account, FolderState, Message, Subscription, Thread
+from app.services.imap_client import FolderChanges
+from app.services.imap_protocol import Folder
+from app.services.sync import ingest_messages, remove_vanished, sync_account_folders, sync_mailbox
+
+
+class FakeImap:
+    folder = "INBOX"
+
+    def __init__(self, uidvalidity: int, uids: list[int]):
+        self.uidvalidity = uidvalidity
+        self.highest_modseq = 100
+        self.uids = uids
+        self.changes = FolderChanges({}, set())
+        self.calls: list[tuple] = []
+
+    def _msg(self, uid: int) -> dict:
+        return {"uid": uid, "subject": f"Mail {uid}", "from": "a@example.com", "snippet": "hallo"}
+
+    def fetch_latest(self, limit: int = 50):
+        self.calls.append(("latest", limit))
+        return [self._msg(uid) for uid in self.uids[-limit:]]
+
+    def fetch_changes(self, last_uid: int, modseq, known_uids):
+        self.calls.append(("changes", last_uid, modseq))
+        return self.changes
+
+    def fetch_since(self, last_uid: int, limit: int = 50):
+        self.calls.append(("since", last_uid))
+        return [self._msg(uid) for uid in self.uids if uid > last_uid][:limit]
+
+
+def make_session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def make_session():
+    return make_session_factory()()
+
+
+def make_account(db):
+    account = Account(email="me@example.com", imap_host="imap", smtp_host="smtp", password_enc="x")
+    db.add(account)
+    db.commit()
+    return account
+
+
+def test_incremental_sync_uses_high_water_mark():
+    db = make_session()
+    account = make_account(db)
+
+    imap = FakeImap(7, [1, 2, 3])
+    result = sync_mailbox(db, account, imap)
+    assert result["full_resync"] is True
+    assert result["messages_new"] == 3
+
+    imap.uids = [1, 2, 3, 4]
+    result = sync_mailbox(db, account, imap)
+    assert imap.calls[-2:] == [("changes", 3, 100), ("since", 3)]
+    assert result["full_resync"] is False
+    assert result["messages_new"] == 1
+    state = db.query(FolderState).one()
+    assert (state.uidvalidity, state.last_uid) == (7, 4)
+
+
+def test_uidvalidity_change_triggers_full_resync():
+    db = make_session()
+    account = make_account(db)
+    sync_mailbox(db, account, FakeImap(7, [1, 2, 3]))
+
+    imap = FakeImap(8, [10, 11])
+    result = sync_mailbox(db, account, imap)
+    assert imap.calls == [("latest", 50)]
+    assert result["full_resync"] is True
+    assert sorted(m.imap_uid for m in db.query(Message)) == [10, 11]
+    assert sorted(t.subject for t in db.query(Thread)) == ["Mail 10", "Mail 11"]
+
+
+def test_gap_larger_than_limit_is_caught_up_over_several_syncs():
+    db = make_session()
+    account = make_account(db)
+    imap = FakeImap(7, [1])
+    sync_mailbox(db, account, imap)
+
+    imap.uids = list(range(1, 8))
+    assert sync_mailbox(db, account, imap, limit=4)["messages_new"] == 4
+    assert db.query(FolderState).one().last_uid == 5
+    assert sync_mailbox(db, account, imap, limit=4)["messages_new"] == 2
+    assert sorted(m.imap_uid for m in db.query(Message)) == list(range(1, 8))
+
+
+def test_ingest_is_a_batch_of_constant_statement_count():
+    db = make_session()
+    account = make_account(db)
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    messages = [
+        {"uid": uid, "subject": f"Topic {uid % 50}", "from": "news@example.com", "snippet": "hallo", "list_unsubscribe": "<mailto:u@example.com>"}
+        for uid in range(1, 1001)
+    ]
+    result = ingest_messages(db, account, messages + messages[:10])
+    db.commit()
+
+    assert result == {"threads_new": 50, "messages_new": 1000}
+    assert db.query(Message).count() == 1000
+    assert db.query(Subscription).count() == 1
+    assert len(statements) < 30
+    thread = db.query(Thread).filter(Thread.subject == "Topic 7").one()
+    assert len(thread.messages) == 20
+
+    assert ingest_messages(db, account, messages[:100]) == {"threads_new": 0, "messages_new": 0}
+    db.commit()
+    assert db.query(Subscription).count() == 1
+
+
+def test_flag_changes_and_vanished_messages_are_applied():
+    db = make_session()
+    account = make_account(db)
+    imap = FakeImap(7, [1, 2, 3])
+    sync_mailbox(db, account, imap)
+
+    imap.uids = [1, 3]
+    imap.highest_modseq = 120
+    imap.changes = FolderChanges({1: ["\\Seen"]}, {2})
+    result = sync_mailbox(db, account, imap)
+
+    assert (result["flags_updated"], result["vanished"]) == (1, 1)
+    assert {m.imap_uid: m.is_seen for m in db.query(Message)} == {1: True, 3: False}
+    assert db.query(FolderState).one().highest_modseq == 120
+
+
+def test_thread_summary_follows_ingest_and_vanished_messages():
+    db = make_session()
+    account = make_account(db)
+    day = datetime(2025, 3, 1)
+    messages = [
+        {"uid": uid, "subject": "Re: Plan", "from": f"p{uid}@example.com", "snippet": f"text {uid}", "date": day + timedelta(hours=uid)}
+        for uid in (1, 3, 2)
+    ]
+    ingest_messages(db, account, messages)
+    db.commit()
+    thread = db.query(Thread).one()
+    assert (thread.message_count, thread.last_snippet, thread.last_from) == (3, "text 3", "p3@example.com")
+    assert thread.last_message_id == db.query(Message).filter(Message.imap_uid == 3).one().id
+
+    remove_vanished(db, account.id, {3})
+    db.commit()
+    db.refresh(thread)
+    assert (thread.message_count, thread.last_snippet) == (2, "text 2")
+
+
+class FakePool:
+    def __init__(self, folders: dict[str, FakeImap], listing: list[Folder]):
+        self.folders = folders
+        self.listing = listing
+
+    def run(self, account, folder, operation):
+        class Lister:
+            list_folders = lambda _: self.listing
+
+        return operation(Lister())
+
+    @contextmanager
+    def connection(self, account, folder):
+        yield self.folders[folder]
+
+
+def test_account_folders_are_discovered_and_synced_in_parallel():
+    session_factory = make_session_factory()
+    db = session_factory()
+    account = make_account(db)
+    inbox, sent = FakeImap(7, [1, 2]), FakeImap(3, [1])
+    sent.folder = "Sent"
+    listing = [
+        Folder("Sent", "/", ("\\HasNoChildren", "\\Sent")),
+        Folder("INBOX", "/", ()),
+        Folder("Trash", "/", ("\\Trash",)),
+        Folder("[Gmail]", "/", ("\\Noselect",)),
+    ]
+    pool = FakePool({"INBOX": inbox, "Sent": sent}, listing)
+
+    result = sync_account_folders(account, pool=pool, session_factory=session_factory, parallelism=2)
+
+    assert list(result["folders"]) == ["INBOX", "Sent"]
+    assert result["messages_new"] == 3
+    # UID 1 exists in both folders and is stored once per folder.
+    assert sorted((m.folder, m.imap_uid) for m in db.query(Message)) == [("INBOX", 1), ("INBOX", 2), ("Sent", 1)]
+    assert {s.folder: s.uidvalidity for s in db.query(FolderState)} == {"INBOX": 7, "Sent": 3}
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models import Account, Message, Thread, ThreadMessageId
+from app.services.sync import ingest_messages
+from app.services.threader import message_ids
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    account = Account(email="me@example.com", imap_host="imap", smtp_host="smtp", password_enc="x")
+    db.add(account)
+    db.commit()
+    return db, account
+
+
+def mail(uid, own, parents=(), subject="Angebot"):
+    return {
+        "uid": uid,
+        "message_id": f"<{own}@example.com>",
+        "in_reply_to": f"<{parents[-1]}@example.com>" if parents else None,
+        "references": " ".join(f"<{parent}@example.com>" for parent in parents) or None,
+        "subject": subject,
+        "from": f"{own}@example.com",
+        "date": datetime(2024, 5, 1) + timedelta(hours=uid),
+        "snippet": "hallo",
+    }
+
+
+def threads_of(db):
+    return {message.imap_uid: message.thread_id for message in db.query(Message)}
+
+
+def test_message_ids_reads_references_and_in_reply_to():
+    msg = {"message_id": "<c@x>", "references": "<a@x> <b@x>", "in_reply_to": "<b@x> (sent by b)"}
+    assert message_ids(msg) == ("<c@x>", ["<a@x>", "<b@x>"])
+    assert message_ids({"in_reply_to": "<a@x>"}) == (None, ["<a@x>"])
+
+
+def test_replies_join_the_thread_despite_changed_subject():
+    db, account = make_session()
+    ingest_messages(db, account, [mail(1, "a"), mail(2, "b", ["a"], "Re: Angebot"), mail(3, "c", ["a", "b"], "AW: neu")])
+    db.commit()
+
+    assert len(set(threads_of(db).values())) == 1
+    assert db.query(Thread).one().message_count == 3
+
+
+def test_replies_before_their_parent_end_up_in_one_thread():
+    db, account = make_session()
+    assert ingest_messages(db, account, [mail(3, "c", ["a", "b"], "AW: neu")])["threads_new"] == 1
+    assert ingest_messages(db, account, [mail(2, "b", ["a"], "Re: Angebot")])["threads_new"] == 0
+    assert ingest_messages(db, account, [mail(1, "a")])["threads_new"] == 0
+    db.commit()
+
+    assert len(set(threads_of(db).values())) == 1
+
+
+def test_linking_message_merges_threads():
+    db, account = make_session()
+    ingest_messages(db, account, [mail(1, "a", subject="Rechnung"), mail(2, "b", subject="Lieferung")])
+    first, second = threads_of(db)[1], threads_of(db)[2]
+    assert first != second
+
+    ingest_messages(db, account, [mail(3, "c", ["a", "b"])])
+    db.commit()
+
+    assert set(threads_of(db).values()) == {min(first, second)}
+    assert db.query(Thread).one().message_count == 3
+    assert {row.thread_id for row in db.query(ThreadMessageId)} == {min(first, second)}
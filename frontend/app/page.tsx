@@ -26,6 +26,12 @@ type Thread = {
   is_newsletter: boolean;
 };
 
+type Counters = {
+  threads: number;
+  unread_threads: number;
+  newsletters: number;
+};
+
 type Message = {
   id: number;
   imap_uid: number;
@@ -51,6 +57,8 @@ export default function Home() {
   const [accounts, setAccounts] = useState<Account[]>([]);
   const [selectedAccount, setSelectedAccount] = useState<Account | null>(null);
   const [threads, setThreads] = useState<Thread[]>([]);
+  const [threadCursor, setThreadCursor] = useState<string | null>(null);
+  const [counters, setCounters] = useState<Counters | null>(null);
   const [selectedThread, setSelectedThread] = useState<Thread | null>(null);
   const [messages, setMessages] = useState<Message[]>([]);
   const [draft, setDraft] = useState<string>("");
@@ -75,10 +83,7 @@ export default function Home() {
 
   useEffect(() => {
     if (!selectedAccount) return;
-    fetch(`${API_URL}/threads/account/${selectedAccount.id}`)
-      .then((res) => res.json())
-      .then((data) => setThreads(data))
-      .catch(() => setToast("Threads konnten nicht geladen werden."));
+    loadThreads(selectedAccount.id).catch(() => setToast("Threads konnten nicht geladen werden."));
 
     fetch(`${API_URL}/threads/newsletters/${selectedAccount.id}`)
       .then((res) => res.json())
@@ -86,6 +91,18 @@ export default function Home() {
       .catch(() => setToast("Newsletter konnten nicht geladen werden."));
   }, [selectedAccount]);
 
+  const loadThreads = async (accountId: number, cursor: string | null = null) => {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+    const res = await fetch(`${API_URL}/threads/account/${accountId}${query}`);
+    const page: Thread[] = await res.json();
+    setThreads((current) => (cursor ? [...current, ...page] : page));
+    setThreadCursor(res.headers.get("X-Next-Cursor"));
+    if (!cursor) {
+      const countersRes = await fetch(`${API_URL}/accounts/${accountId}/counters`);
+      setCounters(await countersRes.json());
+    }
+  };
+
   const filteredThreads = threads.filter((thread) => {
     if (activeTab === "newsletters") return thread.is_newsletter;
     if (activeTab === "needs-reply") return thread.priority_score > 60;
@@ -159,6 +176,15 @@ export default function Home() {
       .catch(() => setToast("Entwurf fehlgeschlagen."));
   };
 
+  const waitForJob = async (jobId: number) => {
+    for (;;) {
+      const res = await fetch(`${API_URL}/jobs/${jobId}`);
+      const job = await res.json();
+      if (["completed", "failed", "cancelled"].includes(job.status)) return job;
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
   const syncNow = () => {
     if (!selectedAccount) return;
     fetch(`${API_URL}/accounts/${selectedAccount.id}/sync`, {
@@ -167,12 +193,11 @@ export default function Home() {
       body: JSON.stringify({ limit: 50 }),
     })
       .then((res) => res.json())
-      .then(() => {
-        setToast("Sync abgeschlossen");
-        return fetch(`${API_URL}/threads/account/${selectedAccount.id}`);
+      .then((job) => waitForJob(job.id))
+      .then((job) => {
+        setToast(job.status === "completed" ? "Sync abgeschlossen" : "Sync fehlgeschlagen.");
+        return loadThreads(selectedAccount.id);
       })
-      .then((res) => res.json())
-      .then((data) => setThreads(data))
       .catch(() => setToast("Sync fehlgeschlagen."));
   };
 
@@ -297,9 +322,9 @@ export default function Home() {
           <div className="flex gap-2">
             {[
               { key: "focus", label: "Focus Inbox" },
-              { key: "newsletters", label: "Newsletters" },
+              { key: "newsletters", label: "Newsletters", count: counters?.newsletters },
               { key: "needs-reply", label: "Needs Reply" },
-              { key: "all", label: "All" },
+              { key: "all", label: "All", count: counters?.unread_threads },
             ].map((tab) => (
               <button
                 key={tab.key}
@@ -310,6 +335,7 @@ export default function Home() {
                 onClick={() => setActiveTab(tab.key)}
               >
                 {tab.label}
+                {!!tab.count && <span className="ml-1 rounded-full bg-slate-700 px-1.5">{tab.count}</span>}
               </button>
             ))}
           </div>
@@ -353,6 +379,16 @@ export default function Home() {
               {!filteredThreads.length && activeTab !== "newsletters" && (
                 <p className="text-xs text-slate-500">Keine Threads.</p>
               )}
+              {threadCursor && selectedAccount && activeTab !== "newsletters" && (
+                <button
+                  className="w-full rounded-xl bg-slate-800/60 px-3 py-2 text-xs text-slate-300"
+                  onClick={() =>
+                    loadThreads(selectedAccount.id, threadCursor).catch(() => setToast("Threads konnten nicht geladen werden."))
+                  }
+                >
+                  Mehr laden
+                </button>
+              )}
             </div>
           </div>
         </section>